@@ -0,0 +1,709 @@
+import io
+import itertools
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from djoser.utils import encode_uid
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from taggit.models import Tag
+
+from .counters import reconcile_counters
+from .metrics import collect_metrics
+from .models import Profile, Post, PostRate, Comment
+from .sample_data import (
+    create_number_users,
+    create_number_of_posts,
+    create_number_of_comments,
+)
+from .timeline import backfill_timeline
+
+# url namespaces which routes are benchmarked
+NAMESPACES = ("social_media", "user")
+
+PASSWORD = "benchmark-rvtquen"
+
+BASELINE_PATH = Path(settings.BASE_DIR) / "benchmark_baseline.json"
+
+DEFAULT_VOLUMES = {
+    # profiles and posts of every profile
+    "profiles": 50,
+    "posts": 20,
+    # top comments under every post and replies under every comment of
+    # benchmarked post on two levels
+    "comments": 10,
+    "replies": 3,
+    # profiles every profile follows and posts every profile rated
+    "followings": 20,
+    "rates": 40,
+    "tags": 10,
+}
+TIMINGS = ("db_ms", "serialize_ms", "total_ms")
+
+
+@dataclass
+class Fixtures:
+    """Seeded objects requests are built from"""
+
+    viewer: Profile
+    post: Post
+    comment: Comment
+    tag: Tag
+
+
+@dataclass
+class Request:
+    user: object = None
+    args: list = field(default_factory=list)
+    data: dict = None
+    format: str = "json"
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """Request to one method of url, prepare builds request from fixtures
+    and creates objects request changes or deletes"""
+
+    url_name: str
+    method: str
+    prepare: Callable[[Fixtures], Request]
+    status: int = 200
+    label: str = ""
+
+    @property
+    def key(self) -> str:
+        key = f"{self.method.upper()} {self.url_name}"
+        return f"{key} {self.label}" if self.label else key
+
+
+@dataclass
+class Measurement:
+    queries: int
+    db_ms: float
+    serialize_ms: float
+    total_ms: float
+
+    def as_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            **{name: round(getattr(self, name), 2) for name in TIMINGS},
+        }
+
+
+_numbers = itertools.count()
+
+
+def new_user(is_active: bool = True):
+    number = next(_numbers)
+    return get_user_model().objects.create_user(
+        email=f"bench_new{number}@gmail.com",
+        username=f"BenchNew{number}",
+        password=PASSWORD,
+        is_active=is_active,
+    )
+
+
+def new_post(fixtures: Fixtures) -> Post:
+    post = Post.objects.create(author=fixtures.viewer, content="Benchmark")
+    post.tags.add(fixtures.tag)
+    return post
+
+
+def new_comment(fixtures: Fixtures) -> Comment:
+    return create_number_of_comments(1, fixtures.post, fixtures.viewer)[0]
+
+
+def image_file() -> SimpleUploadedFile:
+    content = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(content, format="JPEG")
+    return SimpleUploadedFile("benchmark.jpg", content.getvalue())
+
+
+def viewer_request(*args, **kwargs) -> Callable[[Fixtures], Request]:
+    """Return prepare of request sent by viewer, args and data values are
+    called with fixtures when they are callable"""
+
+    def prepare(fixtures: Fixtures) -> Request:
+        def value(item):
+            return item(fixtures) if callable(item) else item
+
+        data = kwargs.get("data")
+        return Request(
+            user=fixtures.viewer.user,
+            args=[value(arg) for arg in args],
+            data=data and {key: value(item) for key, item in data.items()},
+            format=kwargs.get("format", "json"),
+        )
+
+    return prepare
+
+
+def anonymous_request(data=None) -> Callable[[Fixtures], Request]:
+    def prepare(fixtures: Fixtures) -> Request:
+        return Request(data=data(fixtures) if callable(data) else data)
+
+    return prepare
+
+
+def new_user_request(data=None, args=None, **fields):
+    """Return prepare of request sent by new user, data and args are
+    called with the user"""
+
+    def prepare(fixtures: Fixtures) -> Request:
+        user = new_user(**fields)
+        return Request(
+            user=user if user.is_active else None,
+            args=args(user) if args else [],
+            data=data(user) if data else None,
+        )
+
+    return prepare
+
+
+def profile_without_user(fixtures: Fixtures) -> Request:
+    user = new_user()
+    user.profile.delete()
+    return Request(
+        user=get_user_model().objects.get(pk=user.pk), data={"bio": "Bench"}
+    )
+
+
+def new_post_request(fixtures: Fixtures) -> Request:
+    return Request(user=fixtures.viewer.user, args=[new_post(fixtures).id])
+
+
+def new_comment_request(fixtures: Fixtures) -> Request:
+    return Request(
+        user=fixtures.viewer.user, args=[new_comment(fixtures).id]
+    )
+
+
+def logged_in_user(fixtures: Fixtures) -> Request:
+    user = new_user()
+    Token.objects.create(user=user)
+    return Request(user=user)
+
+
+def reset_confirm_data(user, **extra) -> dict:
+    return {
+        "uid": encode_uid(user.pk),
+        "token": default_token_generator.make_token(user),
+        **extra,
+    }
+
+
+def reactions(objects) -> Callable[[Fixtures], list]:
+    def data(fixtures: Fixtures) -> list:
+        return [
+            {"id": obj.id, "reaction": "like"} for obj in objects(fixtures)
+        ]
+
+    return data
+
+
+def viewed_posts(fixtures: Fixtures) -> list[Post]:
+    return list(Post.objects.exclude(author=fixtures.viewer)[:10])
+
+
+def viewed_comments(fixtures: Fixtures) -> list[Comment]:
+    return list(Comment.objects.filter(post=fixtures.post)[:10])
+
+
+def viewer_id(fixtures: Fixtures) -> int:
+    return fixtures.viewer.id
+
+
+def post_id(fixtures: Fixtures) -> int:
+    return fixtures.post.id
+
+
+def author_id(fixtures: Fixtures) -> int:
+    return fixtures.post.author_id
+
+
+def comment_id(fixtures: Fixtures) -> int:
+    return fixtures.comment.id
+
+
+def tag_id(fixtures: Fixtures) -> int:
+    return fixtures.tag.id
+
+
+new_password_retyped = {
+    "new_password": f"new-{PASSWORD}",
+    "re_new_password": f"new-{PASSWORD}",
+}
+post_fields = {"content": "Benchmark", "tags": ["benchmark"]}
+
+
+def user_fields(user) -> dict:
+    return {"email": f"put_{user.email}", "username": f"Put{user.username}"}
+
+
+ENDPOINTS = [
+    # social_media profiles
+    Endpoint("social_media:profile-list", "get", viewer_request()),
+    Endpoint(
+        "social_media:profile-list", "post", profile_without_user, status=201
+    ),
+    Endpoint(
+        "social_media:profile-detail", "get", viewer_request(author_id)
+    ),
+    Endpoint(
+        "social_media:profile-detail",
+        "put",
+        viewer_request(viewer_id, data={"bio": "Benchmark"}),
+    ),
+    Endpoint(
+        "social_media:profile-detail",
+        "patch",
+        viewer_request(viewer_id, data={"bio": "Benchmark"}),
+    ),
+    Endpoint(
+        "social_media:profile-detail",
+        "delete",
+        new_user_request(args=lambda user: [user.profile.id]),
+        status=204,
+    ),
+    Endpoint(
+        "social_media:profile-follow-unfollow",
+        "post",
+        viewer_request(author_id),
+    ),
+    Endpoint(
+        "social_media:profile-followers", "get", viewer_request(author_id)
+    ),
+    Endpoint(
+        "social_media:profile-followings", "get", viewer_request(author_id)
+    ),
+    Endpoint(
+        "social_media:profile-upload-profile-picture",
+        "post",
+        viewer_request(
+            viewer_id,
+            data={"profile_picture": lambda fixtures: image_file()},
+            format="multipart",
+        ),
+    ),
+    # social_media posts
+    Endpoint("social_media:post-list", "get", anonymous_request()),
+    Endpoint(
+        "social_media:post-list",
+        "get",
+        viewer_request(data={"following_posts": 1}),
+        label="following_posts",
+    ),
+    Endpoint(
+        "social_media:post-list",
+        "post",
+        viewer_request(data=post_fields),
+        status=201,
+    ),
+    Endpoint(
+        "social_media:post-reactions",
+        "post",
+        viewer_request(data={"reactions": reactions(viewed_posts)}),
+    ),
+    Endpoint("social_media:post-liked", "get", viewer_request()),
+    Endpoint("social_media:post-disliked", "get", viewer_request()),
+    Endpoint("social_media:post-detail", "get", viewer_request(post_id)),
+    Endpoint("social_media:post-detail", "put", new_post_request),
+    Endpoint("social_media:post-detail", "patch", new_post_request),
+    Endpoint(
+        "social_media:post-detail", "delete", new_post_request, status=204
+    ),
+    Endpoint("social_media:post-like", "post", viewer_request(post_id)),
+    Endpoint("social_media:post-dislike", "post", viewer_request(post_id)),
+    Endpoint("social_media:post-profile", "get", viewer_request(author_id)),
+    Endpoint(
+        "social_media:post-profiles-liked", "get", viewer_request(post_id)
+    ),
+    Endpoint(
+        "social_media:post-profiles-disliked", "get", viewer_request(post_id)
+    ),
+    # social_media tags
+    Endpoint("social_media:tag-list", "get", anonymous_request()),
+    Endpoint(
+        "social_media:tag-list",
+        "post",
+        new_user_request(data=lambda user: {"name": user.username}),
+        status=201,
+    ),
+    Endpoint("social_media:tag-detail", "get", viewer_request(tag_id)),
+    Endpoint("social_media:api-root", "get", anonymous_request()),
+    # social_media comments
+    Endpoint("social_media:post-comments", "get", viewer_request(post_id)),
+    Endpoint(
+        "social_media:post-comments",
+        "post",
+        viewer_request(post_id, data={"content": "Benchmark"}),
+        status=201,
+    ),
+    Endpoint(
+        "social_media:post-comments-tree", "get", viewer_request(post_id)
+    ),
+    Endpoint(
+        "social_media:comment-replies", "get", viewer_request(comment_id)
+    ),
+    Endpoint(
+        "social_media:comment-reactions",
+        "post",
+        viewer_request(data={"reactions": reactions(viewed_comments)}),
+    ),
+    Endpoint(
+        "social_media:comment-manager", "get", viewer_request(comment_id)
+    ),
+    Endpoint("social_media:comment-manager", "put", new_comment_request),
+    Endpoint("social_media:comment-manager", "patch", new_comment_request),
+    Endpoint(
+        "social_media:comment-manager",
+        "delete",
+        new_comment_request,
+        status=204,
+    ),
+    Endpoint(
+        "social_media:comment-like", "post", viewer_request(comment_id)
+    ),
+    Endpoint(
+        "social_media:comment-dislike", "post", viewer_request(comment_id)
+    ),
+    # user
+    Endpoint("user:user-list", "get", viewer_request(), status=404),
+    Endpoint(
+        "user:user-list",
+        "post",
+        anonymous_request(
+            lambda fixtures: {
+                "email": f"bench_signup{next(_numbers)}@gmail.com",
+                "username": f"BenchSignup{next(_numbers)}",
+                "password": PASSWORD,
+                "re_password": PASSWORD,
+            }
+        ),
+        status=201,
+    ),
+    Endpoint(
+        "user:user-activation",
+        "post",
+        new_user_request(data=reset_confirm_data, is_active=False),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-resend-activation",
+        "post",
+        anonymous_request(lambda fixtures: {"email": "bench@gmail.com"}),
+        # activation emails are not sent in this project
+        status=400,
+    ),
+    Endpoint("user:user-me", "get", viewer_request()),
+    Endpoint("user:user-me", "put", new_user_request(user_fields)),
+    Endpoint(
+        "user:user-me", "patch", new_user_request(user_fields)
+    ),
+    Endpoint(
+        "user:user-me",
+        "delete",
+        new_user_request(lambda _: {"current_password": PASSWORD}),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-reset-password",
+        "post",
+        new_user_request(lambda user: {"email": user.email}),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-reset-password-confirm",
+        "post",
+        new_user_request(
+            lambda user: reset_confirm_data(user, **new_password_retyped)
+        ),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-reset-username",
+        "post",
+        new_user_request(lambda user: {"email": user.email}),
+        # username reset emails are not sent in this project
+        status=404,
+    ),
+    Endpoint(
+        "user:user-reset-username-confirm",
+        "post",
+        new_user_request(
+            lambda user: reset_confirm_data(
+                user, new_email=f"changed_{user.email}"
+            )
+        ),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-set-password",
+        "post",
+        new_user_request(
+            lambda _: {"current_password": PASSWORD, **new_password_retyped}
+        ),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-set-username",
+        "post",
+        new_user_request(
+            lambda user: {
+                "current_password": PASSWORD,
+                "new_email": f"changed_{user.email}",
+            }
+        ),
+        status=204,
+    ),
+    Endpoint(
+        "user:user-detail",
+        "get",
+        new_user_request(args=lambda user: [user.id]),
+    ),
+    Endpoint(
+        "user:user-detail",
+        "put",
+        new_user_request(user_fields, lambda user: [user.id]),
+    ),
+    Endpoint(
+        "user:user-detail",
+        "patch",
+        new_user_request(user_fields, lambda user: [user.id]),
+    ),
+    Endpoint(
+        "user:user-detail",
+        "delete",
+        new_user_request(
+            lambda _: {"current_password": PASSWORD}, lambda user: [user.id]
+        ),
+        status=204,
+    ),
+    Endpoint("user:api-root", "get", anonymous_request()),
+    Endpoint(
+        "user:password_reset_confirm",
+        "get",
+        new_user_request(
+            args=lambda user: list(reset_confirm_data(user).values())
+        ),
+        status=302,
+    ),
+    Endpoint(
+        "user:login",
+        "post",
+        new_user_request(
+            lambda user: {"email": user.email, "password": PASSWORD}
+        ),
+    ),
+    Endpoint("user:logout", "post", logged_in_user, status=204),
+]
+
+
+def _walk(patterns, namespace: str = None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(
+                pattern.url_patterns, pattern.namespace or namespace
+            )
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield namespace, pattern
+
+
+def routes() -> set[tuple[str, str]]:
+    """Return (url name, method) of every benchmarked route, method is
+    None for views which are not viewsets"""
+    found = set()
+    for namespace, pattern in _walk(get_resolver().url_patterns):
+        if namespace not in NAMESPACES:
+            continue
+
+        name = f"{namespace}:{pattern.name}"
+        actions = getattr(pattern.callback, "actions", None)
+        for method in actions or [None]:
+            # viewsets add head to actions on the first get request
+            if method != "head":
+                found.add((name, method))
+
+    return found
+
+
+def missing_endpoints() -> list[str]:
+    """Return routes which have no benchmarked endpoint"""
+    covered = {(endpoint.url_name, endpoint.method) for endpoint in ENDPOINTS}
+    covered_names = {name for name, _ in covered}
+
+    return sorted(
+        f"{method.upper()} {name}" if method else name
+        for name, method in routes()
+        if (name, method) not in covered
+        and (method or name not in covered_names)
+    )
+
+
+def seed(**volumes) -> Fixtures:
+    """Create profiles, follows, posts, rates, tags and comments, return
+    fixtures of benchmarked requests"""
+    volumes = {**DEFAULT_VOLUMES, **volumes}
+
+    create_number_users(volumes["profiles"] - 1)
+    profiles = list(Profile.objects.select_related("user").order_by("id"))
+    viewer, author = profiles[0], profiles[1]
+
+    posts = []
+    for profile in profiles:
+        posts.extend(create_number_of_posts(volumes["posts"], profile))
+
+    tags = [
+        Tag.objects.create(name=f"bench{i}") for i in range(volumes["tags"])
+    ]
+    for i, post in enumerate(posts):
+        post.tags.add(tags[i % len(tags)], tags[(i + 1) % len(tags)])
+
+    rates = []
+    for i, profile in enumerate(profiles):
+        profile.followings.add(
+            *[
+                profiles[(i + step) % len(profiles)]
+                for step in range(1, volumes["followings"] + 1)
+            ]
+        )
+        # every profile rates benchmarked post, other rates are
+        # spread over all posts, likes and dislikes alternate
+        rated = {posts[0].id: i % 2 == 0}
+        for step in range(volumes["rates"] - 1):
+            post = posts[(i * volumes["rates"] + step * 7 + 1) % len(posts)]
+            rated.setdefault(post.id, step % 2 == 1)
+
+        rates.extend(
+            PostRate(profile=profile, post_id=post_id, like=like)
+            for post_id, like in rated.items()
+        )
+    PostRate.objects.bulk_create(rates)
+
+    for post in posts:
+        create_number_of_comments(volumes["comments"], post, viewer)
+
+    post = posts[0]
+    parents = list(Comment.objects.filter(post=post).order_by("id"))
+    for _ in range(2):
+        replies = []
+        for parent in parents:
+            replies.extend(
+                create_number_of_comments(
+                    volumes["replies"],
+                    post,
+                    author,
+                    reply_to_comment=parent,
+                )
+            )
+        parents = replies
+
+    reconcile_counters(Post)
+    reconcile_counters(Comment)
+    backfill_timeline(viewer)
+
+    return Fixtures(
+        viewer=viewer,
+        post=post,
+        comment=Comment.objects.filter(post=post, depth=0).order_by("id")[0],
+        tag=tags[0],
+    )
+
+
+def request_once(client: APIClient, endpoint: Endpoint, fixtures: Fixtures):
+    """Send endpoint request, return response and Measurement"""
+    request = endpoint.prepare(fixtures)
+    client.force_authenticate(request.user)
+    # cached responses would hide queries of endpoint
+    cache.clear()
+
+    url = reverse(endpoint.url_name, args=request.args)
+    send = getattr(client, endpoint.method)
+    kwargs = {} if endpoint.method == "get" else {"format": request.format}
+
+    with collect_metrics() as metrics:
+        start = time.perf_counter()
+        response = send(url, request.data, **kwargs)
+        total = time.perf_counter() - start
+
+    if response.status_code != endpoint.status:
+        raise RuntimeError(
+            f"{endpoint.key} returned {response.status_code}, "
+            f"expected {endpoint.status}: {response.content[:200]!r}"
+        )
+
+    return response, Measurement(
+        queries=metrics.queries,
+        db_ms=metrics.db_seconds * 1000,
+        serialize_ms=metrics.serialize_seconds * 1000,
+        total_ms=total * 1000,
+    )
+
+
+def measure(
+    endpoint: Endpoint, fixtures: Fixtures, repeats: int, warmup: int = 1
+) -> Measurement:
+    """Return the highest number of queries and median timings of
+    endpoint requests, warmup requests fill caches of django and apps"""
+    client = APIClient()
+    for _ in range(warmup):
+        request_once(client, endpoint, fixtures)
+
+    measurements = [
+        request_once(client, endpoint, fixtures)[1] for _ in range(repeats)
+    ]
+    return Measurement(
+        queries=max(measurement.queries for measurement in measurements),
+        **{
+            name: statistics.median(
+                getattr(measurement, name) for measurement in measurements
+            )
+            for name in TIMINGS
+        },
+    )
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    slack_ms: float,
+    timings: bool = True,
+) -> list[str]:
+    """Return regressions of results against baseline endpoints, timing
+    regresses when it is longer than baseline * (1 + tolerance) + slack"""
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+
+        if result["queries"] > expected["queries"]:
+            regressions.append(
+                f"{key}: {result['queries']} queries, "
+                f"baseline {expected['queries']}"
+            )
+
+        if not timings:
+            continue
+
+        for name in TIMINGS:
+            limit = expected[name] * (1 + tolerance) + slack_ms
+            if result[name] > limit:
+                regressions.append(
+                    f"{key}: {name} {result[name]:.2f}, "
+                    f"baseline {expected[name]:.2f}"
+                )
+
+    return regressions
@@ -0,0 +1,8 @@
+import statistics
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Return percent-th percentile of measured values"""
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        percent - 1
+    ]
@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+
+
+def _version_key(name: str) -> str:
+    return f"version:{name}"
+
+
+def table_version_name(model: type[Model]) -> str:
+    return f"table:{model._meta.db_table}"
+
+
+# version of tags list
+TAGS_VERSION_NAME = "tags"
+
+
+def profile_version_name(profile_id: int) -> str:
+    """Version of profile detail"""
+    return f"profile:{profile_id}"
+
+
+def tag_version_name(tag_id: int) -> str:
+    """Version of list of posts under tag"""
+    return f"tag:{tag_id}"
+
+
+def get_versions(names) -> dict[str, int]:
+    """Return current versions of names, version of unknown name is 1"""
+    keys = {_version_key(name): name for name in names}
+    stored = cache.get_many(keys)
+
+    return {name: stored.get(key, 1) for key, name in keys.items()}
+
+
+def _incr_versions(names) -> None:
+    for name in names:
+        key = _version_key(name)
+        # add is no-op when key exists
+        cache.add(key, 1, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # key was evicted between add and incr
+            cache.set(key, 2, timeout=None)
+
+
+def bump_versions(names) -> None:
+    """Increase versions of names, so everything cached with previous
+    versions is not used anymore.
+
+    Versions are bumped again after transaction commit, otherwise data
+    read before commit could be cached with new versions"""
+    names = list(names)
+    if not names:
+        return
+
+    _incr_versions(names)
+    transaction.on_commit(lambda: _incr_versions(names))
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from operator import attrgetter
+from typing import Callable
+
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+# order of replies on every tree level, the same as replies endpoint
+REPLIES_ORDERING = ("-num_of_likes", "num_of_dislikes", "pk")
+
+DEFAULT_TREE_DEPTH = 3
+MAX_TREE_DEPTH = 10
+# number of replies shown under every comment of tree
+TREE_REPLIES_PAGE_SIZE = 5
+
+
+def descendants(
+    roots: list[Comment],
+    depth: int,
+    replies_page_size: int,
+    prepare_queryset: Callable[[QuerySet], QuerySet] | None = None,
+) -> list[Comment]:
+    """Return first replies_page_size replies of root comments and of
+    their loaded replies down to depth levels below them with one query.
+    Subtrees of roots are read by path prefix bounded by depth and
+    limited per parent comment by ROW_NUMBER window, so at most
+    replies_page_size replies of every comment are loaded. Window is
+    computed over whole subtrees down to depth, replies of comments
+    which are not shown are dropped after reading. prepare_queryset is
+    applied on the query (eager loading)"""
+    if not roots or depth < 1:
+        return []
+
+    subtrees = Q()
+    for root in roots:
+        subtrees |= Q(
+            path__startswith=root.path,
+            depth__gt=root.depth,
+            depth__lte=root.depth + depth,
+        )
+
+    replies = Comment.objects.filter(subtrees).annotate(
+        sibling_number=Window(
+            RowNumber(),
+            partition_by=F("reply_to_comment"),
+            order_by=REPLIES_ORDERING,
+        )
+    )
+    replies = replies.filter(sibling_number__lte=replies_page_size)
+    if prepare_queryset:
+        replies = prepare_queryset(replies)
+
+    shown = {root.id for root in roots}
+    loaded = []
+    for reply in sorted(replies, key=attrgetter("depth")):
+        if reply.reply_to_comment_id in shown:
+            shown.add(reply.id)
+            loaded.append(reply)
+
+    return loaded
+
+
+def _sort_key(comment: Comment) -> tuple:
+    return -comment.num_of_likes, comment.num_of_dislikes, comment.pk
+
+
+def build_tree(
+    roots: list[Comment], replies, replies_page_size: int
+) -> list[Comment]:
+    """Nest replies under roots in O(n). Every comment gets
+    `tree_replies` - first replies_page_size of its loaded replies in
+    REPLIES_ORDERING and `tree_has_more_replies`"""
+    children = defaultdict(list)
+    for reply in replies:
+        children[reply.reply_to_comment_id].append(reply)
+
+    stack = list(roots)
+    while stack:
+        comment = stack.pop()
+        loaded = sorted(children.get(comment.id, []), key=_sort_key)
+
+        comment.tree_replies = loaded[:replies_page_size]
+        comment.tree_has_more_replies = (
+            comment.num_of_replies > len(comment.tree_replies)
+        )
+        stack.extend(comment.tree_replies)
+
+    return roots
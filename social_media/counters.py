@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.db.models import (
+    Count,
+    F,
+    Func,
+    IntegerField,
+    Model,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, PostRate, Profile, Comment, CommentRate
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _delta(old_like: bool | None, new_like: bool | None, value: bool) -> int:
+    return int(new_like is value) - int(old_like is value)
+
+
+def _rate_counters_changes(
+    old_like: bool | None, new_like: bool | None
+) -> dict:
+    changes = {}
+
+    for field, value in [("num_of_likes", True), ("num_of_dislikes", False)]:
+        delta = _delta(old_like, new_like, value)
+        if delta:
+            changes[field] = F(field) + delta
+
+    return changes
+
+
+def update_rate_counters(
+    model: type[Model],
+    object_id: int,
+    old_like: bool | None,
+    new_like: bool | None,
+) -> None:
+    """Update likes/dislikes counters of Post or Comment after rate
+    changed from old_like to new_like, None means there is no rate"""
+    changes = _rate_counters_changes(old_like, new_like)
+
+    if changes:
+        model.objects.filter(pk=object_id).update(**changes)
+
+
+def update_many_rate_counters(
+    model: type[Model], rate_changes: dict[int, tuple]
+) -> None:
+    """Like update_rate_counters for many objects, rate_changes maps
+    object id to (old_like, new_like). Objects with the same counters
+    change are updated with one query"""
+    groups = defaultdict(list)
+    for object_id, (old_like, new_like) in rate_changes.items():
+        groups[(old_like, new_like)].append(object_id)
+
+    for (old_like, new_like), object_ids in groups.items():
+        changes = _rate_counters_changes(old_like, new_like)
+
+        if changes:
+            model.objects.filter(pk__in=object_ids).update(**changes)
+
+
+def update_comment_counters(comment: Comment, delta: int) -> None:
+    """Add (delta=1) or remove (delta=-1) comment together with its
+    replies from number of comments of post, number of replies of
+    comment it is replying to and number of descendants of comments
+    above it"""
+    size = delta * (1 + comment.num_of_descendants)
+
+    Post.objects.filter(pk=comment.post_id).update(
+        num_of_comments=F("num_of_comments") + size
+    )
+
+    if comment.reply_to_comment_id:
+        Comment.objects.filter(pk=comment.reply_to_comment_id).update(
+            num_of_replies=F("num_of_replies") + delta
+        )
+
+    ancestors = {"num_of_descendants": F("num_of_descendants") + size}
+    if delta > 0:
+        ancestors["thread_updated_at"] = Greatest(
+            "thread_updated_at", Value(comment.thread_updated_at)
+        )
+    Comment.objects.filter(pk__in=comment.ancestor_ids()).update(**ancestors)
+
+
+def _count(queryset: QuerySet, field: str):
+    """Subquery counting queryset rows grouped by field"""
+    counted = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _count_descendants():
+    """Subquery counting comments in subtree of comment"""
+    counted = (
+        Comment.objects.filter(path__startswith=OuterRef("path"))
+        .exclude(pk=OuterRef("pk"))
+        .order_by()
+        .annotate(total=Func("pk", function="COUNT"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def actual_counters(model: type[Model]) -> dict:
+    """Return expressions which count actual values of model counters"""
+    if model is Profile:
+        return {
+            "follower_count": _count(
+                Profile.followings.through.objects.all(), "to_profile"
+            ),
+        }
+
+    if model is Post:
+        return {
+            "num_of_likes": _count(PostRate.objects.filter(like=True), "post"),
+            "num_of_dislikes": _count(
+                PostRate.objects.filter(like=False), "post"
+            ),
+            "num_of_comments": _count(Comment.objects.all(), "post"),
+        }
+
+    return {
+        "num_of_likes": _count(
+            CommentRate.objects.filter(like=True), "comment"
+        ),
+        "num_of_dislikes": _count(
+            CommentRate.objects.filter(like=False), "comment"
+        ),
+        "num_of_replies": _count(Comment.objects.all(), "reply_to_comment"),
+        "num_of_descendants": _count_descendants(),
+    }
+
+
+def reconcile_counters(model: type[Model]) -> int:
+    """Recount counters of model rows which drifted from actual values,
+    return number of fixed rows"""
+    counters = actual_counters(model)
+
+    drifted = Q()
+    for field in counters:
+        drifted |= ~Q(**{field: F(f"actual_{field}")})
+
+    drifted_ids = list(
+        model.objects.annotate(
+            **{f"actual_{field}": value for field, value in counters.items()}
+        )
+        .filter(drifted)
+        .values_list("pk", flat=True)
+    )
+
+    for start in range(0, len(drifted_ids), RECONCILE_BATCH_SIZE):
+        batch = drifted_ids[start:start + RECONCILE_BATCH_SIZE]
+        model.objects.filter(pk__in=batch).update(**counters)
+
+    return len(drifted_ids)
@@ -0,0 +1,153 @@
+import hashlib
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+_use_primary = ContextVar("use_primary", default=False)
+
+# seconds replica is behind primary, zero when all received changes are
+# applied (idle replica has old replay timestamp) and on primary
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+
+@contextmanager
+def use_primary():
+    """Read from primary database inside"""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaLag:
+    """Lag of replicas measured at most once per
+    REPLICA_LAG_CHECK_INTERVAL seconds by every process"""
+
+    def __init__(self):
+        # alias -> (monotonic time of check, lag)
+        self.checked = {}
+
+    def __getitem__(self, alias: str) -> float:
+        now = time.monotonic()
+        checked_at, lag = self.checked.get(alias, (None, 0.0))
+        if (
+            checked_at is None
+            or now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL
+        ):
+            lag = self.measure(alias)
+            self.checked[alias] = (now, lag)
+        return lag
+
+    @staticmethod
+    def measure(alias: str) -> float:
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            # unavailable replica is not used until the next check
+            return math.inf
+
+
+replica_lag = ReplicaLag()
+
+
+class ReplicaRouter:
+    """Send reads to replicas from DATABASE_REPLICAS which are not behind
+    more than REPLICA_MAX_LAG seconds and writes to primary. Reads go to
+    primary inside `use_primary()` and transactions on primary"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or _use_primary.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+
+        replicas = [
+            alias
+            for alias in settings.DATABASE_REPLICAS
+            if replica_lag[alias] <= settings.REPLICA_MAX_LAG
+        ]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas have the same rows as primary
+        return True
+
+
+def client_keys(request) -> list[str]:
+    """Cache keys of client which made request, by its credentials and by
+    its address (requests which log in or register have no credentials)"""
+    identities = [f"addr:{request.META.get('REMOTE_ADDR', '')}"]
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        identities.append(f"auth:{authorization}")
+
+    return [
+        f"primary:{hashlib.sha256(identity.encode()).hexdigest()}"
+        for identity in identities
+    ]
+
+
+class ReplicaRoutingMiddleware:
+    """Handle unsafe requests and requests of clients which made
+    successful unsafe request in last REPLICA_STICKY_SECONDS on primary,
+    so clients read their own writes while replicas catch up"""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        keys = client_keys(request)
+        is_write = request.method not in SAFE_METHODS
+
+        if not is_write and not cache.get_many(keys):
+            return self.get_response(request)
+
+        with use_primary():
+            response = self.get_response(request)
+
+        if is_write and response.status_code < 400:
+            # authenticated client is pinned by credentials only, address
+            # may be shared by many clients behind proxy. Replicas read
+            # from are at most REPLICA_MAX_LAG seconds behind
+            cache.set(
+                keys[-1],
+                True,
+                math.ceil(
+                    max(
+                        settings.REPLICA_STICKY_SECONDS,
+                        settings.REPLICA_MAX_LAG,
+                    )
+                ),
+            )
+
+        return response
@@ -0,0 +1,230 @@
+"""Processing of post images and profile pictures. Upload is stored as
+is and processed by background job: image is decoded once, saved again
+without metadata (EXIF with camera and location), resized to
+IMAGE_VARIANT_WIDTHS in every VARIANT_FORMATS format and hashed.
+Files are named by hash of their content (see storage.py), so the same
+image is stored once and its urls can be cached forever"""
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db.models.fields.files import FieldFile
+
+from PIL import Image, ImageOps
+
+from .uploads import content_hash
+
+# variant format by file extension
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+# originals in other formats (e.g. GIF, BMP) are saved as PNG
+ORIGINAL_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+ORIGINAL_QUALITY = 95
+VARIANTS_DIRECTORY = "variants"
+
+# image states, original is shown only when it is ready
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+IMAGE_STATUSES = [
+    (PROCESSING, "Processing"),
+    (READY, "Ready"),
+    (FAILED, "Failed"),
+]
+
+
+def decode(file) -> tuple[Image.Image, str]:
+    """Return image rotated by its EXIF orientation without metadata
+    other than color profile and its format"""
+    file.seek(0)
+    with Image.open(file) as source:
+        image_format = source.format
+        has_alpha = (
+            source.mode in ("RGBA", "LA", "PA")
+            or "transparency" in source.info
+        )
+        icc_profile = source.info.get("icc_profile")
+        image = ImageOps.exif_transpose(source)
+
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    image.info = {"icc_profile": icc_profile} if icc_profile else {}
+
+    return image, image_format
+
+
+def encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    if image_format == "JPEG" and image.mode == "RGBA":
+        # JPEG has no transparency
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format=image_format,
+        quality=quality,
+        icc_profile=image.info.get("icc_profile"),
+    )
+
+    return buffer.getvalue()
+
+
+def variant_widths(width: int) -> list[int]:
+    """Widths of variants not bigger than the image itself"""
+    return sorted(
+        {min(variant, width) for variant in settings.IMAGE_VARIANT_WIDTHS}
+    )
+
+
+def save_variants(
+    image: Image.Image, storage: Storage, directory: str
+) -> list[dict]:
+    """Save resized copies of image to directory in storage, return their
+    names, sizes and formats"""
+    variants = []
+    resized = image
+    # every variant is resized from the bigger one, which is faster than
+    # resizing full image every time
+    for width in reversed(variant_widths(image.width)):
+        height = max(1, round(image.height * width / image.width))
+        resized = resized.resize(
+            (width, height), Image.Resampling.LANCZOS, reducing_gap=2.0
+        )
+
+        for extension, image_format in VARIANT_FORMATS.items():
+            data = encode(
+                resized, image_format, settings.IMAGE_VARIANT_QUALITY
+            )
+            # content addressed storage names file by hash of its
+            # content, the same variant is stored once
+            name = storage.save(
+                posixpath.join(
+                    directory, VARIANTS_DIRECTORY, f"variant.{extension}"
+                ),
+                ContentFile(data),
+            )
+
+            variants.append(
+                {
+                    "name": name,
+                    "width": width,
+                    "height": height,
+                    "format": extension,
+                }
+            )
+
+    return sorted(variants, key=lambda variant: variant["width"])
+
+
+def difference_hash(image: Image.Image) -> str:
+    """Return 64 bit perceptual hash as 16 hex digits: whether every
+    pixel of 9x8 grayscale thumbnail is brighter than its right
+    neighbour. Similar images have hashes which differ in a few bits"""
+    pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    values = pixels.tobytes()
+
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            left, right = values[row * 9 + column:row * 9 + column + 2]
+            bits = bits << 1 | (left > right)
+
+    return f"{bits:016x}"
+
+
+def mark_uploads(instance, fields: list[str]) -> list[str]:
+    """Prepare newly uploaded image fields of instance before it is
+    saved, return names of fields which have to be processed. Upload
+    identical to processed image of other row reuses its files, others
+    are marked processing. Every image field has `<field>_variants`,
+    `<field>_status`, `<field>_phash` and `<field>_hash` fields"""
+    uploaded = []
+    for field in fields:
+        file = getattr(instance, field)
+        if file and file._committed:
+            continue
+
+        values = {
+            f"{field}_variants": [],
+            f"{field}_phash": "",
+            f"{field}_hash": "",
+            f"{field}_status": READY,
+        }
+        if file:
+            values[f"{field}_hash"] = content_hash(file.file)
+            processed = (
+                type(instance)._default_manager.filter(
+                    **{
+                        f"{field}_hash": values[f"{field}_hash"],
+                        f"{field}_status": READY,
+                    }
+                )
+                .values(field, f"{field}_variants", f"{field}_phash")
+                .first()
+            )
+            if processed:
+                values.update(processed)
+            else:
+                values[f"{field}_status"] = PROCESSING
+                uploaded.append(field)
+
+        for attribute, value in values.items():
+            setattr(instance, attribute, value)
+
+    return uploaded
+
+
+def stored_names(instance, fields: list[str]) -> dict[str, set[str]]:
+    """Return names of stored files (original and variants) of every
+    image field loaded in instance"""
+    deferred = instance.get_deferred_fields()
+    names = {}
+    for field in fields:
+        if {field, f"{field}_variants"} & deferred:
+            continue
+
+        file = getattr(instance, field)
+        names[field] = {
+            variant["name"]
+            for variant in getattr(instance, f"{field}_variants")
+        }
+        if file:
+            names[field].add(file.name)
+
+    return names
+
+
+def process_stored(file: FieldFile) -> dict:
+    """Decode stored image once, save its copy without metadata,
+    variants and perceptual hash. Return new values of image fields of
+    model instance, the original is left in storage"""
+    with file.open("rb"):
+        image, image_format = decode(file.file)
+    if image_format not in ORIGINAL_FORMATS:
+        image_format = "PNG"
+
+    field = file.field.name
+    # name is generated by upload_to of field
+    file.save(
+        f"{field}{ORIGINAL_FORMATS[image_format]}",
+        ContentFile(encode(image, image_format, ORIGINAL_QUALITY)),
+        save=False,
+    )
+    directory = posixpath.dirname(file.name)
+
+    return {
+        field: file.name,
+        f"{field}_variants": save_variants(image, file.storage, directory),
+        f"{field}_phash": difference_hash(image),
+        f"{field}_status": READY,
+    }
+
+
+def create_variants(file: FieldFile) -> list[dict]:
+    """Create variants of already saved image field file"""
+    with file.open("rb"):
+        image, _ = decode(file.file)
+
+    return save_variants(image, file.storage, posixpath.dirname(file.name))
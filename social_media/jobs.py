@@ -0,0 +1,146 @@
+"""Background jobs: functions registered with `job` are queued with
+`enqueue(function, **kwargs)` (kwargs must be JSON serializable) and run
+by `python manage.py run_worker` outside of request. Queue backend is set
+with JOB_QUEUE_BACKEND"""
+import time
+import traceback
+from datetime import timedelta
+from threading import Event
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# registered job functions by their names
+registry: dict[str, Callable] = {}
+
+
+def job(function: Callable) -> Callable:
+    """Register function so it can be queued"""
+    registry[job_name(function)] = function
+    return function
+
+
+def job_name(function: Callable) -> str:
+    return f"{function.__module__}.{function.__qualname__}"
+
+
+class DatabaseQueue:
+    """Jobs are rows of Job table. Workers claim them with
+    SELECT ... FOR UPDATE SKIP LOCKED, so they do not wait for each other
+    and every job is run by one worker"""
+
+    def enqueue(self, name: str, kwargs: dict) -> None:
+        # job is inserted in transaction of caller, so worker sees it
+        # after data it works on is committed
+        Job.objects.create(name=name, kwargs=kwargs)
+
+    def claim(self) -> Job | None:
+        """Mark the oldest job which should run now as running and
+        return it"""
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status=Job.Status.QUEUED, run_at__lte=now)
+                .order_by("run_at")
+                .first()
+            )
+            if claimed is None:
+                return None
+
+            claimed.status = Job.Status.RUNNING
+            claimed.attempts += 1
+            claimed.started_at = now
+            claimed.save(update_fields=["status", "attempts", "started_at"])
+
+        return claimed
+
+    def requeue_stale(self) -> int:
+        """Queue again jobs which run longer than JOB_TIMEOUT, their
+        worker died"""
+        started_before = timezone.now() - timedelta(
+            seconds=settings.JOB_TIMEOUT
+        )
+        return Job.objects.filter(
+            status=Job.Status.RUNNING, started_at__lt=started_before
+        ).update(status=Job.Status.QUEUED)
+
+
+class ImmediateQueue:
+    """Run job right away in process which queued it, for development
+    without worker"""
+
+    def enqueue(self, name: str, kwargs: dict) -> None:
+        registry[name](**kwargs)
+
+
+def get_queue():
+    return import_string(settings.JOB_QUEUE_BACKEND)()
+
+
+def enqueue(function: Callable, **kwargs) -> None:
+    get_queue().enqueue(job_name(function), kwargs)
+
+
+def run_job(claimed: Job) -> bool:
+    """Run claimed job, delete it when it succeeds, otherwise queue it
+    again with growing delay or mark it failed after JOB_MAX_ATTEMPTS"""
+    try:
+        registry[claimed.name](**claimed.kwargs)
+    except Exception:
+        claimed.error = traceback.format_exc()
+        if claimed.attempts >= settings.JOB_MAX_ATTEMPTS:
+            claimed.status = Job.Status.FAILED
+        else:
+            claimed.status = Job.Status.QUEUED
+            claimed.run_at = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (claimed.attempts - 1)
+            )
+        claimed.save(update_fields=["status", "run_at", "error"])
+        return False
+
+    claimed.delete()
+    return True
+
+
+def work(
+    burst: bool = False,
+    poll_interval: float = 1,
+    stop: Event | None = None,
+    log: Callable[[str], None] | None = None,
+) -> int:
+    """Run queued jobs until stop is set or, in burst mode, until queue
+    has no job which should run now. Return number of jobs run"""
+    queue = DatabaseQueue()
+    done = 0
+    while stop is None or not stop.is_set():
+        claimed = queue.claim()
+        if claimed is None:
+            if burst:
+                break
+            queue.requeue_stale()
+            # like between requests, drop broken and too old connections
+            close_old_connections()
+            if stop is None:
+                time.sleep(poll_interval)
+            else:
+                stop.wait(poll_interval)
+            continue
+
+        succeeded = run_job(claimed)
+        done += 1
+        if log:
+            if succeeded:
+                result = "done"
+            elif claimed.status == Job.Status.QUEUED:
+                result = f"failed, retry at {claimed.run_at:%H:%M:%S}"
+            else:
+                result = "failed"
+            log(f"{claimed.name} {claimed.kwargs} {result}")
+
+    return done
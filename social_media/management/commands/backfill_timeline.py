@@ -0,0 +1,71 @@
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Q
+
+from social_media.counters import reconcile_counters
+from social_media.models import Profile
+from social_media.timeline import backfill_timeline, update_celebrity_status
+
+
+class Command(BaseCommand):
+    """Push followed authors posts into profiles home timelines"""
+
+    help = (
+        "Backfill home timelines with latest posts of followed profiles. "
+        "By default every profile timeline is backfilled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            type=int,
+            action="append",
+            dest="profiles",
+            help="Id of profile which timeline will be backfilled",
+        )
+        parser.add_argument(
+            "--author",
+            type=int,
+            action="append",
+            dest="authors",
+            help="Backfill only posts of followed profile with this id",
+        )
+        parser.add_argument(
+            "--update-celebrities",
+            action="store_true",
+            help=(
+                "Recount stored numbers of followers and update celebrity "
+                "status of followed and celebrity profiles before "
+                "backfilling"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["update_celebrities"]:
+            fixed = reconcile_counters(Profile)
+            self.stdout.write(f"Recounted followers of {fixed} profiles")
+            # celebrity without followers has to be demoted too
+            authors = Profile.objects.filter(
+                Q(followers__isnull=False) | Q(is_celebrity=True)
+            )
+            for author in authors.distinct().iterator():
+                update_celebrity_status(author)
+
+        profiles = Profile.objects.all()
+
+        if options["profiles"]:
+            profiles = profiles.filter(id__in=options["profiles"])
+            if not profiles.exists():
+                raise CommandError("Profiles do not exist")
+
+        pushed = 0
+        for profile in profiles.iterator():
+            authors = profile.followings.all()
+
+            if options["authors"]:
+                authors = authors.filter(id__in=options["authors"])
+
+            pushed += backfill_timeline(profile, authors=authors)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pushed {pushed} posts into home timelines"
+        ))
@@ -0,0 +1,187 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from social_media.api_benchmark import (
+    BASELINE_PATH,
+    DEFAULT_VOLUMES,
+    ENDPOINTS,
+    compare,
+    measure,
+    missing_endpoints,
+    seed,
+)
+
+
+class Command(BaseCommand):
+    """Measure queries and latency of every API endpoint on synthetic
+    data and compare them with stored baseline"""
+
+    help = (
+        "Seed throwaway test database, send request to every route of "
+        "social_media and user urls and report number of queries, DB, "
+        "serialization and total time. Fails when endpoint regressed "
+        "against baseline file."
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name}", type=int, default=default)
+        parser.add_argument("--repeats", type=int, default=5)
+        parser.add_argument(
+            "--endpoint",
+            default="",
+            help="Benchmark only endpoints which key contains this text",
+        )
+        parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Write results into baseline file instead of comparing",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed relative slowdown of timings",
+        )
+        parser.add_argument(
+            "--slack-ms",
+            type=float,
+            default=5.0,
+            help="Allowed absolute slowdown of timings",
+        )
+        parser.add_argument(
+            "--queries-only",
+            action="store_true",
+            help="Compare only number of queries, timings depend on machine",
+        )
+
+    def handle(self, *args, **options):
+        missing = missing_endpoints()
+        if missing:
+            raise CommandError(
+                "Routes without benchmarked endpoint: " + ", ".join(missing)
+            )
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={"default"}
+        )
+
+        try:
+            # debug toolbar and query log are not measured, like in tests
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(DEBUG=False, MEDIA_ROOT=media_root):
+                    results = self.run_benchmark(**options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        if options["update_baseline"]:
+            self.write_baseline(options["baseline"], volumes, results)
+        else:
+            self.check_baseline(volumes, results, **options)
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def run_benchmark(self, **options) -> dict:
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        self.log(f"Seeding {volumes}")
+        fixtures = seed(**volumes)
+
+        self.log(
+            f"{'endpoint':<52} {'queries':>7} {'db':>9} "
+            f"{'serialize':>10} {'total':>9}"
+        )
+        results = {}
+        for endpoint in ENDPOINTS:
+            if options["endpoint"] not in endpoint.key:
+                continue
+
+            try:
+                measurement = measure(endpoint, fixtures, options["repeats"])
+            except RuntimeError as error:
+                raise CommandError(error)
+
+            results[endpoint.key] = measurement.as_dict()
+            self.log(
+                f"{endpoint.key:<52} {measurement.queries:>7} "
+                f"{measurement.db_ms:>7.2f}ms "
+                f"{measurement.serialize_ms:>8.2f}ms "
+                f"{measurement.total_ms:>7.2f}ms"
+            )
+
+        return results
+
+    def write_baseline(self, path: Path, volumes: dict, results: dict):
+        baseline = {
+            "database": connection.vendor,
+            "volumes": volumes,
+            "endpoints": results,
+        }
+        if path.exists():
+            # keep endpoints which were not benchmarked in this run
+            old = json.loads(path.read_text())
+            if old["volumes"] == volumes:
+                baseline["endpoints"] = {**old["endpoints"], **results}
+
+        path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        self.log(self.style.SUCCESS(f"Baseline written to {path}"))
+
+    def check_baseline(self, volumes: dict, results: dict, **options):
+        path = options["baseline"]
+        if not path.exists():
+            raise CommandError(
+                f"Baseline {path} does not exist, create it with "
+                "--update-baseline"
+            )
+
+        baseline = json.loads(path.read_text())
+        timings = not options["queries_only"]
+        if timings and (
+            baseline["volumes"] != volumes
+            or baseline["database"] != connection.vendor
+        ):
+            timings = False
+            self.log(
+                self.style.WARNING(
+                    "Baseline was measured on other volumes or database, "
+                    "only number of queries is compared"
+                )
+            )
+
+        new = sorted(set(results) - set(baseline["endpoints"]))
+        if new:
+            self.log(
+                self.style.WARNING(
+                    "Endpoints missing in baseline: " + ", ".join(new)
+                )
+            )
+
+        regressions = compare(
+            results,
+            baseline["endpoints"],
+            options["tolerance"],
+            options["slack_ms"],
+            timings,
+        )
+        if regressions:
+            raise CommandError(
+                "Regressions against baseline:\n" + "\n".join(regressions)
+            )
+
+        self.log(self.style.SUCCESS("No regressions against baseline"))
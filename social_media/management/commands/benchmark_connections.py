@@ -0,0 +1,189 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from social_media.benchmark_utils import percentile
+from social_media.sample_data import create_number_of_posts
+from social_media_api.postgresql_pool.base import close_pools
+
+# DATABASES["default"] values of every benchmarked connection handling
+MODES = {
+    "per-request": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+    "pool": {
+        "ENGINE": "social_media_api.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {"minconn": 0, "maxconn": 100, "idle_timeout": 600},
+    },
+}
+
+
+class Command(BaseCommand):
+    """Load test with worker threads calling WSGI handler like threads of
+    application server, once for every way database connections are
+    handled"""
+
+    help = (
+        "Send requests from several threads through the whole WSGI stack "
+        "and report latency and database connections opened per request "
+        "with connection per request, persistent connections and "
+        "connection pool. Needs PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes",
+            nargs="+",
+            choices=list(MODES),
+            default=list(MODES),
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Number of threads sending requests at the same time",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of requests sent by every thread",
+        )
+        parser.add_argument(
+            "--path",
+            default=None,
+            help="Requested path, post detail by default",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Connection benchmark needs PostgreSQL")
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={"default"}
+        )
+
+        try:
+            with override_settings(DEBUG=False):
+                self.run_benchmark(**options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def run_benchmark(self, **options):
+        author = (
+            get_user_model()
+            .objects.create_user(
+                email="author@example.com", username="author", password="bench"
+            )
+            .profile
+        )
+        post = create_number_of_posts(1, author)[0]
+        path = options["path"] or reverse(
+            "social_media:post-detail", args=[post.id]
+        )
+
+        # connections of new threads are created from these settings
+        database = connections.settings["default"]
+        original = database.copy()
+
+        results = []
+        for mode in options["modes"]:
+            database.update(MODES[mode])
+            try:
+                results.append(
+                    (
+                        mode,
+                        *self.load(
+                            path, options["threads"], options["requests"]
+                        ),
+                    )
+                )
+            finally:
+                database.clear()
+                database.update(original)
+                close_pools()
+
+        self.log(
+            f"{'mode':<12} {'req/s':>8} {'p50':>10} {'p95':>10} "
+            f"{'connects/req':>13}"
+        )
+        for mode, latencies, elapsed, connects in results:
+            self.log(
+                f"{mode:<12} {len(latencies) / elapsed:>8.0f} "
+                f"{percentile(latencies, 50) * 1000:>8.2f}ms "
+                f"{percentile(latencies, 95) * 1000:>8.2f}ms "
+                f"{connects / len(latencies):>13.2f}"
+            )
+
+    def load(
+        self, path: str, threads: int, requests: int
+    ) -> tuple[list[float], float, int]:
+        """Return latencies of requests, time of the whole load and number
+        of connections opened"""
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        latencies = []
+        connects = []
+        lock = threading.Lock()
+
+        def count_connect(connection, **kwargs):
+            # pooled connection is reused by several django connections,
+            # references keep ids of closed connections unique
+            with lock:
+                connects.append(connection.connection)
+
+        def start_response(status, headers):
+            if not status.startswith("200"):
+                raise CommandError(f"{path} returned {status}")
+
+        def worker():
+            times = []
+            try:
+                for _ in range(requests):
+                    environ = factory.get(path).environ
+                    start = time.perf_counter()
+                    response = handler(environ, start_response)
+                    b"".join(response)
+                    # sends request_finished, connections are closed or
+                    # returned to pool
+                    response.close()
+                    times.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(times)
+
+        connection_created.connect(count_connect)
+        try:
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(count_connect)
+
+        return latencies, elapsed, len({id(raw) for raw in connects})
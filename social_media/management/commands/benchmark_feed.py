@@ -0,0 +1,219 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from social_media.benchmark_utils import percentile
+from social_media.models import Profile, Post, TimelineEntry
+from social_media.timeline import (
+    change_follower_counts,
+    fan_out_post,
+    update_celebrity_status,
+)
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    """Measure home feed latency for followers of authors with
+    different number of followers on synthetic data"""
+
+    help = (
+        "Seed throwaway test database with synthetic profiles, follows and "
+        "posts and report p50/p99 latency of following posts feed and "
+        "fan-out of new post for every author size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--followers",
+            type=int,
+            nargs="+",
+            default=[10000, 1000000],
+            help="Number of followers of every benchmarked author",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=int,
+            default=None,
+            help="Override TIMELINE_CELEBRITY_THRESHOLD setting",
+        )
+        parser.add_argument("--posts", type=int, default=200)
+        parser.add_argument("--reads", type=int, default=200)
+        parser.add_argument("--fan-outs", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={"default"}
+        )
+
+        try:
+            settings_override = {}
+            if options["threshold"] is not None:
+                settings_override["TIMELINE_CELEBRITY_THRESHOLD"] = options[
+                    "threshold"
+                ]
+
+            with override_settings(**settings_override):
+                self.run_benchmark(**options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def create_profiles(self, number: int) -> list[int]:
+        """Bulk create users with profiles, return profiles ids"""
+        password = make_password("benchmark")
+        user_model = get_user_model()
+
+        for start in range(0, number, BATCH_SIZE):
+            users = [
+                user_model(
+                    email=f"bench{i}@example.com",
+                    username=f"bench{i}",
+                    password=password,
+                )
+                for i in range(start, min(start + BATCH_SIZE, number))
+            ]
+            user_model.objects.bulk_create(users)
+            self.log(f"  created {start + len(users)}/{number} users")
+
+        user_ids = user_model.objects.filter(
+            username__startswith="bench"
+        ).values_list("id", flat=True)
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id) for user_id in user_ids.iterator()],
+            batch_size=BATCH_SIZE,
+        )
+
+        return list(
+            Profile.objects.filter(
+                user__username__startswith="bench"
+            ).order_by("id").values_list("id", flat=True)
+        )
+
+    @staticmethod
+    def create_author(username: str, posts: int) -> Profile:
+        author = get_user_model().objects.create_user(
+            email=f"{username}@example.com",
+            username=username,
+            password="benchmark",
+        ).profile
+        Post.objects.bulk_create(
+            [Post(author=author, content=str(i)) for i in range(posts)]
+        )
+        return author
+
+    @staticmethod
+    def follow(author: Profile, follower_ids: list[int]):
+        through = Profile.followings.through
+        for start in range(0, len(follower_ids), BATCH_SIZE):
+            through.objects.bulk_create(
+                [
+                    through(from_profile_id=follower_id, to_profile=author)
+                    for follower_id in follower_ids[start:start + BATCH_SIZE]
+                ]
+            )
+        # follows were created without signals
+        change_follower_counts([author.pk], len(follower_ids))
+
+    @staticmethod
+    def push(author: Profile, reader_ids: list[int]):
+        """Push author posts into readers timelines"""
+        posts = list(author.posts.all())
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    profile_id=reader_id,
+                    post=post,
+                    created_at=post.created_at,
+                )
+                for reader_id in reader_ids
+                for post in posts
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    def run_benchmark(self, **options):
+        rnd = random.Random(options["seed"])
+        followers = sorted(options["followers"])
+
+        self.log(f"Seeding {followers[-1]} profiles")
+        profile_ids = self.create_profiles(followers[-1])
+
+        client = APIClient()
+        url = reverse("social_media:post-list")
+        results = []
+
+        for number in followers:
+            self.log(f"Seeding author with {number} followers")
+            author = self.create_author(f"author{number}", options["posts"])
+            # every reader also follows regular author, so its timeline is
+            # merged with celebrity posts
+            background = self.create_author(
+                f"background{number}", options["posts"]
+            )
+
+            follower_ids = profile_ids[:number]
+            readers = rnd.sample(
+                follower_ids, min(options["reads"], len(follower_ids))
+            )
+            self.follow(author, follower_ids)
+            self.follow(background, readers)
+            update_celebrity_status(author)
+
+            self.push(background, readers)
+            if not author.is_celebrity:
+                self.push(author, readers)
+
+            fan_out_times = []
+            for i in range(options["fan_outs"]):
+                post = Post.objects.create(author=author, content="new")
+                start = time.perf_counter()
+                fan_out_post(post)
+                fan_out_times.append(time.perf_counter() - start)
+
+            read_times = []
+            for reader in Profile.objects.filter(
+                id__in=readers
+            ).select_related("user"):
+                client.force_authenticate(reader.user)
+                start = time.perf_counter()
+                response = client.get(url, {"following_posts": 1})
+                read_times.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+            results.append(
+                (number, author.is_celebrity, read_times, fan_out_times)
+            )
+
+        self.log("")
+        self.log(
+            f"{'followers':>10} {'mode':>5} {'feed p50':>10} "
+            f"{'feed p99':>10} {'fan-out p50':>12}"
+        )
+        for number, is_celebrity, read_times, fan_out_times in results:
+            self.log(
+                f"{number:>10} {'pull' if is_celebrity else 'push':>5} "
+                f"{percentile(read_times, 50) * 1000:>8.2f}ms "
+                f"{percentile(read_times, 99) * 1000:>8.2f}ms "
+                f"{statistics.median(fan_out_times) * 1000:>10.2f}ms"
+            )
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import path
+from django.views.static import serve
+
+from social_media.benchmark_utils import percentile
+from social_media.media_views import serve_media
+
+
+def static_view(request, path):
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+# benchmarked views, the command uses this module as ROOT_URLCONF
+urlpatterns = [
+    path("static/<path:path>", static_view),
+    path("media/<path:path>", serve_media),
+]
+
+# request headers of every scenario, revalidation sends validators of
+# the first response
+SCENARIOS = {
+    "full": {},
+    "revalidate": None,
+    "range 64KB": {"HTTP_RANGE": "bytes=0-65535"},
+}
+
+
+class Command(BaseCommand):
+    """Load test of media serving through WSGI handler. Response body is
+    copied to /dev/null through Python or, like gunicorn does with
+    wsgi.file_wrapper, sent with sendfile without copying"""
+
+    help = (
+        "Report throughput of media view (ETag, Range, sendfile) and "
+        "django.views.static.serve used before for full downloads, "
+        "revalidation of cached files and range requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[64, 1024, 8192],
+            help="Sizes of served files in KB",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Number of requests of every scenario",
+        )
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        try:
+            with override_settings(
+                DEBUG=False,
+                MEDIA_ROOT=media_root,
+                MEDIA_SENDFILE_HEADER="",
+                ROOT_URLCONF=__name__,
+                MIDDLEWARE=[
+                    middleware
+                    for middleware in settings.MIDDLEWARE
+                    if not middleware.startswith("debug_toolbar.")
+                ],
+            ):
+                self.run_benchmark(media_root, **options)
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(media_root)
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def run_benchmark(self, media_root: str, **options):
+        self.log(
+            f"{'size':>7} {'scenario':<11} {'view':<7} {'body':<9} "
+            f"{'req/s':>8} {'MB/s':>8} {'p50':>10}"
+        )
+        with open(os.devnull, "wb") as sink:
+            for size in options["sizes"]:
+                name = self.create_file(media_root, size * 1024)
+                for scenario, headers in SCENARIOS.items():
+                    for view in ("static", "media"):
+                        for sendfile in (False, True):
+                            self.report(
+                                size,
+                                scenario,
+                                view,
+                                sendfile,
+                                *self.load(
+                                    f"/{view}/{name}",
+                                    headers,
+                                    sink,
+                                    sendfile,
+                                    options["threads"],
+                                    options["requests"],
+                                ),
+                            )
+
+    @staticmethod
+    def create_file(media_root: str, size: int) -> str:
+        """Save file of random bytes under its hash like content
+        addressed storage does"""
+        data = os.urandom(size)
+        name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+        with open(os.path.join(media_root, name), "wb") as file:
+            file.write(data)
+        return name
+
+    def report(self, size, scenario, view, sendfile, latencies, sent, elapsed):
+        self.log(
+            f"{size:>5}KB {scenario:<11} {view:<7} "
+            f"{'sendfile' if sendfile else 'copy':<9} "
+            f"{len(latencies) / elapsed:>8.1f} "
+            f"{sent / elapsed / 1024 / 1024:>8.1f} "
+            f"{percentile(latencies, 50) * 1000:>8.2f}ms"
+        )
+
+    def load(
+        self,
+        url: str,
+        headers: dict | None,
+        sink,
+        sendfile: bool,
+        threads: int,
+        requests: int,
+    ) -> tuple[list[float], int, float]:
+        """Return latencies, number of body bytes sent and time of the
+        whole load"""
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        if headers is None:
+            _, response_headers, _ = self.send(
+                handler, factory.get(url).environ, sink, sendfile
+            )
+            headers = {
+                "HTTP_IF_NONE_MATCH": response_headers.get("ETag", ""),
+                "HTTP_IF_MODIFIED_SINCE": response_headers["Last-Modified"],
+            }
+
+        latencies = []
+        sent = []
+        lock = threading.Lock()
+        remaining = iter(range(requests))
+
+        def worker():
+            while next(remaining, None) is not None:
+                environ = factory.get(url, **headers).environ
+                start = time.perf_counter()
+                _, _, body = self.send(handler, environ, sink, sendfile)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    sent.append(body)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        return latencies, sum(sent), time.perf_counter() - start
+
+    @staticmethod
+    def send(handler, environ, sink, sendfile: bool):
+        """Run request like WSGI server, return status, headers and number
+        of body bytes written to sink"""
+        environ["wsgi.file_wrapper"] = FileWrapper
+        started = {}
+
+        def start_response(status, headers):
+            if not status.startswith(("200", "206", "304")):
+                raise CommandError(f"{environ['PATH_INFO']} returned {status}")
+            started["status"] = status
+            started["headers"] = dict(headers)
+
+        response = handler(environ, start_response)
+        written = 0
+        try:
+            filelike = getattr(response, "filelike", None)
+            if sendfile and hasattr(filelike, "fileno"):
+                # like gunicorn: Content-Length bytes from file position
+                fd = filelike.fileno()
+                offset = os.lseek(fd, 0, os.SEEK_CUR)
+                length = int(started["headers"]["Content-Length"])
+                while written < length:
+                    written += os.sendfile(
+                        sink.fileno(), fd, offset + written, length - written
+                    )
+            else:
+                for chunk in response:
+                    written += sink.write(chunk)
+        finally:
+            response.close()
+
+        return started["status"], started["headers"], written
@@ -0,0 +1,116 @@
+import posixpath
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from social_media.images import stored_names
+from social_media.models import MediaBlob, Post, Profile
+
+# directories of uploaded images and their variants
+MEDIA_DIRECTORIES = ["post_picture", "profile_pictures"]
+
+
+class Command(BaseCommand):
+    """Delete stored media files which no post or profile references"""
+
+    help = (
+        "Delete media files which were not referenced by posts and profiles "
+        "for --grace seconds. --recount counts references again and "
+        "registers files stored before content addressed storage, run it "
+        "when no images are uploaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=settings.MEDIA_GC_GRACE,
+            help="Seconds file has to be unreferenced before it is deleted",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Count references from posts and profiles and register "
+            "all files of media directories before collecting",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            self.recount(options["batch_size"])
+
+        deleted = 0
+        unreferenced_since = timezone.now() - timedelta(
+            seconds=options["grace"]
+        )
+        while True:
+            with transaction.atomic():
+                # blob saved again meanwhile is locked by its storage save
+                blobs = list(
+                    MediaBlob.objects.select_for_update(skip_locked=True)
+                    .filter(
+                        references__lte=0, updated_at__lt=unreferenced_since
+                    )
+                    .order_by("updated_at")[: options["batch_size"]]
+                )
+                if not blobs:
+                    break
+
+                for blob in blobs:
+                    default_storage.delete(blob.name)
+                MediaBlob.objects.filter(
+                    id__in=[blob.id for blob in blobs]
+                ).delete()
+                deleted += len(blobs)
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} files"))
+
+    def recount(self, batch_size: int):
+        references = Counter()
+        for model in (Post, Profile):
+            fields = model.image_fields + [
+                f"{field}_variants" for field in model.image_fields
+            ]
+            instances = model.objects.only(*fields)
+            for instance in instances.iterator(chunk_size=batch_size):
+                names = stored_names(instance, model.image_fields)
+                for field_names in names.values():
+                    references.update(field_names)
+
+        stored = set(self.stored_files())
+        with transaction.atomic():
+            MediaBlob.objects.update(references=0)
+            MediaBlob.objects.bulk_create(
+                [
+                    MediaBlob(name=name, references=references[name])
+                    for name in stored | set(references)
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["name"],
+                update_fields=["references"],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Counted references of {len(references)} files, "
+            f"{len(stored - set(references))} stored files are unreferenced"
+        ))
+
+    def stored_files(self, directories=MEDIA_DIRECTORIES):
+        for directory in directories:
+            if not default_storage.exists(directory):
+                continue
+            subdirectories, files = default_storage.listdir(directory)
+            for name in files:
+                yield posixpath.join(directory, name)
+            yield from self.stored_files(
+                [
+                    posixpath.join(directory, subdirectory)
+                    for subdirectory in subdirectories
+                ]
+            )
@@ -0,0 +1,508 @@
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.conf import settings
+from django.utils import timezone
+
+from taggit.models import Tag, TaggedItem
+
+from social_media.cache_versions import bump_versions, table_version_name
+from social_media.counters import actual_counters
+from social_media.images import READY
+from social_media.models import (
+    Profile,
+    Post,
+    PostRate,
+    Comment,
+    CommentRate,
+)
+
+WORDS = (
+    "photo today friends summer coffee city work music travel weekend "
+    "new great love morning night happy food book movie game team day"
+).split()
+
+# share of likes in generated reactions
+LIKE_SHARE = 0.8
+# shape of number of reactions per post, lower is heavier tail
+REACTIONS_PARETO_ALPHA = 1.5
+# NULL of COPY csv, empty unquoted values are empty strings
+NULL = r"\N"
+
+
+class TableWriter:
+    """Buffer rows of model and write them with COPY on PostgreSQL and
+    with INSERT executemany on other databases. Rows have explicit ids,
+    so references and comment paths are known before rows are written"""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = model._meta.concrete_fields
+        self.rows = []
+        self.written = 0
+        last_id = model.objects.aggregate(Max("id"))["id__max"]
+        self.next_id = (last_id or 0) + 1
+
+    def add(self, **values) -> int:
+        """Buffer row, return its id"""
+        row_id = self.next_id
+        self.next_id += 1
+        values["id"] = row_id
+        self.rows.append([values[field.attname] for field in self.fields])
+        return row_id
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        if connection.vendor == "postgresql":
+            self.copy()
+        else:
+            self.insert()
+
+        self.written += len(self.rows)
+        self.rows = []
+
+    def table(self) -> str:
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    def columns(self) -> str:
+        quote = connection.ops.quote_name
+        return ", ".join(quote(field.column) for field in self.fields)
+
+    def copy(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.rows:
+            writer.writerow([NULL if item is None else item for item in row])
+        buffer.seek(0)
+
+        sql = (
+            f"COPY {self.table()} ({self.columns()}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    def insert(self):
+        rows = [
+            [
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(self.fields, row)
+            ]
+            for row in self.rows
+        ]
+        placeholders = ", ".join(["%s"] * len(self.fields))
+        sql = (
+            f"INSERT INTO {self.table()} ({self.columns()}) "
+            f"VALUES ({placeholders})"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class Command(BaseCommand):
+    """Fill database with large amount of synthetic users, follows, posts,
+    tags, comments and reactions for load testing"""
+
+    help = (
+        "Generate synthetic users with profiles, follows where a few "
+        "profiles have most followers, posts with tags, comment threads "
+        "and reactions. The same seed generates the same data. Rows are "
+        "added to existing data of default database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--followings",
+            type=float,
+            default=50,
+            help="Average number of profiles every profile follows",
+        )
+        parser.add_argument(
+            "--follow-skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of profiles popularity, 0 is uniform",
+        )
+        parser.add_argument(
+            "--posts",
+            type=float,
+            default=10,
+            help="Average number of posts of every profile",
+        )
+        parser.add_argument("--tags", type=int, default=1000)
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=3,
+            help="Average number of top comments under every post",
+        )
+        parser.add_argument(
+            "--replies",
+            type=float,
+            default=0.8,
+            help="Average number of replies under every top comment",
+        )
+        parser.add_argument(
+            "--reply-decay",
+            type=float,
+            default=0.5,
+            help="Average number of replies is multiplied by it every level",
+        )
+        parser.add_argument("--max-depth", type=int, default=8)
+        parser.add_argument(
+            "--post-reactions",
+            type=float,
+            default=20,
+            help="Average number of reactions under every post",
+        )
+        parser.add_argument(
+            "--comment-reactions",
+            type=float,
+            default=1,
+            help="Average number of reactions under every comment",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Posts are created during this number of last days",
+        )
+        parser.add_argument("--password", default="generated-password")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options["seed"])
+        self.options = options
+        self.started = time.perf_counter()
+        self.now = timezone.now()
+
+        self.users = TableWriter(get_user_model())
+        self.profiles = TableWriter(Profile)
+        self.follows = TableWriter(Profile.followings.through)
+        self.tags = TableWriter(Tag)
+        self.posts = TableWriter(Post)
+        self.tagged_items = TableWriter(TaggedItem)
+        self.post_rates = TableWriter(PostRate)
+        self.comments = TableWriter(Comment)
+        self.comment_rates = TableWriter(CommentRate)
+        # parents go first, so every batch references written rows
+        self.writers = [
+            self.users,
+            self.profiles,
+            self.follows,
+            self.tags,
+            self.posts,
+            self.tagged_items,
+            self.post_rates,
+            self.comments,
+            self.comment_rates,
+        ]
+
+        self.first_profile_id = self.profiles.next_id
+        self.generate_profiles()
+        self.generate_follows()
+        self.generate_tags()
+        self.generate_posts()
+        self.flush(force=True)
+        self.finish()
+
+    def flush(self, force: bool = False):
+        """Write buffered rows when any buffer is full"""
+        if not force and all(
+            len(writer.rows) < self.options["batch_size"]
+            for writer in self.writers
+        ):
+            return
+
+        with transaction.atomic():
+            for writer in self.writers:
+                writer.flush()
+
+    def report(self, stage: str, done: int, total: int):
+        elapsed = time.perf_counter() - self.started
+        written = sum(writer.written for writer in self.writers)
+        self.log(
+            f"  {stage} {done}/{total}, {written} rows written "
+            f"in {elapsed:.1f}s"
+        )
+
+    def random_profile_ids(self, number: int) -> list[int]:
+        """Return number of distinct random profile ids"""
+        users = self.options["users"]
+        return [
+            self.first_profile_id + index
+            for index in self.rnd.sample(range(users), min(number, users))
+        ]
+
+    def average(self, mean: float) -> int:
+        """Return random count, mean of counts is mean"""
+        if mean <= 0:
+            return 0
+        return int(self.rnd.expovariate(1 / mean) + 0.5)
+
+    def content(self) -> str:
+        return " ".join(self.rnd.choices(WORDS, k=self.rnd.randint(3, 30)))
+
+    def generate_profiles(self):
+        users = self.options["users"]
+        password = make_password(self.options["password"])
+        self.log(f"Generating {users} users and profiles")
+
+        for i in range(users):
+            user_id = self.users.add(
+                password=password,
+                last_login=None,
+                is_superuser=False,
+                username=f"gen{self.users.next_id}",
+                first_name="",
+                last_name="",
+                email=f"gen{self.users.next_id}@example.com",
+                is_staff=False,
+                is_active=True,
+                date_joined=self.now
+                - timedelta(days=self.rnd.uniform(0, self.options["days"])),
+            )
+            self.profiles.add(
+                user_id=user_id,
+                profile_picture="",
+                profile_picture_variants=[],
+                profile_picture_status=READY,
+                profile_picture_phash="",
+                profile_picture_hash="",
+                bio=self.content(),
+                is_celebrity=False,
+                follower_count=0,
+            )
+
+            if (i + 1) % self.options["batch_size"] == 0:
+                self.flush()
+                self.report("profiles", i + 1, users)
+
+        self.flush(force=True)
+
+    def generate_follows(self):
+        """Every profile follows random number of profiles, profiles are
+        picked by Zipf distribution, so a few of them have most followers"""
+        users = self.options["users"]
+        self.log(f"Generating follows of {users} profiles")
+
+        popular = list(range(users))
+        self.rnd.shuffle(popular)
+        weights = itertools.accumulate(
+            1 / (rank + 1) ** self.options["follow_skew"]
+            for rank in range(users)
+        )
+        cum_weights = list(weights)
+
+        for i in range(users):
+            number = min(self.average(self.options["followings"]), users - 1)
+            indexes = self.rnd.choices(
+                popular, cum_weights=cum_weights, k=number
+            )
+            for index in set(indexes) - {i}:
+                self.follows.add(
+                    from_profile_id=self.first_profile_id + i,
+                    to_profile_id=self.first_profile_id + index,
+                )
+
+            if (i + 1) % self.options["batch_size"] == 0:
+                self.flush()
+                self.report("follows of profiles", i + 1, users)
+
+        self.flush(force=True)
+
+    def generate_tags(self):
+        self.tag_ids = [
+            self.tags.add(
+                name=f"generated{self.tags.next_id}",
+                slug=f"generated{self.tags.next_id}",
+            )
+            for _ in range(self.options["tags"])
+        ]
+        # first tags are the most popular
+        self.tag_weights = list(
+            itertools.accumulate(
+                1 / (rank + 1) for rank in range(len(self.tag_ids))
+            )
+        )
+        self.flush(force=True)
+
+    def generate_posts(self):
+        users = self.options["users"]
+        self.log(f"Generating posts, comments and reactions of {users} users")
+        self.post_content_type = ContentType.objects.get_for_model(Post).id
+
+        for i in range(users):
+            for _ in range(self.average(self.options["posts"])):
+                self.generate_post(self.first_profile_id + i)
+
+            self.flush()
+            if (i + 1) % 1000 == 0:
+                self.report("authors", i + 1, users)
+
+    def generate_post(self, author_id: int):
+        created_at = self.now - timedelta(
+            days=self.rnd.uniform(0, self.options["days"])
+        )
+        post_id = self.posts.next_id
+
+        # number of reactions has heavy tail, a few posts are viral
+        mean = self.options["post_reactions"]
+        pareto_mean = REACTIONS_PARETO_ALPHA / (REACTIONS_PARETO_ALPHA - 1)
+        number = int(
+            mean * self.rnd.paretovariate(REACTIONS_PARETO_ALPHA) / pareto_mean
+        )
+        likes, dislikes = self.generate_rates(
+            self.post_rates, "post_id", post_id, number
+        )
+        comments = self.generate_comments(post_id, created_at)
+
+        self.posts.add(
+            author_id=author_id,
+            image="",
+            image_variants=[],
+            image_status=READY,
+            image_phash="",
+            image_hash="",
+            content=self.content(),
+            created_at=created_at,
+            num_of_likes=likes,
+            num_of_dislikes=dislikes,
+            num_of_comments=comments,
+        )
+
+        if self.tag_ids:
+            tag_ids = self.rnd.choices(
+                self.tag_ids,
+                cum_weights=self.tag_weights,
+                k=self.rnd.randint(0, 3),
+            )
+            for tag_id in set(tag_ids):
+                self.tagged_items.add(
+                    object_id=post_id,
+                    content_type_id=self.post_content_type,
+                    tag_id=tag_id,
+                )
+
+    def generate_rates(
+        self, writer: TableWriter, field: str, object_id: int, number: int
+    ) -> tuple[int, int]:
+        """Add reactions of distinct profiles, return number of likes and
+        dislikes"""
+        likes = dislikes = 0
+        for profile_id in self.random_profile_ids(number):
+            like = self.rnd.random() < LIKE_SHARE
+            likes += like
+            dislikes += not like
+            writer.add(profile_id=profile_id, like=like, **{field: object_id})
+        return likes, dislikes
+
+    def generate_comments(self, post_id: int, post_created_at) -> int:
+        """Add comment threads under post, return number of comments"""
+        comments = []
+        # average number of replies of comment and its parent, top
+        # comments have "replies" replies, every level below has less
+        top_mean = self.options["replies"] / self.options["reply_decay"]
+        stack = [
+            (top_mean, None)
+            for _ in range(self.average(self.options["comments"]))
+        ]
+        while stack:
+            mean, parent = stack.pop()
+            comment_id = self.comments.next_id + len(comments)
+            created_at = (parent or {}).get("created_at", post_created_at)
+            comment = {
+                "id": comment_id,
+                "author_id": self.random_profile_ids(1)[0],
+                "post_id": post_id,
+                "content": self.content(),
+                "created_at": created_at
+                + timedelta(hours=self.rnd.expovariate(1 / 12)),
+                "reply_to_comment_id": parent and parent["id"],
+                "path": (parent["path"] if parent else "")
+                + f"{comment_id:0{Comment.PATH_STEP_LENGTH}d}/",
+                "depth": parent["depth"] + 1 if parent else 0,
+                "num_of_replies": 0,
+                "num_of_descendants": 0,
+                "parent": parent,
+            }
+            comment["thread_updated_at"] = comment["created_at"]
+            comments.append(comment)
+
+            if comment["depth"] < self.options["max_depth"]:
+                mean *= self.options["reply_decay"]
+                stack.extend(
+                    (mean, comment) for _ in range(self.average(mean))
+                )
+
+        # replies are after their parents, so counters are summed up
+        # from the deepest comments
+        for comment in reversed(comments):
+            parent = comment.pop("parent")
+            if parent:
+                parent["num_of_replies"] += 1
+                parent["num_of_descendants"] += (
+                    1 + comment["num_of_descendants"]
+                )
+                parent["thread_updated_at"] = max(
+                    parent["thread_updated_at"], comment["thread_updated_at"]
+                )
+
+        # comments are added in order of their precomputed ids
+        for comment in comments:
+            likes, dislikes = self.generate_rates(
+                self.comment_rates,
+                "comment_id",
+                comment.pop("id"),
+                self.average(self.options["comment_reactions"]),
+            )
+            self.comments.add(
+                num_of_likes=likes, num_of_dislikes=dislikes, **comment
+            )
+
+        return len(comments)
+
+    def finish(self):
+        self.log("Updating sequences and celebrity profiles")
+        models = [writer.model for writer in self.writers]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        generated_profiles = Profile.objects.filter(
+            id__gte=self.first_profile_id
+        )
+        generated_profiles.update(**actual_counters(Profile))
+        generated_profiles.filter(
+            follower_count__gte=settings.TIMELINE_CELEBRITY_THRESHOLD
+        ).update(is_celebrity=True)
+
+        # rows were written without signals
+        bump_versions([table_version_name(model) for model in models])
+
+        self.report("done,", self.options["users"], self.options["users"])
+        self.log(
+            self.style.SUCCESS(
+                "Data generated. Run `python manage.py backfill_timeline` "
+                "to push posts into home timelines of generated profiles"
+            )
+        )
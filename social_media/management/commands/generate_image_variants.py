@@ -0,0 +1,57 @@
+from django.core.management import BaseCommand
+
+from social_media.images import create_variants
+from social_media.models import Post, Profile
+
+# model, image field and field of its variants
+IMAGE_FIELDS = [
+    (Post, "image", "image_variants"),
+    (Profile, "profile_picture", "profile_picture_variants"),
+]
+
+
+class Command(BaseCommand):
+    """Create resized variants of images uploaded before upload pipeline
+    or after IMAGE_VARIANT_WIDTHS changed"""
+
+    help = (
+        "Create WebP and JPEG variants of post images and profile pictures "
+        "which have none. Originals are not changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recreate variants of all images, e.g. after "
+            "IMAGE_VARIANT_WIDTHS changed",
+        )
+
+    def handle(self, *args, **options):
+        for model, image_field, variants_field in IMAGE_FIELDS:
+            instances = model.objects.exclude(
+                **{f"{image_field}__isnull": True}
+            ).exclude(**{image_field: ""})
+            if not options["all"]:
+                instances = instances.filter(**{variants_field: []})
+
+            created = 0
+            instances = instances.only("id", image_field, variants_field)
+            for instance in instances.iterator():
+                image = getattr(instance, image_field)
+                try:
+                    variants = create_variants(image)
+                except OSError as error:
+                    # missing or broken file
+                    self.stderr.write(f"Skipped {image.name}: {error}")
+                    continue
+
+                # save signals count references of variants
+                setattr(instance, variants_field, variants)
+                instance.save(update_fields=[variants_field])
+                created += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Created variants of {created} "
+                f"{model._meta.verbose_name_plural}"
+            ))
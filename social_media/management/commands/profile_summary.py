@@ -0,0 +1,127 @@
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from social_media.profiling import read_profiles
+
+# modules of the project, their hottest frames are reported separately
+# from frames of django and libraries
+PROJECT_MODULES = ("social_media.", "user.", "social_media_api.")
+# middlewares measuring requests are in every sample
+INSTRUMENTATION_MODULES = ("social_media.metrics.", "social_media.profiling.")
+
+
+def read_stacks(path) -> Counter:
+    stacks = Counter()
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return stacks
+    for line in lines:
+        stack, _, count = line.rpartition(" ")
+        stacks[stack] += int(count)
+    return stacks
+
+
+def hottest_frames(stacks: Counter) -> tuple[Counter, Counter]:
+    """Return samples of leaf frames and of project frames anywhere in
+    the stack, project frame is counted once per sample"""
+    leaves, project = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        leaves[frames[-1]] += count
+        for frame in set(frames):
+            if frame.startswith(PROJECT_MODULES) and not frame.startswith(
+                INSTRUMENTATION_MODULES
+            ):
+                project[frame] += count
+    return leaves, project
+
+
+class Command(BaseCommand):
+    """Summarize profiles written by SlowRequestProfilerMiddleware"""
+
+    help = (
+        "Show endpoints with the slowest profiled requests and frames "
+        "where they spent the most samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            default=settings.PROFILING_DIR,
+            help="Directory with profiles (PROFILING_DIR by default)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="Number of the worst endpoints shown",
+        )
+        parser.add_argument(
+            "--frames",
+            type=int,
+            default=5,
+            help="Number of the hottest frames shown for every endpoint",
+        )
+
+    def handle(self, *args, **options):
+        profiles = read_profiles(options["dir"])
+        if not profiles:
+            self.stdout.write(f"No profiles in {options['dir']}")
+            return
+
+        by_view = defaultdict(list)
+        for profile in profiles:
+            by_view[f"{profile['method']} {profile['view']}"].append(profile)
+
+        worst = sorted(
+            by_view.items(),
+            key=lambda item: max(p["total_ms"] for p in item[1]),
+            reverse=True,
+        )[:options["limit"]]
+
+        self.stdout.write(
+            f"{'endpoint':<45} {'requests':>8} {'median':>10} "
+            f"{'max':>10} {'db':>10} {'queries':>8}"
+        )
+        for view, view_profiles in worst:
+            self.stdout.write(
+                f"{view:<45} {len(view_profiles):>8} "
+                f"{self.median(view_profiles, 'total_ms'):>8.1f}ms "
+                f"{max(p['total_ms'] for p in view_profiles):>8.1f}ms "
+                f"{self.median(view_profiles, 'db_ms'):>8.1f}ms "
+                f"{self.median(view_profiles, 'queries'):>8.0f}"
+            )
+
+        for view, view_profiles in worst:
+            self.report_frames(view, view_profiles, options["frames"])
+
+    @staticmethod
+    def median(profiles: list[dict], key: str) -> float:
+        return statistics.median(profile[key] for profile in profiles)
+
+    def report_frames(self, view: str, profiles: list[dict], limit: int):
+        stacks = Counter()
+        for profile in profiles:
+            stacks.update(read_stacks(profile["collapsed"]))
+        slowest = max(profiles, key=lambda profile: profile["total_ms"])
+
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING(view))
+        self.stdout.write(f"  slowest: {slowest['collapsed']}")
+
+        samples = sum(stacks.values())
+        if not samples:
+            self.stdout.write("  no stack samples")
+            return
+
+        leaves, project = hottest_frames(stacks)
+        for title, frames in (("self", leaves), ("project", project)):
+            self.stdout.write(f"  {title}:")
+            for frame, count in frames.most_common(limit):
+                self.stdout.write(
+                    f"    {count / samples:>6.1%} {frame}"
+                )
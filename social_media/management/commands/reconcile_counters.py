@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from social_media.counters import reconcile_counters
+from social_media.models import Post, Comment, Profile
+
+
+class Command(BaseCommand):
+    """Fix likes/dislikes/comments/replies/followers counters which
+    drifted from actual number of rates, comments and follows"""
+
+    help = (
+        "Recount stored counters of posts, comments and profiles. Counters "
+        "can drift when rates, comments or follows are deleted in cascade "
+        "with their profile."
+    )
+
+    def handle(self, *args, **options):
+        for model in [Post, Comment, Profile]:
+            fixed = reconcile_counters(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Fixed counters of {fixed} {model._meta.verbose_name_plural}"
+            ))
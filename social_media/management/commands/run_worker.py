@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import signal
+import threading
+
+from django.core.management import BaseCommand
+from django.db import connections
+
+from social_media.jobs import work
+
+
+def child_work(**options):
+    # parent stops children after their current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(**options)
+
+
+class Command(BaseCommand):
+    """Run background jobs (image processing) from database queue in pool
+    of worker processes, image processing is CPU bound"""
+
+    help = (
+        "Run queued background jobs. SIGTERM or Ctrl+C stops worker after "
+        "jobs which are running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes, number of CPUs by default",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit when there is no job to run",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1,
+            help="Seconds to wait for new jobs when queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        work_options = {
+            "burst": options["burst"],
+            "poll_interval": options["poll_interval"],
+            "log": self.log,
+        }
+        if options["processes"] == 1:
+            stop = threading.Event()
+            with StopOnSignals(stop):
+                done = work(stop=stop, **work_options)
+            self.stdout.write(self.style.SUCCESS(f"Run {done} jobs"))
+            return
+
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        # children must not share connection of parent
+        connections.close_all()
+        workers = [
+            context.Process(
+                target=child_work, kwargs={"stop": stop, **work_options}
+            )
+            for _ in range(options["processes"])
+        ]
+        with StopOnSignals(stop):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped"))
+
+    def log(self, message: str):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+
+class StopOnSignals:
+    """Set stop event on SIGINT and SIGTERM, restore handlers on exit"""
+
+    signals = (signal.SIGINT, signal.SIGTERM)
+
+    def __init__(self, stop):
+        self.stop = stop
+        self.previous = {}
+
+    def __enter__(self):
+        for signum in self.signals:
+            self.previous[signum] = signal.signal(signum, self.handle)
+
+    def __exit__(self, *exc_info):
+        for signum, handler in self.previous.items():
+            signal.signal(signum, handler)
+
+    def handle(self, signum, frame):
+        self.stop.set()
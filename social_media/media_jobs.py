@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.db import transaction
+
+from PIL import Image
+
+from .db_routers import use_primary
+from .images import FAILED, process_stored
+from .jobs import job
+
+
+def save_if_current(model, pk: int, field: str, name: str, values: dict):
+    """Save values of image fields unless image was replaced or deleted
+    while it was processed"""
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=pk).first()
+        if instance is None or getattr(instance, field).name != name:
+            return
+
+        for attribute, value in values.items():
+            setattr(instance, attribute, value)
+        # save signals invalidate cached responses with the image
+        instance.save(update_fields=list(values))
+
+
+@job
+def process_image(model: str, pk: int, field: str, name: str) -> None:
+    """Replace uploaded image `name` with copy without metadata, create
+    its variants and perceptual hash and mark it ready. Image is processed
+    without lock, so likes and comments of post are not blocked. Job can
+    run before replica has the row, so it and rows naming the files
+    (author of post, user of profile) are read from primary and job is
+    retried when row is not there yet"""
+    model = apps.get_model(model)
+    with use_primary():
+        _process_image(model, pk, field, name)
+
+
+def _process_image(model, pk: int, field: str, name: str) -> None:
+    instance = model.objects.get(pk=pk)
+    if getattr(instance, field).name != name:
+        return
+
+    file = getattr(instance, field)
+    try:
+        values = process_stored(file)
+    except (OSError, Image.DecompressionBombError):
+        # missing or broken file, retrying would not help
+        save_if_current(model, pk, field, name, {f"{field}_status": FAILED})
+        return
+
+    # unused files (original with metadata or result of replaced image)
+    # are deleted by garbage collector of storage
+    save_if_current(model, pk, field, name, values)
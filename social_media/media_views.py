@@ -0,0 +1,157 @@
+"""Serving of media files. Files of content addressed storage never
+change, so they get strong ETag from their hash and are cached forever.
+Files are sent by web server when MEDIA_SENDFILE_HEADER is set, otherwise
+FileResponse lets WSGI server send them with sendfile (e.g. gunicorn)"""
+import mimetypes
+import os
+import posixpath
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+CONTENT_HASH = re.compile(r"^[0-9a-f]{64}$")
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class FileRange:
+    """Part of open file, reading stops at its end. Servers which send
+    file with sendfile use its descriptor and send Content-Length bytes
+    from current position"""
+
+    def __init__(self, file, start: int, length: int):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return first and last byte of Range header, None when the whole
+    file is sent (invalid header or several ranges). Raise ValueError
+    when range starts after the end of file"""
+    match = BYTE_RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # the last bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty range")
+        return max(0, size - length), size - 1
+
+    first = int(first)
+    if first >= size:
+        raise ValueError("Range starts after end of file")
+    last = min(int(last), size - 1) if last else size - 1
+    if last < first:
+        return None
+    return first, last
+
+
+def file_validators(path: str, stat: os.stat_result) -> tuple[str, str]:
+    """Return ETag and Cache-Control of media file. Name of content
+    addressed file is hash of its content"""
+    root, _ = posixpath.splitext(posixpath.basename(path))
+    if CONTENT_HASH.match(root):
+        return f'"{root}"', IMMUTABLE
+
+    # file stored before content addressed storage can be replaced
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"', "no-cache"
+
+
+@require_safe
+def serve_media(request, path: str):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("Media file does not exist")
+    if not S_ISREG(stat.st_mode):
+        raise Http404("Media file does not exist")
+
+    etag, cache_control = file_validators(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers.setdefault(header, value)
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+    if sendfile_header:
+        # web server sends the file and answers Range itself
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if sendfile_header == "X-Accel-Redirect":
+            location = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        else:
+            location = full_path
+        response[sendfile_header] = location
+        return response
+
+    start, length, status = 0, stat.st_size, 200
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # range of changed file is not sent, If-Range has its old validator
+    if range_header and if_range in (
+        None,
+        headers["Last-Modified"],
+        etag if not etag.startswith("W/") else None,
+    ):
+        try:
+            requested = byte_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+        if requested is not None:
+            first, last = requested
+            start, length, status = first, last - first + 1, 206
+            headers["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+
+    response = FileResponse(
+        FileRange(open(full_path, "rb"), start, length),
+        status=status,
+        content_type=content_type,
+        headers=headers,
+    )
+    response["Content-Length"] = length
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
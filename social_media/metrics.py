@@ -0,0 +1,250 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from rest_framework.renderers import JSONRenderer
+
+SAVEPOINT_STATEMENTS = (
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+    "ROLLBACK TO SAVEPOINT",
+)
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# metrics of requests being handled in current thread or task, nested
+# collectors (e.g. benchmark around middleware) all get the values
+_active_metrics = ContextVar("active_metrics", default=())
+
+
+class RequestMetrics:
+    """Number of queries, time spent in database and in serialization of
+    response data (building it by serializer and rendering it). Instance
+    is execute wrapper of database connections, savepoints are not
+    counted, atomic blocks create them only when they are nested"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.startswith(SAVEPOINT_STATEMENTS):
+                self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def collect_metrics():
+    """Collect RequestMetrics of code run inside"""
+    metrics = RequestMetrics()
+    token = _active_metrics.set(_active_metrics.get() + (metrics,))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            yield metrics
+    finally:
+        _active_metrics.reset(token)
+
+
+def _add_serialize_seconds(active: tuple, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    for metrics in active:
+        metrics.serialize_seconds += elapsed
+
+
+def time_serializer_data(serializer):
+    """Add time of building data of serializer (or list serializer) to
+    metrics collected by request and return the serializer. Only this
+    instance is wrapped, its nested serializers are timed with it and
+    queries of lazy relations are also counted in database time"""
+    to_representation = serializer.to_representation
+
+    def timed_to_representation(instance):
+        active = _active_metrics.get()
+        if not active:
+            return to_representation(instance)
+
+        start = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            _add_serialize_seconds(active, start)
+
+    serializer.to_representation = timed_to_representation
+    return serializer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer adding time of rendering response data to metrics
+    collected by request"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        active = _active_metrics.get()
+        if not active:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            _add_serialize_seconds(active, start)
+
+
+class Histogram:
+    """Prometheus histogram with one label"""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # label value -> counts of buckets, +Inf bucket, sum
+        self.values = {}
+
+    def observe(self, label: str, value: float):
+        counts = self.values.get(label)
+        if counts is None:
+            counts = self.values[label] = [0] * (len(self.buckets) + 1) + [0]
+
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, label_name: str) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label, counts in sorted(self.values.items()):
+            label = label.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label_name}="{label}",'
+                    f'le="{bound}"}} {cumulative}'
+                )
+            labels = f'{{{label_name}="{label}"}}'
+            lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms of requests handled by this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {
+            "total": Histogram(
+                "http_request_duration_seconds",
+                "Time of handling request",
+                DURATION_BUCKETS,
+            ),
+            "db": Histogram(
+                "http_request_db_duration_seconds",
+                "Time of database queries of request",
+                DURATION_BUCKETS,
+            ),
+            "serialize": Histogram(
+                "http_request_serialize_duration_seconds",
+                "Time of building and rendering response data of request",
+                DURATION_BUCKETS,
+            ),
+            "queries": Histogram(
+                "http_request_db_queries",
+                "Number of database queries of request",
+                QUERY_BUCKETS,
+            ),
+        }
+
+    def observe(self, view: str, metrics: RequestMetrics, total: float):
+        with self.lock:
+            self.histograms["total"].observe(view, total)
+            self.histograms["db"].observe(view, metrics.db_seconds)
+            self.histograms["serialize"].observe(
+                view, metrics.serialize_seconds
+            )
+            self.histograms["queries"].observe(view, metrics.queries)
+
+    def render(self) -> str:
+        with self.lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render("view"))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def view_name(view_func, method: str) -> str:
+    """Return name of view class and action, e.g. PostViewSet.list"""
+    view_class = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", None
+    )
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+def server_timing(metrics: RequestMetrics, total: float) -> str:
+    return (
+        f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.queries} '
+        f'queries", serialize;dur={metrics.serialize_seconds * 1000:.2f}, '
+        f"total;dur={total * 1000:.2f}"
+    )
+
+
+class RequestMetricsMiddleware:
+    """Record queries, database, serialization and total time of every
+    request by its view and action, add them as Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        registry.observe(
+            getattr(request, "metrics_view", "unresolved"), metrics, total
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(metrics, total)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_name(view_func, request.method)
+
+
+def metrics_view(request):
+    """Prometheus metrics of requests handled by this process, denied
+    until METRICS_TOKEN is set"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=403)
+    if request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0002_timelineentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="is_celebrity",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
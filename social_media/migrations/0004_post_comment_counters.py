@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:44
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model("social_media", "Post")
+    PostRate = apps.get_model("social_media", "PostRate")
+    Comment = apps.get_model("social_media", "Comment")
+    CommentRate = apps.get_model("social_media", "CommentRate")
+
+    Post.objects.update(
+        num_of_likes=count(PostRate.objects.filter(like=True), "post"),
+        num_of_dislikes=count(PostRate.objects.filter(like=False), "post"),
+        num_of_comments=count(Comment.objects.all(), "post"),
+    )
+    Comment.objects.update(
+        num_of_likes=count(CommentRate.objects.filter(like=True), "comment"),
+        num_of_dislikes=count(CommentRate.objects.filter(like=False), "comment"),
+        num_of_replies=count(Comment.objects.all(), "reply_to_comment"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0003_profile_is_celebrity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="num_of_dislikes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="num_of_likes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="num_of_replies",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="num_of_comments",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="num_of_dislikes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="num_of_likes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
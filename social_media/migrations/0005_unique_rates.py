@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:56
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def dedupe(rate_model, rated_model, rated_field):
+    """Keep only the latest rate of every profile and recount likes and
+    dislikes of objects which had duplicates"""
+    duplicates = (
+        rate_model.objects.order_by()
+        .values(rated_field, "profile")
+        .annotate(latest_id=Max("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+
+    rated_ids = set()
+    for duplicate in duplicates.iterator():
+        rate_model.objects.filter(
+            **{rated_field: duplicate[rated_field]},
+            profile=duplicate["profile"],
+        ).exclude(id=duplicate["latest_id"]).delete()
+        rated_ids.add(duplicate[rated_field])
+
+    rated_model.objects.filter(id__in=rated_ids).update(
+        num_of_likes=count(rate_model.objects.filter(like=True), rated_field),
+        num_of_dislikes=count(rate_model.objects.filter(like=False), rated_field),
+    )
+
+
+def dedupe_rates(apps, schema_editor):
+    dedupe(
+        apps.get_model("social_media", "PostRate"),
+        apps.get_model("social_media", "Post"),
+        "post",
+    )
+    dedupe(
+        apps.get_model("social_media", "CommentRate"),
+        apps.get_model("social_media", "Comment"),
+        "comment",
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0004_post_comment_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_rates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="commentrate",
+            constraint=models.UniqueConstraint(
+                fields=("comment", "profile"), name="unique_comment_rate"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="postrate",
+            constraint=models.UniqueConstraint(
+                fields=("post", "profile"), name="unique_post_rate"
+            ),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:03
+
+from django.db import migrations, models
+from django.db.models import Func, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, Concat, LPad
+
+PATH_STEP_LENGTH = 10
+
+
+def path_step():
+    return Concat(
+        LPad(Cast("id", models.CharField()), PATH_STEP_LENGTH, models.Value("0")),
+        models.Value("/"),
+        output_field=models.CharField(),
+    )
+
+
+def fill_paths(apps, schema_editor):
+    """Fill paths level by level, count descendants and thread activity"""
+    Comment = apps.get_model("social_media", "Comment")
+
+    Comment.objects.filter(reply_to_comment__isnull=True).update(
+        path=path_step(), depth=0
+    )
+
+    depth = 0
+    while True:
+        parent_path = Comment.objects.filter(pk=OuterRef("reply_to_comment_id")).values(
+            "path"
+        )
+        updated = Comment.objects.filter(
+            reply_to_comment__depth=depth,
+            reply_to_comment__path__gt="",
+            path="",
+        ).update(
+            path=Concat(
+                Subquery(parent_path),
+                path_step(),
+                output_field=models.CharField(),
+            ),
+            depth=depth + 1,
+        )
+        if not updated:
+            break
+        depth += 1
+
+    subtree = Comment.objects.filter(path__startswith=OuterRef("path")).order_by()
+    Comment.objects.update(
+        num_of_descendants=Coalesce(
+            Subquery(
+                subtree.exclude(pk=OuterRef("pk"))
+                .annotate(total=Func("pk", function="COUNT"))
+                .values("total"),
+                output_field=IntegerField(),
+            ),
+            0,
+        ),
+        thread_updated_at=Subquery(
+            subtree.annotate(latest=Func("created_at", function="MAX")).values("latest")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0006_comment_paths"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
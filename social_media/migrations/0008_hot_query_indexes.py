@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0007_fill_comment_paths"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="post",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="social_media.post",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="author",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="posts",
+                to="social_media.profile",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="postrate",
+            name="post",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="social_media.post",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="postrate",
+            name="profile",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="social_media.profile",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("reply_to_comment__isnull", True)),
+                fields=["post", "-num_of_replies", "id"],
+                name="comment_post_top_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["author", "-created_at", "-num_of_comments", "id"],
+                name="post_author_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="postrate",
+            index=models.Index(
+                fields=["post", "like", "profile"], name="postrate_post_like_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="postrate",
+            index=models.Index(
+                fields=["profile", "like", "post"], name="postrate_profile_like_idx"
+            ),
+        ),
+    ]
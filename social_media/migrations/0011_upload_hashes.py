@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0010_image_processing_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="image_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="profile_picture_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("image_hash", ""), _negated=True),
+                fields=["image_hash"],
+                name="post_image_hash_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                condition=models.Q(("profile_picture_hash", ""), _negated=True),
+                fields=["profile_picture_hash"],
+                name="profile_picture_hash_idx",
+            ),
+        ),
+    ]
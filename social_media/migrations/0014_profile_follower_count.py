@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:41
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_follower_counts(apps, schema_editor):
+    Profile = apps.get_model("social_media", "Profile")
+    Follow = Profile.followings.through
+
+    counted = (
+        Follow.objects.filter(to_profile_id=OuterRef("pk"))
+        .order_by()
+        .values("to_profile_id")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Profile.objects.update(
+        follower_count=Coalesce(
+            Subquery(counted, output_field=IntegerField()), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0013_timeline_page_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="follower_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_follower_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("social_media", "0014_profile_follower_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="reply_to_comment",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="replies",
+                to="social_media.comment",
+            ),
+        ),
+    ]
@@ -2,11 +2,15 @@ import os
 import uuid
 
 from django.db import models
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 
 from taggit.managers import TaggableManager
 
+from .images import IMAGE_STATUSES, READY, mark_uploads, stored_names
+
 
 def get_file_new_name(instance) -> str:
     """Return filename base on instance"""
@@ -21,6 +25,8 @@ def custom_image_file_path(instance, filename):
     return f"{slugify(filename)}_{uuid.uuid4()}{ext}"
 
 
+# content addressed storage keeps directory and extension of the name
+# and names the file by hash of its content, see storage.py
 def profile_picture_file_path(instance, filename):
     return f"profile_pictures/{custom_image_file_path(instance, filename)}"
 
@@ -29,7 +35,25 @@ def post_picture_file_path(instance, filename):
     return f"post_picture/{custom_image_file_path(instance, filename)}"
 
 
-class Profile(models.Model):
+class StoredImagesMixin:
+    """Model with image fields processed by images pipeline. Stored files
+    of image fields loaded from database are remembered, so save signals
+    count references of changed files without query"""
+
+    image_fields: list[str] = []
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_images = stored_names(instance, cls.image_fields)
+        return instance
+
+    def save(self, *args, **kwargs):
+        self._uploaded_images = mark_uploads(self, self.image_fields)
+        super().save(*args, **kwargs)
+
+
+class Profile(StoredImagesMixin, models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -41,21 +65,64 @@ class Profile(models.Model):
     profile_picture = models.ImageField(
         null=True, blank=True, upload_to=profile_picture_file_path
     )
+    # resized copies of profile picture, see images.save_variants
+    profile_picture_variants = models.JSONField(
+        default=list, blank=True, editable=False
+    )
+    # uploaded picture is processed by background job, see media_jobs
+    profile_picture_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUSES, default=READY, editable=False
+    )
+    profile_picture_phash = models.CharField(
+        max_length=16, blank=True, editable=False
+    )
+    # sha256 of uploaded file, identical uploads reuse processed picture
+    profile_picture_hash = models.CharField(
+        max_length=64, blank=True, editable=False
+    )
     bio = models.TextField(max_length=1000, blank=True)
+    # posts of profiles with a lot of followers are not pushed into
+    # followers timelines, they are pulled when timeline is read
+    is_celebrity = models.BooleanField(default=False, db_index=True)
+    # number of followers kept by followings_changed signal, celebrity
+    # status is decided by it without counting followers
+    follower_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["profile_picture_hash"],
+                name="profile_picture_hash_idx",
+                condition=~models.Q(profile_picture_hash=""),
+            ),
+        ]
+
+    image_fields = ["profile_picture"]
 
     def __str__(self) -> str:
         return f"{self.user}"
 
 
-class Post(models.Model):
+class Post(StoredImagesMixin, models.Model):
+    # foreign key is covered by post_author_created_idx
     author = models.ForeignKey(
         Profile,
         related_name="posts",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     image = models.ImageField(
         upload_to=post_picture_file_path, blank=True, null=True
     )
+    # resized copies of image, see images.save_variants
+    image_variants = models.JSONField(default=list, blank=True, editable=False)
+    # uploaded image is processed by background job, see media_jobs
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUSES, default=READY, editable=False
+    )
+    image_phash = models.CharField(max_length=16, blank=True, editable=False)
+    # sha256 of uploaded file, identical uploads reuse processed image
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
     content = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(
@@ -73,18 +140,94 @@ class Post(models.Model):
         blank=True,
     )
     tags = TaggableManager(to="self", blank=True, related_name="posts")
+    # counters are updated together with rates and comments, so lists
+    # do not need to aggregate them
+    num_of_likes = models.IntegerField(default=0)
+    num_of_dislikes = models.IntegerField(default=0)
+    num_of_comments = models.IntegerField(default=0)
 
     class Meta:
-        indexes = [models.Index(fields=["created_at"])]
+        indexes = [
+            models.Index(fields=["created_at"]),
+            # profile posts page
+            models.Index(
+                fields=["author", "-created_at", "-num_of_comments", "id"],
+                name="post_author_created_idx",
+            ),
+            # uploads identical to processed image
+            models.Index(
+                fields=["image_hash"],
+                name="post_image_hash_idx",
+                condition=~models.Q(image_hash=""),
+            ),
+        ]
+
+    image_fields = ["image"]
 
     def __str__(self) -> str:
         return f"{self.author} - {self.created_at}"
 
 
+class TimelineEntry(models.Model):
+    """Post pushed into follower home timeline when it was created"""
+
+    profile = models.ForeignKey(
+        Profile,
+        related_name="timeline",
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="timeline_entries",
+        on_delete=models.CASCADE,
+    )
+    # copy of post created_at, so timeline can be read from one index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # page of home timeline is range of this index
+            models.Index(
+                fields=["profile", "-created_at", "-post"],
+                name="timeline_profile_created_idx",
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "post"], name="unique_timeline_post"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.profile} - {self.post_id}"
+
+
 class PostRate(models.Model):
     like = models.BooleanField()
-    profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # foreign keys are covered by indexes below
+    profile = models.ForeignKey(
+        Profile, on_delete=models.CASCADE, db_index=False
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "profile"], name="unique_post_rate"
+            )
+        ]
+        # profiles who liked post and posts profile liked are read from
+        # index without visiting table
+        indexes = [
+            models.Index(
+                fields=["post", "like", "profile"],
+                name="postrate_post_like_idx",
+            ),
+            models.Index(
+                fields=["profile", "like", "post"],
+                name="postrate_profile_like_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.profile}"
@@ -92,7 +235,8 @@ class PostRate(models.Model):
 
 class Comment(models.Model):
     author = models.ForeignKey(Profile, on_delete=models.CASCADE)
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # foreign key is covered by post indexes below
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
     content = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     reply_to_comment = models.ForeignKey(
@@ -102,21 +246,147 @@ class Comment(models.Model):
         null=True,
         blank=True,
     )
+    # ids of comment ancestors and comment itself, every id is padded
+    # to PATH_STEP_LENGTH and ends with "/", so subtree is path prefix
+    path = models.CharField(
+        max_length=1100, db_index=True, blank=True, editable=False
+    )
+    depth = models.PositiveIntegerField(default=0, editable=False)
     likes = models.ManyToManyField(
         Profile,
         related_name="liked_comments",
         through="CommentRate",
         through_fields=("comment", "profile"),
     )
+    num_of_likes = models.IntegerField(default=0)
+    num_of_dislikes = models.IntegerField(default=0)
+    num_of_replies = models.IntegerField(default=0)
+    num_of_descendants = models.IntegerField(default=0)
+    # time of the latest comment in thread of comment and its replies
+    thread_updated_at = models.DateTimeField(null=True, editable=False)
+
+    PATH_STEP_LENGTH = 10
+    MAX_DEPTH = 99
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "-thread_updated_at"]),
+            # top comments of post, replies are not indexed
+            models.Index(
+                fields=["post", "-num_of_replies", "id"],
+                condition=models.Q(reply_to_comment__isnull=True),
+                name="comment_post_top_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Comment id {self.id}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.update_path()
+
+    def update_path(self) -> None:
+        """Set path and depth by comment it replies to, paths of replies
+        are updated when comment is moved"""
+        parent = self.reply_to_comment
+        step = f"{self.pk:0{self.PATH_STEP_LENGTH}d}/"
+        path = (parent.path if parent else "") + step
+        depth = parent.depth + 1 if parent else 0
+
+        if path == self.path:
+            return
+
+        if self.path:
+            Comment.objects.filter(path__startswith=self.path).update(
+                path=Concat(
+                    models.Value(path),
+                    Substr("path", len(self.path) + 1),
+                    output_field=models.CharField(),
+                ),
+                depth=models.F("depth") + depth - self.depth,
+            )
+        else:
+            # new comment
+            self.thread_updated_at = self.created_at
+            Comment.objects.filter(pk=self.pk).update(
+                path=path, depth=depth, thread_updated_at=self.created_at
+            )
+
+        self.path, self.depth = path, depth
+
+    def ancestor_ids(self) -> list[int]:
+        """Return ids of comments above comment in thread"""
+        return [int(step) for step in self.path.split("/")[:-2]]
+
 
 class CommentRate(models.Model):
     like = models.BooleanField()
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["comment", "profile"], name="unique_comment_rate"
+            )
+        ]
+
     def __str__(self) -> str:
         return f"{self.comment}"
+
+
+class Job(models.Model):
+    """Background job waiting in database queue, see jobs.DatabaseQueue.
+    Finished jobs are deleted"""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        FAILED = "failed"
+
+    # dotted path of function registered with jobs.job
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # workers claim the oldest queued job
+            models.Index(
+                fields=["run_at"],
+                name="job_queued_idx",
+                condition=models.Q(status="queued"),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """File of content addressed storage with number of post images and
+    profile pictures referencing it, see storage.py"""
+
+    name = models.CharField(max_length=255, unique=True)
+    references = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # files garbage collector deletes
+            models.Index(
+                fields=["updated_at"],
+                name="media_blob_orphan_idx",
+                condition=models.Q(references__lte=0),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.references})"
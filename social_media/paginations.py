@@ -1,6 +1,372 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.sql import Query
+from django.utils.functional import cached_property
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache_versions import get_versions, table_version_name
+from .db_routers import use_primary
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """Return number of rows PostgreSQL planner expects queryset to return"""
+    sql, params = queryset.order_by().query.sql_with_params()
+    connection = connections[queryset.db]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def queried_tables(query: Query) -> set[str]:
+    """Return names of tables joined by query and by its subqueries"""
+    tables = {join.table_name for join in query.alias_map.values()}
+
+    nodes = [query.where, *query.annotations.values()]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, Query):
+            tables |= queried_tables(node)
+        elif isinstance(getattr(node, "query", None), Query):
+            # Subquery and Exists
+            tables |= queried_tables(node.query)
+        elif hasattr(node, "get_source_expressions"):
+            nodes.extend(node.get_source_expressions())
+
+    return tables
+
+
+def cached_count(queryset: QuerySet) -> tuple[int, bool]:
+    """Return queryset count cached until one of queried tables is changed
+    or PAGINATION_COUNT_CACHE_TTL expired and whether it was just counted"""
+    sql, params = queryset.query.sql_with_params()
+    queried = queried_tables(queryset.query)
+    # auto created models are many to many tables, e.g. of followers
+    tables = [
+        table_version_name(model)
+        for model in apps.get_models(include_auto_created=True)
+        if model._meta.db_table in queried
+    ]
+
+    versions = get_versions(tables)
+    key_source = json.dumps(
+        [sql, [str(param) for param in params], sorted(versions.items())]
+    )
+    key = f"count:{hashlib.sha256(key_source.encode()).hexdigest()}"
+
+    count = cache.get(key)
+    if count is not None:
+        return count, False
+
+    # count of lagging replica would be cached with current versions
+    with use_primary():
+        count = queryset.count()
+    cache.set(key, count, timeout=settings.PAGINATION_COUNT_CACHE_TTL)
+
+    return count, True
+
+
+class CountingPaginator(DjangoPaginator):
+    """Paginator which counts object list with one of count modes:
+
+    - "exact" - COUNT(*) on every request
+    - "estimate" - PostgreSQL planner estimate when it is bigger than
+      PAGINATION_COUNT_ESTIMATE_THRESHOLD, exact count otherwise
+    - "cached" - exact count cached until queried tables change
+
+    `count_is_exact` is False when count is an estimate or taken from cache
+    """
+
+    count_modes = ("exact", "estimate", "cached")
+
+    def __init__(self, object_list, per_page, count_mode="exact", **kwargs):
+        if count_mode not in self.count_modes:
+            raise ValueError(f"Unknown count mode {count_mode}")
+
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if self.count_mode == "exact" or not isinstance(queryset, QuerySet):
+            return super().count
+
+        if (
+            self.count_mode == "estimate"
+            and connections[queryset.db].vendor == "postgresql"
+        ):
+            estimate = estimate_count(queryset)
+            if estimate < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+                return super().count
+
+            self.count_is_exact = False
+            return estimate
+
+        count, self.count_is_exact = cached_count(queryset)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     max_page_size = 30
+    # one of CountingPaginator count modes, PAGINATION_COUNT_MODE by default
+    count_mode = None
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountingPaginator(
+            object_list,
+            per_page,
+            count_mode=self.count_mode or settings.PAGINATION_COUNT_MODE,
+        )
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_exact"] = self.page.paginator.count_is_exact
+
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_is_exact"] = {"type": "boolean"}
+
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on queryset ordering fields with primary key
+    as tie-breaker. Next page is read with `WHERE (ordering) > (cursor)`
+    instead of OFFSET and total count is not calculated.
+
+    Works with querysets and with objects that provide `model`,
+    `ordering`, `filter()`, `order_by()` and slicing (e.g. MergedFeed)"""
+
+    page_size = 10
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+
+        values, self.reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = results
+        return results
+
+    def get_ordering(self, queryset) -> list[str]:
+        """Return queryset ordering ending with unique primary key"""
+        if isinstance(queryset, QuerySet):
+            ordering = list(
+                queryset.query.order_by or self.model._meta.ordering
+            )
+        else:
+            ordering = list(queryset.ordering)
+
+        for field in ordering:
+            if not isinstance(field, str) or field == "?":
+                raise ValueError(
+                    "Keyset pagination supports only ordering by fields"
+                )
+
+        if not any(field.lstrip("-") in ("pk", "id") for field in ordering):
+            ordering.append("pk")
+
+        return ordering
+
+    @staticmethod
+    def reverse_field(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def keyset_filter(ordering: list[str], values: list) -> Q:
+        """Build (a > x) | (a = x & b > y) | ... filter for ordering"""
+        keyset_q = Q()
+        equal = {}
+
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            keyset_q |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        return keyset_q
+
+    def get_field(self, name: str):
+        model = self.model
+        field = None
+
+        for part in name.split("__"):
+            field = (
+                model._meta.pk if part == "pk" else model._meta.get_field(part)
+            )
+            model = field.related_model
+
+        return field
+
+    def get_position(self, instance) -> list[str]:
+        """Return instance values of ordering fields as strings"""
+        position = []
+
+        for field in self.ordering:
+            name = field.lstrip("-")
+            *relations, _ = name.split("__")
+
+            holder = instance
+            for relation in relations:
+                holder = getattr(holder, relation)
+
+            position.append(self.get_field(name).value_to_string(holder))
+
+        return position
+
+    def encode_cursor(self, instance, reverse: bool) -> str:
+        data = {"v": self.get_position(instance), "r": reverse}
+        encoded = urlsafe_b64encode(json.dumps(data).encode())
+
+        return encoded.decode().rstrip("=")
+
+    def decode_cursor(self, request) -> tuple[list | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            data = json.loads(urlsafe_b64decode(encoded + padding))
+            values = [
+                self.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, data["v"], strict=True)
+            ]
+            return values, bool(data.get("r", False))
+        except (
+            BinasciiError,
+            FieldDoesNotExist,
+            KeyError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_url_after(self, url: str, queryset, instance) -> str:
+        """Return url with cursor of page starting after instance"""
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(instance, False)
+        )
+
+    def get_link(self, instance, reverse: bool) -> str:
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(instance, reverse)
+        )
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            }
+        ]
+
+
+class ListPagination(BasePagination):
+    """Keyset pagination by default. Clients which need total count and
+    page numbers can opt in page number pagination with `page` param"""
+
+    page_query_param = CustomPagination.page_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param in request.query_params:
+            self.paginator = CustomPagination()
+        else:
+            self.paginator = KeysetPagination()
+
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return KeysetPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return KeysetPagination().get_schema_operation_parameters(
+            view
+        ) + CustomPagination().get_schema_operation_parameters(view)
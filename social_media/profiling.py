@@ -0,0 +1,229 @@
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import view_name
+
+# queries written to .sql file of one request, the rest is only counted
+MAX_QUERIES = 1000
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}"
+
+
+def collapse_stack(frame) -> str:
+    """Return stack of frame from the outermost call in collapsed format,
+    frames are separated by semicolons"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """Stack samples and queries of one request. Instance is execute
+    wrapper of database connections"""
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.view = "unresolved"
+        self.started = datetime.now(timezone.utc)
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.queries = []
+        self.query_count = 0
+        self.db_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.db_seconds += elapsed
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append((elapsed, sql, params, many))
+
+
+class Sampler:
+    """Thread which samples stacks of threads handling profiled requests
+    every interval seconds, it sleeps while there are no such requests"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.active = threading.Event()
+        self.thread = None
+
+    def add(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles[profile.thread_id] = profile
+            self.active.set()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="request-sampler", daemon=True
+                )
+                self.thread.start()
+
+    def remove(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles.pop(profile.thread_id, None)
+            if not self.profiles:
+                self.active.clear()
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            for thread_id, profile in self.profiles.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.stacks[collapse_stack(frame)] += 1
+
+    def run(self):
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            self.sample()
+
+
+class ProfileWriter:
+    """Write profiles into directory, keep only max_files latest ones.
+    Parameters of queries are written only with sql_params, they can hold
+    personal data and credentials"""
+
+    def __init__(self, directory: str, max_files: int, sql_params=False):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.sql_params = sql_params
+        self.lock = threading.Lock()
+
+    def write(self, profile: RequestProfile, total: float, reason: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stem = "{}-{}-{}ms".format(
+            profile.started.strftime("%Y%m%dT%H%M%S%f"),
+            profile.view,
+            round(total * 1000),
+        )
+        base = self.directory / stem
+
+        Path(f"{base}.collapsed").write_text(
+            "".join(
+                f"{stack} {count}\n"
+                for stack, count in profile.stacks.most_common()
+            )
+        )
+        Path(f"{base}.sql").write_text(self.render_queries(profile))
+        # metadata is written last, summary reads only complete profiles
+        Path(f"{base}.json").write_text(json.dumps({
+            "view": profile.view,
+            "method": profile.method,
+            "path": profile.path,
+            "started": profile.started.isoformat(),
+            "reason": reason,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(profile.db_seconds * 1000, 2),
+            "queries": profile.query_count,
+            "samples": sum(profile.stacks.values()),
+        }))
+        self.rotate()
+        return base
+
+    def render_queries(self, profile: RequestProfile) -> str:
+        lines = []
+        for elapsed, sql, params, many in profile.queries:
+            if self.sql_params:
+                lines.append(f"-- {elapsed * 1000:.2f} ms, params: {params!r}")
+            else:
+                lines.append(f"-- {elapsed * 1000:.2f} ms")
+            if many:
+                lines.append("-- executemany")
+            lines.append(f"{sql};\n")
+        skipped = profile.query_count - len(profile.queries)
+        if skipped:
+            lines.append(f"-- {skipped} more queries are not written")
+        return "\n".join(lines) + "\n"
+
+    def rotate(self):
+        with self.lock:
+            profiles = sorted(self.directory.glob("*.json"))
+            for meta in profiles[:-self.max_files or None]:
+                for suffix in (".collapsed", ".sql", ".json"):
+                    meta.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def read_profiles(directory: str) -> list[dict]:
+    """Return metadata of profiles written into directory, every dict has
+    also path of its collapsed stacks"""
+    profiles = []
+    for meta in sorted(Path(directory).glob("*.json")):
+        try:
+            profile = json.loads(meta.read_text())
+        except (OSError, ValueError):
+            # removed by rotation or being written meanwhile
+            continue
+        profile["collapsed"] = meta.with_suffix(".collapsed")
+        profiles.append(profile)
+    return profiles
+
+
+class SlowRequestProfilerMiddleware:
+    """Sample stacks and capture SQL of requests, write them to
+    PROFILING_DIR when request took at least PROFILING_THRESHOLD_MS or
+    was picked with PROFILING_SAMPLE_RATE"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.threshold = settings.PROFILING_THRESHOLD_MS / 1000
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.sampler = Sampler(settings.PROFILING_INTERVAL_MS / 1000)
+        self.writer = ProfileWriter(
+            settings.PROFILING_DIR,
+            settings.PROFILING_MAX_FILES,
+            settings.PROFILING_SQL_PARAMS,
+        )
+
+    def __call__(self, request):
+        profile = RequestProfile(request)
+        request.sampling_profile = profile
+        # decided upfront so sampled requests are not only the slow ones
+        sampled = random.random() < self.sample_rate
+
+        start = time.perf_counter()
+        self.sampler.add(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            self.sampler.remove(profile)
+        total = time.perf_counter() - start
+
+        if total >= self.threshold:
+            self.writer.write(profile, total, "slow")
+        elif sampled:
+            self.writer.write(profile, total, "sampled")
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.sampling_profile.view = view_name(view_func, request.method)
@@ -0,0 +1,232 @@
+from django.db import connections, router, transaction, IntegrityError
+from django.db.models import Model
+
+from .cache_versions import bump_versions, table_version_name
+from .counters import update_many_rate_counters
+from .models import Profile, PostRate
+from .signals import bump_posts_tags_versions
+
+REACTIONS = {"like": True, "dislike": False}
+
+
+def reaction_name(like: bool | None) -> str | None:
+    """Return "like", "dislike" or None for rate like value"""
+    if like is None:
+        return None
+    return "like" if like else "dislike"
+
+
+def _bump_rate_versions(rate_model: type[Model], object_ids) -> None:
+    # rates are written with update, bulk and raw queries without signals
+    bump_versions([table_version_name(rate_model)])
+    if rate_model is PostRate:
+        bump_posts_tags_versions(list(object_ids))
+
+
+def _execute(
+    rate_model: type[Model], sql: str, params: list, fetch: bool = False
+):
+    """Execute sql formatted with quoted rate table and column names,
+    return number of affected rows or first row with `fetch`"""
+    connection = connections[router.db_for_write(rate_model)]
+    quote = connection.ops.quote_name
+    names = {"table": quote(rate_model._meta.db_table)}
+    for field in rate_model._meta.concrete_fields:
+        names[field.attname] = quote(field.column)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**names), params)
+        return cursor.fetchone() if fetch else cursor.rowcount
+
+
+def _lock_profile(profile: Profile) -> None:
+    """Lock profile row until the end of transaction, so reactions of
+    one profile are applied one after another. No key lock does not
+    block inserts of rows referencing profile"""
+    list(
+        Profile.objects.select_for_update(no_key=True)
+        .filter(pk=profile.pk)
+        .values_list("pk")
+    )
+
+
+def _toggle_in_one_statement(
+    rate_model: type[Model], object_column: str, params: list
+) -> tuple[int, int, int]:
+    """Delete the same reaction, otherwise update the opposite one,
+    otherwise insert it with one data-modifying CTE (PostgreSQL).
+    Return numbers of deleted, updated and inserted rates"""
+    return _execute(
+        rate_model,
+        f"WITH deleted AS ("
+        f"DELETE FROM {{table}} WHERE {{profile_id}} = %s "
+        f"AND {object_column} = %s AND {{like}} = %s RETURNING 1"
+        f"), updated AS ("
+        f"UPDATE {{table}} SET {{like}} = %s WHERE {{profile_id}} = %s "
+        f"AND {object_column} = %s AND {{like}} <> %s RETURNING 1"
+        f"), inserted AS ("
+        f"INSERT INTO {{table}} ({{profile_id}}, {object_column}, {{like}}) "
+        f"SELECT %s, %s, %s WHERE NOT EXISTS (SELECT FROM deleted) "
+        f"AND NOT EXISTS (SELECT FROM updated) "
+        f"ON CONFLICT DO NOTHING RETURNING 1"
+        f") SELECT (SELECT COUNT(*) FROM deleted), "
+        f"(SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM inserted)",
+        params + params[2:] + params + params,
+        fetch=True,
+    )
+
+
+def _toggle_one_by_one(
+    rate_model: type[Model], object_column: str, params: list
+) -> tuple[int, int, int]:
+    """Delete, update and insert rate with separate statements, stop at
+    the first one that affects a row. Return numbers of deleted, updated
+    and inserted rates"""
+    deleted = _execute(
+        rate_model,
+        f"DELETE FROM {{table}} WHERE {{profile_id}} = %s "
+        f"AND {object_column} = %s AND {{like}} = %s",
+        params,
+    )
+    if deleted:
+        return deleted, 0, 0
+
+    updated = _execute(
+        rate_model,
+        f"UPDATE {{table}} SET {{like}} = %s WHERE {{profile_id}} = %s "
+        f"AND {object_column} = %s AND {{like}} <> %s",
+        params[2:] + params,
+    )
+    if updated:
+        return 0, updated, 0
+
+    inserted = _execute(
+        rate_model,
+        f"INSERT INTO {{table}} ({{profile_id}}, {object_column}, "
+        f"{{like}}) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING",
+        params,
+    )
+    return 0, 0, inserted
+
+
+@transaction.atomic
+def toggle_reaction(
+    rate_model: type[Model],
+    rated_field: str,
+    profile: Profile,
+    object_id: int,
+    like: bool,
+) -> bool | None:
+    """Like/dislike object or remove the same reaction without reading
+    rate first: delete the same reaction, otherwise update the opposite
+    one, otherwise insert it. Numbers of affected rows tell how to update
+    counters. On PostgreSQL the steps are one statement.
+
+    Profile row is locked first: statement sees only rates committed
+    before it started, so without the lock rate inserted by concurrent
+    request of the same profile would make every step miss.
+    Return like value after toggle, None when rate was removed"""
+    rated_model = rate_model._meta.get_field(rated_field).related_model
+    object_column = f"{{{rated_field}_id}}"
+    params = [profile.id, object_id, like]
+
+    _lock_profile(profile)
+
+    connection = connections[router.db_for_write(rate_model)]
+    if connection.vendor == "postgresql":
+        toggle = _toggle_in_one_statement
+    else:
+        toggle = _toggle_one_by_one
+
+    deleted, updated, inserted = toggle(rate_model, object_column, params)
+    if not (deleted or updated or inserted):
+        # rate was written without profile lock in between
+        raise IntegrityError("Rate is changed by concurrent request")
+
+    if deleted:
+        old_like, new_like = like, None
+    elif updated:
+        old_like, new_like = not like, like
+    else:
+        old_like, new_like = None, like
+
+    update_many_rate_counters(rated_model, {object_id: (old_like, new_like)})
+    _bump_rate_versions(rate_model, [object_id])
+
+    return new_like
+
+
+@transaction.atomic
+def apply_reactions(
+    rate_model: type[Model],
+    rated_field: str,
+    profile: Profile,
+    reactions: list[tuple[int, bool]],
+) -> list[dict]:
+    """Apply (object_id, like) reactions of profile in given order with
+    semantics of single like/dislike endpoint: the same reaction removes
+    rate, the other one replaces it.
+
+    Final rates are written with one bulk create, bulk update and delete
+    and counters of rated objects are updated. Return result of every
+    reaction: object id and reaction after it or error"""
+    _lock_profile(profile)
+
+    rated_model = rate_model._meta.get_field(rated_field).related_model
+    object_field = f"{rated_field}_id"
+
+    existing_ids = set(
+        rated_model.objects.filter(
+            id__in={object_id for object_id, _ in reactions}
+        ).values_list("id", flat=True)
+    )
+    rates = {
+        getattr(rate, object_field): rate
+        for rate in rate_model.objects.filter(
+            profile=profile, **{f"{object_field}__in": existing_ids}
+        )
+    }
+    old_likes = {object_id: rate.like for object_id, rate in rates.items()}
+
+    new_likes = dict(old_likes)
+    results = []
+    for object_id, like in reactions:
+        if object_id not in existing_ids:
+            results.append({"id": object_id, "error": "Not found."})
+            continue
+
+        if new_likes.get(object_id) is like:
+            like = None
+        new_likes[object_id] = like
+        results.append({"id": object_id, "reaction": reaction_name(like)})
+
+    rate_changes = {
+        object_id: (old_likes.get(object_id), like)
+        for object_id, like in new_likes.items()
+        if old_likes.get(object_id) is not like
+    }
+
+    to_create, to_update, to_delete = [], [], []
+    for object_id, (old_like, like) in rate_changes.items():
+        if old_like is None:
+            to_create.append(
+                rate_model(
+                    profile=profile, like=like, **{object_field: object_id}
+                )
+            )
+        elif like is None:
+            to_delete.append(rates[object_id].id)
+        else:
+            rates[object_id].like = like
+            to_update.append(rates[object_id])
+
+    rate_model.objects.bulk_create(to_create)
+    rate_model.objects.bulk_update(to_update, ["like"])
+    rate_model.objects.filter(id__in=to_delete).delete()
+
+    update_many_rate_counters(rated_model, rate_changes)
+
+    if rate_changes:
+        _bump_rate_versions(rate_model, rate_changes)
+
+    return results
@@ -0,0 +1,55 @@
+import hashlib
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache_versions import get_versions
+from .db_routers import use_primary
+
+
+def cache_response(versions: Callable[..., list[str]]):
+    """Cache successful response data of viewset action.
+
+    Key is made of view action, absolute url with query params, current
+    user and versions of names returned by `versions(view, request,
+    **kwargs)`. Bumping one of the versions invalidates cached response
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            names = versions(self, request, *args, **kwargs)
+            key_parts = [
+                f"{self.__class__.__name__}.{self.action}",
+                request.build_absolute_uri(),
+                str(request.user.pk),
+                *(
+                    f"{name}:{version}"
+                    for name, version in sorted(get_versions(names).items())
+                ),
+            ]
+            key_hash = hashlib.sha256("|".join(key_parts).encode())
+            key = f"response:{key_hash.hexdigest()}"
+
+            data = cache.get(key)
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+            # response is kept until versions change, data of lagging
+            # replica would stay in cache after the change
+            with use_primary():
+                response = view_method(self, request, *args, **kwargs)
+
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TTL)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,50 @@
+"""Builders of sample objects used by tests and benchmark commands"""
+from django.contrib.auth import get_user_model
+
+from social_media.models import Profile, Post, Comment
+
+
+def create_number_users(number: int):
+    for i in range(number + 1):
+        get_user_model().objects.create_user(
+            email=f"testuser{i}@gmail.com",
+            password="rvtrtyrpj",
+            username=f"User{i}",
+        )
+
+
+def create_number_of_posts(number: int, profile: Profile = None) -> list[Post]:
+    if profile:
+        # if profile is provided then used it
+        pass
+    else:
+        # else there is no profile provided, create
+        user = get_user_model().objects.create_user(
+            email="number_of_posts@gmail.com",
+            password="rvrtrt",
+            username="Count",
+        )
+        profile = user.profile
+
+    return [Post.objects.create(author=profile) for i in range(number)]
+
+
+def create_number_of_comments(
+    number: int, post: Post, profile: Profile = None, **extra_fields
+) -> list[Comment]:
+    if profile:
+        # if profile is provided then used it
+        pass
+    else:
+        # else there is no profile provided, create
+        user = get_user_model().objects.create_user(
+            email="number_of_posts@gmail.com",
+            password="rvrtrt",
+            username="Count",
+        )
+        profile = user.profile
+
+    return [
+        Comment.objects.create(author=profile, post=post, **extra_fields)
+        for i in range(number)
+    ]
@@ -1,21 +1,128 @@
+from django.core.files.storage import default_storage
 from django.db import IntegrityError
+from django.db.models import Max
 
 from rest_framework.reverse import reverse
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from drf_spectacular.utils import extend_schema_field
+
 from taggit.serializers import TaggitSerializer, TagListSerializerField
 from taggit.models import Tag
 
-from .models import Profile, Post, Comment
+from .comment_tree import REPLIES_ORDERING
+from .images import READY
+from .models import Profile, Post, PostRate, Comment, CommentRate
+from .paginations import KeysetPagination
+from .uploads import check_image_header
+
+BULK_REACTIONS_MAX = 100
+
+
+def resolve_following(request, profile_ids) -> dict[int, bool]:
+    """Return whether request user follows each of profile_ids.
+    Answers are remembered on request, so unknown profiles are
+    looked up with one query and known are not queried again"""
+    known = getattr(request, "_is_following", None)
+    if known is None:
+        known = request._is_following = {}
+
+    unknown = {
+        profile_id for profile_id in profile_ids if profile_id not in known
+    }
+    if unknown:
+        user = request.user
+        followed = set()
+        if user.is_authenticated:
+            followed = set(
+                Profile.objects.filter(
+                    id__in=unknown, followers__user_id=user.pk
+                ).values_list("id", flat=True)
+            )
+        known.update(
+            {profile_id: profile_id in followed for profile_id in unknown}
+        )
+
+    return {profile_id: known[profile_id] for profile_id in profile_ids}
+
+
+class FollowingListSerializer(serializers.ListSerializer):
+    """Resolve `is_following` of all profiles on a page with one query"""
+
+    def to_representation(self, data):
+        profiles = list(data.all() if hasattr(data, "all") else data)
+        resolve_following(
+            self.context["request"], [profile.id for profile in profiles]
+        )
+
+        return super().to_representation(profiles)
+
+
+@extend_schema_field(
+    {
+        "type": "object",
+        "nullable": True,
+        "additionalProperties": {"type": "string"},
+    }
+)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Resized copies of image as `srcset` attribute for every format,
+    e.g. {"webp": "<url> 160w, <url> 320w", "jpeg": ...}, null when
+    image has no variants"""
+
+    def to_representation(self, variants):
+        if not variants:
+            return None
+
+        request = self.context.get("request")
+        srcset = {}
+        for variant in variants:
+            url = default_storage.url(variant["name"])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            srcset.setdefault(variant["format"], []).append(
+                f"{url} {variant['width']}w"
+            )
+
+        return {
+            image_format: ", ".join(candidates)
+            for image_format, candidates in srcset.items()
+        }
+
+
+class ProcessedImageField(serializers.ImageField):
+    """Image url, null until uploaded image is processed, so original
+    with metadata is not shown. Upload size, format and number of pixels
+    are checked before image is decoded"""
+
+    def to_internal_value(self, data):
+        if hasattr(data, "seek"):
+            check_image_header(data)
+
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        status = getattr(value.instance, f"{value.field.name}_status", READY)
+        if status != READY:
+            return None
+
+        return super().to_representation(value)
 
 
 class ProfileSerializer(serializers.ModelSerializer):
+    profile_picture = ProcessedImageField(required=False, allow_null=True)
+    profile_picture_srcset = ImageVariantsField(
+        source="profile_picture_variants"
+    )
+
     class Meta:
         model = Profile
         fields = [
             "id",
             "profile_picture",
+            "profile_picture_status",
+            "profile_picture_srcset",
             "bio",
         ]
 
@@ -29,7 +136,54 @@ class ProfileSerializer(serializers.ModelSerializer):
             )
 
 
-class ProfileListSerializer(ProfileSerializer):
+def resolve_reactions(
+    request, rate_model, rated_field: str, object_ids
+) -> dict[int, str | None]:
+    """Return request user reaction ("like", "dislike" or None) on each
+    of rated objects. Like resolve_following, answers are remembered on
+    request and unknown objects are looked up with one query"""
+    reactions = getattr(request, "_reactions", None)
+    if reactions is None:
+        reactions = request._reactions = {}
+    known = reactions.setdefault(rate_model, {})
+
+    unknown = {
+        object_id for object_id in object_ids if object_id not in known
+    }
+    if unknown:
+        known.update(dict.fromkeys(unknown))
+
+        user = request.user
+        if user.is_authenticated:
+            object_field = f"{rated_field}_id"
+            rates = rate_model.objects.filter(
+                **{f"{object_field}__in": unknown}, profile__user_id=user.pk
+            ).values_list(object_field, "like")
+
+            for object_id, like in rates:
+                known[object_id] = "like" if like else "dislike"
+
+    return {object_id: known[object_id] for object_id in object_ids}
+
+
+class ReactionListSerializer(serializers.ListSerializer):
+    """Resolve `my_reaction` of all objects on a page with one query"""
+
+    def to_representation(self, data):
+        objects = list(data.all() if hasattr(data, "all") else data)
+        resolve_reactions(
+            self.context["request"],
+            self.child.rate_model,
+            self.child.rated_field,
+            [obj.id for obj in objects],
+        )
+
+        return super().to_representation(objects)
+
+
+class ProfileAuthorSerializer(ProfileSerializer):
+    """Profile nested in posts and comments"""
+
     username = serializers.CharField(read_only=True, source="user.username")
     profile_url = serializers.HyperlinkedIdentityField(
         read_only=True,
@@ -41,27 +195,52 @@ class ProfileListSerializer(ProfileSerializer):
         fields = [
             "username",
             "profile_picture",
+            "profile_picture_srcset",
             "profile_url",
         ]
 
 
+class ProfileListSerializer(ProfileAuthorSerializer):
+    is_following = serializers.SerializerMethodField()
+
+    class Meta(ProfileAuthorSerializer.Meta):
+        fields = ProfileAuthorSerializer.Meta.fields + ["is_following"]
+        list_serializer_class = FollowingListSerializer
+
+    def get_is_following(self, obj) -> bool:
+        """Return True if user is following profile else False"""
+        return resolve_following(self.context["request"], [obj.id])[obj.id]
+
+
 class ProfileImageUpload(ProfileSerializer):
     """Upload profile picture"""
 
     class Meta:
         model = Profile
-        fields = ["id", "profile_picture"]
+        fields = [
+            "id",
+            "profile_picture",
+            "profile_picture_status",
+            "profile_picture_srcset",
+        ]
 
 
 class PostSerializer(TaggitSerializer, serializers.ModelSerializer):
     tags = TagListSerializerField(required=False)
+    image = ProcessedImageField(required=False, allow_null=True)
+    image_srcset = ImageVariantsField(source="image_variants")
 
     class Meta:
         model = Post
-        fields = ["id", "content", "image", "tags", "created_at"]
-        extra_kwargs = {
-            "image": {"required": False},
-        }
+        fields = [
+            "id",
+            "content",
+            "image",
+            "image_status",
+            "image_srcset",
+            "tags",
+            "created_at",
+        ]
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -69,12 +248,64 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ["id", "content", "reply_to_comment", "created_at"]
 
+    def validate_reply_to_comment(self, value: Comment | None):
+        if value is None:
+            return value
+
+        if self.instance and (
+            value.pk == self.instance.pk
+            or value.path.startswith(self.instance.path)
+        ):
+            raise ValidationError("Comment can not reply to its own thread")
+
+        # moved comment takes its replies along, the deepest of them must
+        # stay within MAX_DEPTH (and its path within path max_length)
+        subtree_height = 0
+        if self.instance:
+            deepest = Comment.objects.filter(
+                path__startswith=self.instance.path
+            ).aggregate(Max("depth"))["depth__max"]
+            subtree_height = deepest - self.instance.depth
+
+        if value.depth + 1 + subtree_height > Comment.MAX_DEPTH:
+            raise ValidationError(
+                f"Replies can be nested only {Comment.MAX_DEPTH} levels deep"
+            )
+
+        return value
+
 
 class LikeDislikeCountFieldSerializer(serializers.Serializer):
     """CLass which holds common fields"""
 
+    # PostRate or CommentRate and its field of rated object
+    rate_model = None
+    rated_field = None
+
     num_of_likes = serializers.IntegerField(read_only=True)
     num_of_dislikes = serializers.IntegerField(read_only=True)
+    my_reaction = serializers.SerializerMethodField()
+
+    def get_my_reaction(self, obj) -> str | None:
+        """Return "like" or "dislike" if user rated object else None"""
+        request = self.context["request"]
+        return resolve_reactions(
+            request, self.rate_model, self.rated_field, [obj.id]
+        )[obj.id]
+
+
+class ReactionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    reaction = serializers.ChoiceField(choices=["like", "dislike"])
+
+
+class BulkReactionSerializer(serializers.Serializer):
+    """Reactions applied in given order, like/dislike of object
+    is removed by the same reaction"""
+
+    reactions = ReactionSerializer(
+        many=True, allow_empty=False, max_length=BULK_REACTIONS_MAX
+    )
 
 
 class CommentListSerializer(
@@ -84,6 +315,9 @@ class CommentListSerializer(
     of likes/dislikes/replies and see who is the author of
     comment"""
 
+    rate_model = CommentRate
+    rated_field = "comment"
+
     num_of_replies = serializers.IntegerField(read_only=True)
     like_url = serializers.HyperlinkedIdentityField(
         read_only=True,
@@ -101,7 +335,7 @@ class CommentListSerializer(
         view_name="social_media:comment-replies",
         lookup_url_kwarg="pk"
     )
-    author = ProfileListSerializer(read_only=True)
+    author = ProfileAuthorSerializer(read_only=True)
 
     class Meta:
         model = Comment
@@ -116,7 +350,9 @@ class CommentListSerializer(
             "num_of_likes",
             "num_of_dislikes",
             "num_of_replies",
+            "my_reaction",
         ]
+        list_serializer_class = ReactionListSerializer
 
     def get_replies_url(self, obj: Comment):
         """Return comment replies endpoint URI(Uniform Resource Identifier)"""
@@ -136,6 +372,42 @@ class CommentListSerializer(
         return queryset
 
 
+class CommentTreeSerializer(CommentListSerializer):
+    """Comment with first page of its replies nested down to loaded
+    depth and link to next page of replies"""
+
+    replies = serializers.SerializerMethodField()
+    replies_next = serializers.SerializerMethodField()
+
+    class Meta(CommentListSerializer.Meta):
+        fields = CommentListSerializer.Meta.fields + [
+            "replies",
+            "replies_next",
+        ]
+
+    def get_replies(self, obj: Comment) -> list[dict]:
+        return CommentTreeSerializer(
+            getattr(obj, "tree_replies", []), many=True, context=self.context
+        ).data
+
+    def get_replies_next(self, obj: Comment) -> str | None:
+        """Return replies endpoint url of replies which are not shown"""
+        if not getattr(obj, "tree_has_more_replies", False):
+            return None
+
+        url = self.context["request"].build_absolute_uri(
+            reverse("social_media:comment-replies", args=[obj.pk])
+        )
+        if not obj.tree_replies:
+            return url
+
+        return KeysetPagination().get_url_after(
+            url,
+            Comment.objects.order_by(*REPLIES_ORDERING),
+            obj.tree_replies[-1],
+        )
+
+
 class TagSerializer(TaggitSerializer, serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -157,7 +429,10 @@ class PostListSerializer(LikeDislikeCountFieldSerializer, PostSerializer):
     """List of posts, where we can see number of
     likes/dislikes/comments and post tags"""
 
-    author = ProfileListSerializer(read_only=True)
+    rate_model = PostRate
+    rated_field = "post"
+
+    author = ProfileAuthorSerializer(read_only=True)
     comments_url = serializers.HyperlinkedIdentityField(
         read_only=True,
         view_name="social_media:post-comments",
@@ -184,7 +459,9 @@ class PostListSerializer(LikeDislikeCountFieldSerializer, PostSerializer):
             "num_of_likes",
             "num_of_dislikes",
             "num_of_comments",
+            "my_reaction",
         ]
+        list_serializer_class = ReactionListSerializer
 
     @staticmethod
     def setup_eager_loading(queryset):
@@ -229,10 +506,6 @@ class ProfileDetailSerializer(ProfileSerializer):
             "posts",
         ]
 
-    def get_is_following(self, obj):
+    def get_is_following(self, obj) -> bool:
         """Return True if user is following current profile else False"""
-        user = self.context["request"].user
-        if not user.is_authenticated or not hasattr(user, "profile"):
-            return False
-
-        return user.profile.followings.filter(id=obj.id).exists()
+        return resolve_following(self.context["request"], [obj.id])[obj.id]
@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from taggit.models import Tag, TaggedItem
+
+from .cache_versions import (
+    bump_versions,
+    table_version_name,
+    profile_version_name,
+    tag_version_name,
+    TAGS_VERSION_NAME,
+)
+from .images import stored_names
+from .jobs import enqueue
+from .media_jobs import process_image
+from .models import Profile, Post, PostRate, Comment, CommentRate
+from .storage import change_references
+from .timeline import change_follower_counts
+
+VERSIONED_MODELS = [
+    get_user_model(),
+    Profile,
+    Post,
+    PostRate,
+    Comment,
+    CommentRate,
+    Tag,
+    TaggedItem,
+]
+
+
+def bump_table_version(sender, **kwargs):
+    """Invalidate everything cached from sender table"""
+    bump_versions([table_version_name(sender)])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(
+        bump_table_version,
+        sender=model,
+        dispatch_uid=f"bump_table_version_save_{model._meta.label}",
+    )
+    post_delete.connect(
+        bump_table_version,
+        sender=model,
+        dispatch_uid=f"bump_table_version_delete_{model._meta.label}",
+    )
+
+
+def bump_posts_tags_versions(posts) -> None:
+    """Invalidate lists of posts under tags of posts"""
+    tag_ids = (
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post),
+            object_id__in=posts,
+        )
+        .values_list("tag_id", flat=True)
+        .distinct()
+    )
+    bump_versions([tag_version_name(tag_id) for tag_id in tag_ids])
+
+
+@receiver(m2m_changed, sender=Profile.followings.through)
+def followings_changed(
+    sender, instance, action: str, reverse: bool, pk_set, **kwargs
+):
+    if action == "pre_clear":
+        # remember profiles to invalidate them after clear
+        related = instance.followers if reverse else instance.followings
+        instance._cleared_profile_ids = set(
+            related.values_list("id", flat=True)
+        )
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    bump_table_version(sender)
+
+    if action == "post_clear":
+        pk_set = getattr(instance, "_cleared_profile_ids", set())
+
+    # added ids are only the new ones, removed ids are the requested ones
+    if pk_set:
+        delta = 1 if action == "post_add" else -1
+        if reverse:
+            change_follower_counts([instance.pk], delta * len(pk_set))
+        else:
+            change_follower_counts(pk_set, delta)
+
+    bump_versions(
+        [profile_version_name(profile_id) for profile_id in pk_set]
+        + [profile_version_name(instance.pk)]
+    )
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance: Profile, **kwargs):
+    bump_versions([profile_version_name(instance.pk)])
+    bump_posts_tags_versions(
+        Post.objects.filter(author_id=instance.pk).values("id")
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    profile = Profile.objects.filter(user=instance).first()
+    if profile:
+        profile_changed(Profile, profile)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance: Post, **kwargs):
+    # number of profile posts
+    bump_versions([profile_version_name(instance.author_id)])
+    bump_posts_tags_versions([instance.pk])
+
+
+@receiver(post_save, sender=PostRate)
+@receiver(post_delete, sender=PostRate)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def post_counters_changed(sender, instance, **kwargs):
+    bump_posts_tags_versions([instance.post_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance: Tag, **kwargs):
+    bump_versions([TAGS_VERSION_NAME, tag_version_name(instance.pk)])
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def tagged_item_changed(sender, instance: TaggedItem, **kwargs):
+    bump_versions([tag_version_name(instance.tag_id)])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def image_uploaded(sender, instance, **kwargs):
+    for field in getattr(instance, "_uploaded_images", []):
+        enqueue(
+            process_image,
+            model=sender._meta.label,
+            pk=instance.pk,
+            field=field,
+            name=getattr(instance, field).name,
+        )
+    instance._uploaded_images = []
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def stored_images_saved(sender, instance, created: bool, **kwargs):
+    old = {} if created else getattr(instance, "_stored_images", {})
+    new = stored_names(instance, sender.image_fields)
+
+    added, removed = set(), set()
+    for field, names in new.items():
+        # files of instance which was not loaded from database are unknown
+        if not created and field not in old:
+            continue
+        added |= names - old.get(field, set())
+        removed |= old.get(field, set()) - names
+
+    change_references(added, removed)
+    instance._stored_images = new
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Profile)
+def stored_images_deleted(sender, instance, **kwargs):
+    names = stored_names(instance, sender.image_fields).values()
+    change_references(set(), set().union(*names))
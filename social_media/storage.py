@@ -0,0 +1,65 @@
+"""Content addressed media storage. Files are stored once under sha256 of
+their content, so the same image uploaded by many profiles is one file.
+Post images and profile pictures (originals and variants) count their
+references in MediaBlob, files which are not referenced for
+MEDIA_GC_GRACE seconds are deleted by `python manage.py collect_media`"""
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MediaBlob
+from .uploads import content_hash
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Save file as `<directory>/<hash><extension>`, directory and
+    extension come from requested name. File with the same content is
+    not written again"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = content_hash(content)
+        directory = posixpath.dirname(name)
+        _, extension = posixpath.splitext(name)
+        name = posixpath.join(directory, digest + extension.lower())
+
+        # blob is registered before file is written, garbage collector
+        # does not delete file which was just saved again
+        touch_blobs([name])
+        if self.exists(name):
+            return name
+
+        return super().save(name, content, max_length)
+
+
+def touch_blobs(names) -> None:
+    """Register stored files, they are collected when nothing references
+    them for MEDIA_GC_GRACE seconds"""
+    now = timezone.now()
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, updated_at=now) for name in names],
+        ignore_conflicts=True,
+    )
+    MediaBlob.objects.filter(name__in=names).update(updated_at=now)
+
+
+def change_references(added: set[str], removed: set[str]) -> None:
+    """Count references of files which started and stopped being used by
+    post or profile"""
+    now = timezone.now()
+    if added:
+        # files stored before this storage have no blob yet
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, updated_at=now) for name in added],
+            ignore_conflicts=True,
+        )
+        MediaBlob.objects.filter(name__in=added).update(
+            references=F("references") + 1, updated_at=now
+        )
+    if removed:
+        MediaBlob.objects.filter(name__in=removed).update(
+            references=F("references") - 1, updated_at=now
+        )
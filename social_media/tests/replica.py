@@ -0,0 +1,45 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+
+
+class StandInReplicaMixin:
+    """Add second database which stands in for replica while tests of the
+    class run. It is not replicated, so rows written to primary are not
+    found there. Test runner creates only databases which exist before
+    tests run, replica is added to databases of test case here"""
+
+    @classmethod
+    def setUpClass(cls):
+        default = connections.settings[DEFAULT_DB_ALIAS]
+        # settings are DATABASES setting, other tests do not see replica
+        # once it is removed
+        connections.settings[REPLICA] = {
+            **default,
+            "NAME": f"{default['NAME']}_replica",
+            "TEST": {**default["TEST"], "NAME": None, "MIRROR": None},
+        }
+        connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        cls.primary_databases = cls.databases
+        cls.databases = {*cls.databases, REPLICA}
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.remove_stand_in_replica()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls.remove_stand_in_replica()
+
+    @classmethod
+    def remove_stand_in_replica(cls):
+        cls.databases = cls.primary_databases
+        connections[REPLICA].creation.destroy_test_db(verbosity=0)
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
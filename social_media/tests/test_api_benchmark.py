@@ -0,0 +1,64 @@
+import json
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from social_media.api_benchmark import (
+    BASELINE_PATH,
+    ENDPOINTS,
+    measure,
+    missing_endpoints,
+    seed,
+)
+
+BASELINE = json.loads(BASELINE_PATH.read_text())
+
+SMALL_VOLUMES = {
+    "profiles": 5,
+    "posts": 3,
+    "comments": 2,
+    "replies": 2,
+    "followings": 3,
+    "rates": 5,
+    "tags": 3,
+}
+
+
+class BenchmarkEndpointsTests(TestCase):
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(missing_endpoints(), [])
+
+    def test_every_endpoint_is_in_baseline(self):
+        self.assertEqual(
+            sorted(BASELINE["endpoints"]),
+            sorted(endpoint.key for endpoint in ENDPOINTS),
+        )
+
+
+@skipUnless(
+    connection.vendor == BASELINE["database"],
+    "Number of queries depends on database",
+)
+class BenchmarkQueriesTests(TestCase):
+    """Number of endpoint queries does not depend on number of objects,
+    so endpoints are checked against baseline on small data"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = seed(**SMALL_VOLUMES)
+
+    def test_queries_do_not_exceed_baseline(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                for endpoint in ENDPOINTS:
+                    with self.subTest(endpoint.key):
+                        measurement = measure(
+                            endpoint, self.fixtures, repeats=2
+                        )
+
+                        self.assertLessEqual(
+                            measurement.queries,
+                            BASELINE["endpoints"][endpoint.key]["queries"],
+                        )
@@ -1,5 +1,12 @@
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -10,15 +17,19 @@ from social_media.serializers import (
     CommentListSerializer,
 )
 from social_media.models import Post, Comment, CommentRate
-from social_media.view_utils import count_likes_dislikes
-
-from .models_create_sample import (
+from social_media.view_utils import order_by_likes_dislikes
+from social_media.comment_tree import (
+    MAX_TREE_DEPTH,
+    TREE_REPLIES_PAGE_SIZE,
+    descendants,
+)
+from social_media.sample_data import (
     create_number_of_posts,
     create_number_of_comments,
-    annotate_comments,
-    annotate_posts,
 )
 
+from .models_create_sample import annotate_comments, annotate_posts
+
 
 def comment_manager_url(comment_id):
     return reverse("social_media:comment-manager", args=[comment_id])
@@ -28,6 +39,11 @@ def post_comment_list(post_id):
     return reverse("social_media:post-comments", args=[post_id])
 
 
+def post_comments_tree(post_id, **params):
+    url = reverse("social_media:post-comments-tree", args=[post_id])
+    return f"{url}?{urlencode(params)}" if params else url
+
+
 def comment_replies_list(comment_id):
     return reverse("social_media:comment-replies", args=[comment_id])
 
@@ -125,7 +141,7 @@ class AuthenticatedPostApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
         replies = self.comment.replies.all()
-        annotated = count_likes_dislikes(replies, "commentrate")
+        annotated = order_by_likes_dislikes(replies)
         serializer = CommentListSerializer(
             annotated, many=True, context={"request": res.wsgi_request}
         )
@@ -174,6 +190,311 @@ class AuthenticatedPostApiTests(TestCase):
             self.profile.id, profiles_disliked.values_list("profile", flat=True)
         )
 
+    def test_reactions_update_comment_counters(self):
+        self.client.post(like_unliked_url(self.comment.id))
+        self.comment.refresh_from_db()
+        self.assertEqual(
+            (self.comment.num_of_likes, self.comment.num_of_dislikes), (1, 0)
+        )
+
+        self.client.post(dislike_remove_disliked_url(self.comment.id))
+        self.comment.refresh_from_db()
+        self.assertEqual(
+            (self.comment.num_of_likes, self.comment.num_of_dislikes), (0, 1)
+        )
+
+    def test_create_and_delete_reply_updates_counters(self):
+        res = self.client.post(
+            post_comment_list(self.post.id),
+            {"content": "Reply", "reply_to_comment": self.comment.id},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.post.num_of_comments, 1)
+        self.assertEqual(self.comment.num_of_replies, 1)
+
+        res = self.client.delete(comment_manager_url(res.data["id"]))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.post.num_of_comments, 0)
+        self.assertEqual(self.comment.num_of_replies, 0)
+
+    def reply_with_api(self, comment: Comment) -> Comment:
+        res = self.client.post(
+            post_comment_list(self.post.id),
+            {"content": "Reply", "reply_to_comment": comment.id},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Comment.objects.get(id=res.data["id"])
+
+    def test_reply_path_and_descendants(self):
+        reply = self.reply_with_api(self.comment)
+        nested = self.reply_with_api(reply)
+
+        self.comment.refresh_from_db()
+        reply.refresh_from_db()
+        self.assertEqual(nested.path, reply.path + f"{nested.id:010d}/")
+        self.assertEqual(nested.ancestor_ids(), [self.comment.id, reply.id])
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(
+            (self.comment.num_of_descendants, reply.num_of_descendants),
+            (2, 1),
+        )
+        self.assertEqual(self.comment.thread_updated_at, nested.created_at)
+
+    def test_delete_comment_keeps_its_replies(self):
+        reply = self.reply_with_api(self.comment)
+        nested = self.reply_with_api(reply)
+        nested_reply = self.reply_with_api(nested)
+        other_reply = self.reply_with_api(self.comment)
+        self.post.refresh_from_db()
+        num_of_comments = self.post.num_of_comments
+
+        res = self.client.delete(comment_manager_url(reply.id))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.comment.refresh_from_db()
+        self.post.refresh_from_db()
+        nested.refresh_from_db()
+        nested_reply.refresh_from_db()
+        self.assertFalse(Comment.objects.filter(id=reply.id).exists())
+        # replies of deleted comment become top comments of post
+        self.assertIsNone(nested.reply_to_comment)
+        self.assertEqual((nested.depth, nested.ancestor_ids()), (0, []))
+        self.assertEqual(nested_reply.ancestor_ids(), [nested.id])
+        self.assertEqual(nested.num_of_descendants, 1)
+        self.assertEqual(
+            (self.comment.num_of_replies, self.comment.num_of_descendants),
+            (1, 1),
+        )
+        self.assertEqual(self.post.num_of_comments, num_of_comments - 1)
+        self.assertEqual(
+            set(Comment.objects.filter(post=self.post)),
+            {self.comment, other_reply, nested, nested_reply},
+        )
+
+    def test_move_reply_moves_its_thread(self):
+        reply = self.reply_with_api(self.comment)
+        nested = self.reply_with_api(reply)
+        other = Comment.objects.create(author=self.profile, post=self.post)
+
+        res = self.client.patch(
+            comment_manager_url(reply.id), {"reply_to_comment": other.id}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        nested.refresh_from_db()
+        self.comment.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(nested.ancestor_ids(), [other.id, reply.id])
+        self.assertEqual(
+            (self.comment.num_of_descendants, other.num_of_descendants),
+            (0, 2),
+        )
+
+        res = self.client.patch(
+            comment_manager_url(reply.id), {"reply_to_comment": nested.id}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch.object(Comment, "MAX_DEPTH", 2)
+    def test_move_rejected_when_thread_gets_too_deep(self):
+        reply = self.reply_with_api(self.comment)
+        self.reply_with_api(reply)
+        other = Comment.objects.create(author=self.profile, post=self.post)
+        deep = Comment.objects.create(
+            author=self.profile, post=self.post, reply_to_comment=other
+        )
+
+        # nested reply would be third level below top comment
+        res = self.client.patch(
+            comment_manager_url(reply.id), {"reply_to_comment": deep.id}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(
+            comment_manager_url(reply.id), {"reply_to_comment": other.id}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_comment_can_not_reply_to_itself(self):
+        res = self.client.patch(
+            comment_manager_url(self.comment.id),
+            {"reply_to_comment": self.comment.id},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reconcile_counters_fixes_descendants(self):
+        self.reply_with_api(self.reply_with_api(self.comment))
+        Comment.objects.update(num_of_descendants=0)
+
+        call_command("reconcile_counters", stdout=StringIO())
+
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.num_of_descendants, 2)
+
+    def test_comments_show_my_reaction_with_constant_queries(self):
+        CommentRate.objects.create(
+            like=False, profile=self.profile, comment=self.comment
+        )
+        with CaptureQueriesContext(connection) as one_comment_queries:
+            res = self.client.get(post_comment_list(self.post.id))
+        self.assertEqual(res.data["results"][0]["my_reaction"], "dislike")
+
+        for comment in create_number_of_comments(5, self.post, self.profile):
+            CommentRate.objects.create(
+                like=True, profile=self.profile, comment=comment
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(post_comment_list(self.post.id))
+
+        self.assertEqual(len(queries), len(one_comment_queries))
+        self.assertEqual(
+            sorted(comment["my_reaction"] for comment in res.data["results"]),
+            ["dislike"] + ["like"] * 5,
+        )
+
+    def test_bulk_reactions_update_counters(self):
+        reply = create_number_of_comments(
+            1, self.post, self.profile, reply_to_comment=self.comment
+        )[0]
+
+        res = self.client.post(
+            reverse("social_media:comment-reactions"),
+            data={
+                "reactions": [
+                    {"id": self.comment.id, "reaction": "like"},
+                    {"id": reply.id, "reaction": "dislike"},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["reaction"] for result in res.data["results"]],
+            ["like", "dislike"],
+        )
+        self.comment.refresh_from_db()
+        reply.refresh_from_db()
+        self.assertEqual(
+            (self.comment.num_of_likes, reply.num_of_dislikes), (1, 1)
+        )
+        self.assertEqual(CommentRate.objects.count(), 2)
+
+    def create_reply(self, comment: Comment, likes: int = 0) -> Comment:
+        reply = Comment.objects.create(
+            author=self.profile,
+            post=self.post,
+            reply_to_comment=comment,
+            num_of_likes=likes,
+        )
+        Comment.objects.filter(id=comment.id).update(
+            num_of_replies=comment.replies.count()
+        )
+        return reply
+
+    def test_comments_tree(self):
+        reply = self.create_reply(self.comment)
+        popular_reply = self.create_reply(self.comment, likes=2)
+        nested = self.create_reply(reply)
+        self.create_reply(nested)
+
+        res = self.client.get(post_comments_tree(self.post.id, depth=3))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        root = res.data["results"][0]
+        self.assertEqual(root["id"], self.comment.id)
+        self.assertEqual(
+            [reply["id"] for reply in root["replies"]],
+            [popular_reply.id, reply.id],
+        )
+        self.assertIsNone(root["replies_next"])
+
+        nested_data = root["replies"][1]["replies"][0]
+        self.assertEqual(nested_data["id"], nested.id)
+        # fourth level is not loaded, link to it is shown
+        self.assertEqual(nested_data["replies"], [])
+        self.assertTrue(
+            nested_data["replies_next"].endswith(
+                comment_replies_list(nested.id)
+            )
+        )
+
+    def test_comments_tree_replies_next_continues_on_replies_endpoint(self):
+        replies = [
+            self.create_reply(self.comment, likes=likes)
+            for likes in range(TREE_REPLIES_PAGE_SIZE + 2)
+        ]
+
+        res = self.client.get(post_comments_tree(self.post.id, depth=2))
+        root = res.data["results"][0]
+        shown = [reply["id"] for reply in root["replies"]]
+
+        next_res = self.client.get(root["replies_next"])
+        rest = [reply["id"] for reply in next_res.data["results"]]
+
+        self.assertEqual(len(shown), TREE_REPLIES_PAGE_SIZE)
+        self.assertEqual(
+            shown + rest, [reply.id for reply in reversed(replies)]
+        )
+
+    def test_comments_tree_queries_do_not_depend_on_size(self):
+        def tree_queries() -> int:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(post_comments_tree(self.post.id))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.create_reply(self.create_reply(self.comment))
+        small_tree_queries = tree_queries()
+
+        for comment in create_number_of_comments(3, self.post, self.profile):
+            self.create_reply(self.create_reply(comment))
+            self.create_reply(comment)
+
+        self.assertEqual(tree_queries(), small_tree_queries)
+
+    def test_comments_tree_loads_only_shown_replies(self):
+        page_size = 2
+        replies = [
+            self.create_reply(self.comment, likes=likes) for likes in range(3)
+        ]
+        for reply in replies:
+            for likes in range(3):
+                self.create_reply(reply, likes=likes)
+
+        loaded = descendants([self.comment], 3, page_size)
+
+        shown = {replies[2].id, replies[1].id}
+        self.assertEqual({reply.id for reply in loaded[:page_size]}, shown)
+        # replies of hidden reply are not loaded
+        self.assertEqual(
+            {reply.reply_to_comment_id for reply in loaded[page_size:]}, shown
+        )
+        self.assertEqual(len(loaded), page_size + page_size ** 2)
+
+    def test_comments_tree_descendants_are_read_with_one_query(self):
+        reply = self.create_reply(self.comment)
+        self.create_reply(self.create_reply(reply))
+        other_root = create_number_of_comments(1, self.post, self.profile)[0]
+        self.create_reply(other_root)
+
+        with self.assertNumQueries(1):
+            loaded = descendants([self.comment, other_root], 2, 5)
+
+        self.assertEqual(len(loaded), 3)
+
+    def test_comments_tree_depth_validation(self):
+        for depth in [0, MAX_TREE_DEPTH + 1, "deep"]:
+            res = self.client.get(post_comments_tree(self.post.id, depth=depth))
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_like_comment_profile_required(self):
         self.profile.delete()
         self.user.refresh_from_db()
@@ -0,0 +1,121 @@
+import importlib
+import os
+import threading
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.db.utils import load_backend
+from django.test import SimpleTestCase, TestCase
+
+POOL_ENGINE = "social_media_api.postgresql_pool"
+
+
+@skipUnless(connection.vendor == "postgresql", "Pool needs PostgreSQL")
+class PooledConnectionTests(TestCase):
+    def setUp(self) -> None:
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": POOL_ENGINE,
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": True,
+            "POOL": {"minconn": 0, "maxconn": 2, "idle_timeout": 600},
+        }
+        backend = load_backend(POOL_ENGINE)
+        self.pooled = backend.DatabaseWrapper(settings_dict, alias="pooled")
+        self.addCleanup(backend.close_pools)
+        self.addCleanup(self.pooled.close)
+
+    def backend_pid(self) -> int:
+        with self.pooled.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def test_closed_connection_is_reused(self):
+        pid = self.backend_pid()
+        self.pooled.close()
+
+        self.assertEqual(self.backend_pid(), pid)
+
+    def test_transaction_left_open_is_rolled_back(self):
+        self.pooled.set_autocommit(False)
+        with self.pooled.cursor() as cursor:
+            cursor.execute("CREATE TEMPORARY TABLE pool_check (id int)")
+        self.pooled.close()
+
+        with self.pooled.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pool_check')")
+            self.assertIsNone(cursor.fetchone()[0])
+
+    def test_connection_closed_by_server_is_replaced(self):
+        pid = self.backend_pid()
+        self.pooled.close()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+
+        self.assertNotEqual(self.backend_pid(), pid)
+
+    def take_only_connection(self, timeout: float):
+        """Connect other wrapper to new pool of one connection, pools are
+        shared by connection parameters"""
+        self.pooled.settings_dict["POOL"].update(maxconn=1, timeout=timeout)
+        self.pooled.settings_dict["OPTIONS"] = {
+            **self.pooled.settings_dict["OPTIONS"],
+            "application_name": self.id().rsplit(".", 1)[-1],
+        }
+        other = load_backend(POOL_ENGINE).DatabaseWrapper(
+            self.pooled.settings_dict, alias="other"
+        )
+        other.connect()
+        self.addCleanup(other.close)
+        return other
+
+    def test_full_pool_waits_for_returned_connection(self):
+        other = self.take_only_connection(timeout=10)
+        held = other.connection
+        other.inc_thread_sharing()
+        self.addCleanup(other.dec_thread_sharing)
+        threading.Timer(0.1, other.close).start()
+
+        self.pooled.ensure_connection()
+        self.assertIs(self.pooled.connection, held)
+
+    def test_full_pool_times_out(self):
+        self.take_only_connection(timeout=0.1)
+
+        with self.assertRaises(OperationalError):
+            self.pooled.ensure_connection()
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return importlib.reload(
+                importlib.import_module("social_media_api.settings_production")
+            )
+
+    def test_debug_toolbar_off_and_connections_persistent(self):
+        production = self.load()
+
+        self.assertFalse(production.DEBUG)
+        self.assertNotIn("debug_toolbar", production.INSTALLED_APPS)
+        self.assertFalse(
+            any("debug_toolbar" in item for item in production.MIDDLEWARE)
+        )
+        self.assertEqual(production.DATABASES["default"]["CONN_MAX_AGE"], 600)
+        self.assertTrue(production.DATABASES["default"]["CONN_HEALTH_CHECKS"])
+
+    def test_pool_enabled(self):
+        production = self.load(DB_POOL="True", DB_POOL_MAX_SIZE="50")
+        database = production.DATABASES["default"]
+
+        self.assertEqual(database["ENGINE"], POOL_ENGINE)
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["POOL"]["maxconn"], 50)
+
+    def test_pool_sized_for_every_thread(self):
+        production = self.load(DB_POOL="True", SERVER_THREADS="4")
+
+        self.assertEqual(production.DATABASES["default"]["POOL"]["maxconn"], 4)
+        with self.assertRaises(ImproperlyConfigured):
+            self.load(DB_POOL="True", SERVER_THREADS="4", DB_POOL_MAX_SIZE="3")
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from taggit.models import Tag
+
+from social_media.db_routers import ReplicaLag, replica_lag, use_primary
+from social_media.models import Post
+from social_media.sample_data import create_number_of_posts
+
+from .replica import REPLICA, StandInReplicaMixin
+
+POST_LIST = reverse("social_media:post-list")
+TAG_LIST = reverse("social_media:tag-list")
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(StandInReplicaMixin, TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.profile = self.user.profile
+        create_number_of_posts(2, self.profile)
+        replica_lag.checked.clear()
+
+    def client_of(self, user, token: str) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user)
+        # identifies client, user is authenticated without token lookup
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        return client
+
+    def test_reads_routed_to_replica_and_writes_to_primary(self):
+        self.assertEqual(router.db_for_read(Post), REPLICA)
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+
+        with use_primary():
+            self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_get_reads_replica(self):
+        res = APIClient().get(POST_LIST)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [])
+        self.assertEqual(Post.objects.using(DEFAULT_DB_ALIAS).count(), 2)
+
+    def test_writer_reads_primary_after_write(self):
+        writer = self.client_of(self.user, "writer")
+        reader = self.client_of(self.user, "reader")
+
+        res = writer.post(POST_LIST, {"content": "New"})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(writer.get(POST_LIST).data["results"]), 3)
+        self.assertEqual(reader.get(POST_LIST).data["results"], [])
+
+    def test_failed_write_does_not_pin_client(self):
+        writer = self.client_of(self.user, "writer")
+
+        res = writer.post(reverse("social_media:post-like", args=[0]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.assertEqual(writer.get(POST_LIST).data["results"], [])
+
+    @override_settings(REPLICA_STICKY_SECONDS=0, REPLICA_MAX_LAG=0)
+    def test_writer_reads_replica_after_sticky_time(self):
+        writer = self.client_of(self.user, "writer")
+        writer.post(POST_LIST, {"content": "New"})
+
+        self.assertEqual(writer.get(POST_LIST).data["results"], [])
+
+    def test_lagging_replica_not_read(self):
+        with mock.patch.object(ReplicaLag, "measure", return_value=10.0):
+            res = APIClient().get(POST_LIST)
+
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_cached_responses_built_from_primary(self):
+        Tag.objects.create(name="Primary")
+
+        res = APIClient().get(TAG_LIST)
+
+        self.assertEqual(
+            [tag["name"] for tag in res.data["results"]], ["Primary"]
+        )
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from social_media.counters import reconcile_counters
+from social_media.models import Profile, Post, PostRate, Comment, CommentRate
+
+OPTIONS = {
+    "users": 20,
+    "followings": 5,
+    "posts": 2,
+    "tags": 5,
+    "comments": 2,
+    "replies": 1.5,
+    "reply_decay": 0.7,
+    "max_depth": 4,
+    "post_reactions": 5,
+    "comment_reactions": 2,
+    "batch_size": 50,
+}
+
+
+def generate(**options):
+    call_command("generate_data", stdout=StringIO(), **{**OPTIONS, **options})
+
+
+def snapshot() -> dict:
+    return {
+        "follows": list(
+            Profile.followings.through.objects.values_list(
+                "from_profile__user__username", "to_profile__user__username"
+            ).order_by("id")
+        ),
+        "posts": list(
+            Post.objects.values_list(
+                "author__user__username", "content", "num_of_likes"
+            ).order_by("id")
+        ),
+        "comments": list(
+            Comment.objects.values_list("post__content", "depth").order_by(
+                "id"
+            )
+        ),
+    }
+
+
+class GenerateDataTests(TestCase):
+    def test_generated_data_is_consistent(self):
+        generate()
+
+        self.assertEqual(get_user_model().objects.count(), OPTIONS["users"])
+        self.assertEqual(Profile.objects.count(), OPTIONS["users"])
+        self.assertTrue(Post.objects.exists())
+        self.assertTrue(PostRate.objects.exists())
+        self.assertTrue(CommentRate.objects.exists())
+        self.assertTrue(Comment.objects.filter(depth__gt=0).exists())
+        self.assertFalse(
+            Profile.followings.through.objects.filter(
+                from_profile=F("to_profile")
+            ).exists()
+        )
+        # stored counters match generated rows
+        self.assertEqual(reconcile_counters(Post), 0)
+        self.assertEqual(reconcile_counters(Comment), 0)
+
+        for reply in Comment.objects.filter(
+            reply_to_comment__isnull=False
+        ).select_related("reply_to_comment"):
+            parent = reply.reply_to_comment
+            self.assertEqual(reply.depth, parent.depth + 1)
+            self.assertLessEqual(reply.depth, OPTIONS["max_depth"])
+            self.assertEqual(reply.path, f"{parent.path}{reply.id:010d}/")
+
+    def test_new_rows_get_next_ids(self):
+        generate(users=2)
+        post = Post.objects.order_by("-id").first()
+        user = get_user_model().objects.create_user(
+            email="new@gmail.com", password="rvtquen", username="New"
+        )
+
+        new_post = Post.objects.create(author=user.profile)
+
+        self.assertGreater(new_post.id, post.id)
+
+    def test_same_seed_generates_same_data(self):
+        generate(seed=7)
+        first = snapshot()
+        get_user_model().objects.all().delete()
+
+        generate(seed=7)
+
+        self.assertEqual(snapshot(), first)
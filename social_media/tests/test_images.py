@@ -0,0 +1,160 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from social_media.jobs import work
+from social_media.models import Post
+
+POST_LIST = reverse("social_media:post-list")
+PROFILE_LIST = reverse("social_media:profile-list")
+
+# EXIF tags
+ORIENTATION = 0x0112
+CAMERA_MODEL = 0x0110
+
+
+def image_upload(
+    size=(800, 400), image_format="JPEG", mode="RGB", exif=None
+) -> SimpleUploadedFile:
+    image = Image.new(mode, size, "red")
+    buffer = BytesIO()
+    params = {"exif": exif} if exif is not None else {}
+    image.save(buffer, format=image_format, **params)
+
+    return SimpleUploadedFile(
+        f"upload.{image_format.lower()}", buffer.getvalue()
+    )
+
+
+def camera_exif(orientation: int = 1) -> Image.Exif:
+    exif = Image.Exif()
+    exif[CAMERA_MODEL] = "Camera"
+    exif[ORIENTATION] = orientation
+    return exif
+
+
+def open_stored(name: str) -> Image.Image:
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    return image
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160, 320, 1280])
+class ImagePipelineTests(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, image: SimpleUploadedFile) -> Post:
+        res = self.client.post(
+            POST_LIST, {"content": "Image", "image": image}, format="multipart"
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        work(burst=True)
+
+        return Post.objects.get(id=res.data["id"])
+
+    def test_metadata_stripped_and_orientation_applied(self):
+        post = self.create_post(image_upload(exif=camera_exif(orientation=6)))
+
+        original = open_stored(post.image.name)
+        self.assertEqual(original.size, (400, 800))
+        self.assertEqual(dict(original.getexif()), {})
+
+    def test_variants_not_bigger_than_original(self):
+        post = self.create_post(image_upload())
+
+        variants = [
+            (variant["format"], variant["width"], variant["height"])
+            for variant in post.image_variants
+        ]
+        self.assertEqual(
+            variants,
+            [
+                ("webp", 160, 80),
+                ("jpeg", 160, 80),
+                ("webp", 320, 160),
+                ("jpeg", 320, 160),
+                ("webp", 800, 400),
+                ("jpeg", 800, 400),
+            ],
+        )
+        for variant in post.image_variants:
+            image = open_stored(variant["name"])
+            self.assertEqual(image.format, variant["format"].upper())
+            self.assertEqual(image.width, variant["width"])
+
+    def test_transparent_image_flattened_in_jpeg(self):
+        post = self.create_post(image_upload(image_format="PNG", mode="RGBA"))
+
+        self.assertTrue(post.image.name.endswith(".png"))
+        jpeg = next(
+            variant
+            for variant in post.image_variants
+            if variant["format"] == "jpeg"
+        )
+        self.assertEqual(open_stored(jpeg["name"]).mode, "RGB")
+
+    def test_same_image_stored_once(self):
+        first = self.create_post(image_upload())
+        second = self.create_post(image_upload())
+
+        self.assertEqual(first.image_variants, second.image_variants)
+
+    def test_srcset_in_list_responses(self):
+        self.create_post(image_upload())
+        upload_url = reverse(
+            "social_media:profile-upload-profile-picture",
+            args=[self.user.profile.id],
+        )
+        self.client.post(
+            upload_url,
+            {"profile_picture": image_upload(size=(100, 100))},
+            format="multipart",
+        )
+        work(burst=True)
+
+        post = self.client.get(POST_LIST).data["results"][0]
+        self.assertEqual(list(post["image_srcset"]), ["webp", "jpeg"])
+        self.assertIn(" 160w, ", post["image_srcset"]["webp"])
+        self.assertTrue(post["image_srcset"]["jpeg"].startswith("http://"))
+        author_srcset = post["author"]["profile_picture_srcset"]
+        self.assertIn(" 100w", author_srcset["webp"])
+
+        profile = self.client.get(PROFILE_LIST).data["results"][0]
+        self.assertIsNotNone(profile["profile_picture_srcset"])
+
+    def test_post_without_image_has_no_srcset(self):
+        res = self.client.post(POST_LIST, {"content": "Text"})
+
+        self.assertIsNone(res.data["image_srcset"])
+
+    def test_variants_created_for_old_images(self):
+        post = self.create_post(image_upload())
+        Post.objects.filter(id=post.id).update(image_variants=[])
+
+        call_command("generate_image_variants", stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(len(post.image_variants), 6)
@@ -0,0 +1,268 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from social_media.db_routers import replica_lag
+from social_media.jobs import DatabaseQueue, enqueue, job, work
+from social_media.media_jobs import process_image
+from social_media.models import Job, Post
+
+from .replica import REPLICA, StandInReplicaMixin
+from .test_images import camera_exif, image_upload, open_stored
+
+POST_LIST = reverse("social_media:post-list")
+
+calls = []
+
+
+@job
+def record_call(value: int) -> None:
+    calls.append(value)
+
+
+@job
+def always_fail() -> None:
+    raise ValueError("Broken job")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_job_runs_and_is_deleted(self):
+        enqueue(record_call, value=1)
+        enqueue(record_call, value=2)
+
+        self.assertEqual(work(burst=True), 2)
+
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        enqueue(record_call, value=1)
+        Job.objects.update(run_at=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(work(burst=True), 0)
+        self.assertEqual(calls, [])
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=10)
+    def test_failed_job_retried_then_marked_failed(self):
+        enqueue(always_fail)
+        work(burst=True)
+
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, Job.Status.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn("Broken job", queued.error)
+
+        Job.objects.update(run_at=timezone.now())
+        work(burst=True)
+
+        failed = Job.objects.get()
+        self.assertEqual(failed.status, Job.Status.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        # failed job is not run again
+        self.assertEqual(work(burst=True), 0)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_job_of_dead_worker_queued_again(self):
+        enqueue(record_call, value=1)
+        Job.objects.update(
+            status=Job.Status.RUNNING,
+            started_at=timezone.now() - timedelta(minutes=2),
+        )
+        self.assertEqual(work(burst=True), 0)
+
+        self.assertEqual(DatabaseQueue().requeue_stale(), 1)
+
+        self.assertEqual(work(burst=True), 1)
+        self.assertEqual(calls, [1])
+
+    @override_settings(JOB_QUEUE_BACKEND="social_media.jobs.ImmediateQueue")
+    def test_immediate_queue(self):
+        enqueue(record_call, value=1)
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_worker_command(self):
+        enqueue(record_call, value=1)
+        out = StringIO()
+
+        call_command(
+            "run_worker", "--burst", "--processes", "1", stdout=out
+        )
+
+        self.assertEqual(calls, [1])
+        self.assertIn("Run 1 jobs", out.getvalue())
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160])
+class ImageProcessingJobTests(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_post_processing_then_ready(self):
+        res = self.client.post(
+            POST_LIST,
+            {"content": "Image", "image": image_upload(exif=camera_exif())},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["image_status"], "processing")
+        # original with metadata is not shown
+        self.assertIsNone(res.data["image"])
+        self.assertIsNone(res.data["image_srcset"])
+        uploaded = Post.objects.get(id=res.data["id"]).image.name
+
+        work(burst=True)
+
+        post = Post.objects.get(id=res.data["id"])
+        self.assertEqual(post.image_status, "ready")
+        self.assertEqual(len(post.image_phash), 16)
+        self.assertEqual(dict(open_stored(post.image.name).getexif()), {})
+        # original with metadata is deleted by garbage collector
+        call_command("collect_media", "--grace", "0", stdout=StringIO())
+        self.assertFalse(default_storage.exists(uploaded))
+
+        res = self.client.get(POST_LIST)
+        listed = res.data["results"][0]
+        self.assertTrue(listed["image"].endswith(post.image.name))
+        self.assertIsNotNone(listed["image_srcset"])
+
+    def test_same_image_has_same_hash(self):
+        for _ in range(2):
+            self.client.post(
+                POST_LIST,
+                {"content": "Image", "image": image_upload()},
+                format="multipart",
+            )
+        work(burst=True)
+
+        hashes = set(Post.objects.values_list("image_phash", flat=True))
+        self.assertEqual(len(hashes), 1)
+
+    def test_replaced_image_not_overwritten(self):
+        res = self.client.post(
+            POST_LIST,
+            {"content": "Image", "image": image_upload()},
+            format="multipart",
+        )
+        post = Post.objects.get(id=res.data["id"])
+        post.image = image_upload(size=(300, 300))
+        post.save()
+
+        work(burst=True)
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, "ready")
+        self.assertEqual(open_stored(post.image.name).size, (300, 300))
+
+    def test_broken_image_marked_failed(self):
+        res = self.client.post(
+            POST_LIST,
+            {"content": "Image", "image": image_upload()},
+            format="multipart",
+        )
+        post = Post.objects.get(id=res.data["id"])
+        default_storage.delete(post.image.name)
+        default_storage.save(post.image.name, ContentFile(b"not image"))
+
+        work(burst=True)
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, "failed")
+        self.assertFalse(Job.objects.exists())
+
+    def test_profile_picture_processed(self):
+        profile = self.user.profile
+        url = reverse(
+            "social_media:profile-upload-profile-picture", args=[profile.id]
+        )
+        res = self.client.post(
+            url,
+            {"profile_picture": image_upload(size=(100, 100))},
+            format="multipart",
+        )
+        self.assertEqual(res.data["profile_picture_status"], "processing")
+
+        work(burst=True)
+
+        profile.refresh_from_db()
+        self.assertEqual(profile.profile_picture_status, "ready")
+        self.assertEqual(len(profile.profile_picture_variants), 2)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160], DATABASE_REPLICAS=[REPLICA])
+class ImageProcessingWithReplicaTests(
+    StandInReplicaMixin, TransactionTestCase
+):
+    """Stand-in replica never gets rows written to primary, like replica
+    which lags behind"""
+
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        replica_lag.checked.clear()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_image_of_row_missing_on_replica_processed(self):
+        res = self.client.post(
+            POST_LIST,
+            {"content": "Image", "image": image_upload()},
+            format="multipart",
+        )
+
+        work(burst=True)
+
+        post = Post.objects.using(DEFAULT_DB_ALIAS).get(id=res.data["id"])
+        self.assertEqual(post.image_status, "ready")
+
+    def test_job_of_missing_row_retried(self):
+        enqueue(
+            process_image,
+            model="social_media.Post",
+            pk=1,
+            field="image",
+            name="post_picture/missing.jpg",
+        )
+
+        work(burst=True)
+
+        queued = Job.objects.using(DEFAULT_DB_ALIAS).get()
+        self.assertEqual(queued.status, Job.Status.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn("DoesNotExist", queued.error)
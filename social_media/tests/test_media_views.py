@@ -0,0 +1,135 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+CONTENT = b"0123456789"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def media_url(name: str) -> str:
+    return reverse("media", args=[name])
+
+
+class ServeMediaTests(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.name = default_storage.save(
+            "post_picture/image.jpg", ContentFile(CONTENT)
+        )
+        self.url = media_url(self.name)
+
+    def test_content_addressed_file_cached_forever(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+        self.assertEqual(res["ETag"], f'"{DIGEST}"')
+        self.assertEqual(
+            res["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertEqual(res["Content-Length"], "10")
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+
+    def test_not_modified(self):
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{DIGEST}"')
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], f'"{DIGEST}"')
+        self.assertIn("immutable", res["Cache-Control"])
+
+    def test_range(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), b"2345")
+        self.assertEqual(res["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(res["Content-Length"], "4")
+
+    def test_open_and_suffix_ranges(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=7-")
+        self.assertEqual(b"".join(res.streaming_content), b"789")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(res.streaming_content), b"789")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=8-100")
+        self.assertEqual(res["Content-Range"], "bytes 8-9/10")
+
+    def test_unsatisfiable_range(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=10-20")
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], "bytes */10")
+
+    def test_multiple_ranges_send_whole_file(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=0-1,4-5")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+
+    def test_range_of_changed_file_not_sent(self):
+        res = self.client.get(
+            self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"other"'
+        )
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.get(
+            self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE=f'"{DIGEST}"'
+        )
+        self.assertEqual(res.status_code, 206)
+
+    def test_old_file_revalidated(self):
+        with open(default_storage.path("old.png"), "wb") as old_file:
+            old_file.write(CONTENT)
+
+        res = self.client.get(media_url("old.png"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["ETag"].startswith('W/"'))
+        self.assertEqual(res["Cache-Control"], "no-cache")
+
+        res = self.client.get(
+            media_url("old.png"), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        self.assertEqual(res.status_code, 304)
+
+    def test_missing_and_outside_files_not_found(self):
+        os.makedirs(default_storage.path("directory"))
+
+        for name in ("missing.jpg", "../settings.py", "directory"):
+            res = self.client.get(media_url(name))
+            self.assertEqual(res.status_code, 404, name)
+
+    def test_only_safe_methods(self):
+        res = self.client.post(self.url)
+
+        self.assertEqual(res.status_code, 405)
+
+    @override_settings(
+        MEDIA_SENDFILE_HEADER="X-Accel-Redirect",
+        MEDIA_ACCEL_REDIRECT_PREFIX="/protected-media/",
+    )
+    def test_nginx_sends_file(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(res["ETag"], f'"{DIGEST}"')
+
+    @override_settings(MEDIA_SENDFILE_HEADER="X-Sendfile")
+    def test_apache_sends_file(self):
+        res = self.client.get(self.url)
+
+        self.assertEqual(res["X-Sendfile"], default_storage.path(self.name))
@@ -0,0 +1,167 @@
+import re
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+
+from social_media.metrics import (
+    RequestMetricsMiddleware,
+    TimedJSONRenderer,
+    collect_metrics,
+)
+from social_media.serializers import PostListSerializer
+from social_media.sample_data import create_number_of_posts
+
+POST_LIST = reverse("social_media:post-list")
+METRICS = reverse("metrics")
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.profile = self.user.profile
+        self.client.force_authenticate(self.user)
+        create_number_of_posts(3, self.profile)
+
+    def test_server_timing_header(self):
+        with collect_metrics() as metrics:
+            res = self.client.get(POST_LIST)
+
+        timing = res["Server-Timing"]
+        self.assertIn(f'desc="{metrics.queries} queries"', timing)
+        self.assertRegex(timing, r"serialize;dur=\d+\.\d+")
+        self.assertRegex(timing, r"total;dur=\d+\.\d+")
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        res = self.client.get(POST_LIST)
+
+        self.assertNotIn("Server-Timing", res)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_metrics_endpoint_renders_view_histograms(self):
+        self.client.get(POST_LIST)
+        self.client.get(POST_LIST)
+
+        res = self.client.get(
+            METRICS, HTTP_AUTHORIZATION="Bearer scrape-token"
+        )
+        body = res.content.decode()
+        count = re.search(
+            r'http_request_duration_seconds_count\{view="PostViewSet.list"\} '
+            r"(\d+)",
+            body,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(int(count.group(1)), 2)
+        self.assertIn(
+            'http_request_db_queries_bucket{view="PostViewSet.list",'
+            'le="+Inf"}',
+            body,
+        )
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_metrics_endpoint_requires_token(self):
+        self.assertEqual(
+            self.client.get(METRICS).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = self.client.get(
+            METRICS, HTTP_AUTHORIZATION="Bearer scrape-token"
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_metrics_endpoint_denied_without_token(self):
+        res = self.client.get(METRICS)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_building_response_data_is_timed(self):
+        to_representation = PostListSerializer.to_representation
+
+        def slow_to_representation(serializer, instance):
+            time.sleep(0.01)
+            return to_representation(serializer, instance)
+
+        with mock.patch.object(
+            PostListSerializer, "to_representation", slow_to_representation
+        ):
+            with collect_metrics() as metrics:
+                res = self.client.get(POST_LIST)
+
+        self.assertEqual(len(res.data["results"]), 3)
+        self.assertGreaterEqual(metrics.serialize_seconds, 0.03)
+
+    def test_nested_collectors_get_rendering_time(self):
+        request = APIRequestFactory().get(POST_LIST)
+        request.user = self.user
+        data = PostListSerializer(
+            self.profile.posts.all(), many=True, context={"request": request}
+        ).data
+        with collect_metrics() as outer:
+            with collect_metrics() as metrics:
+                start = time.perf_counter()
+                TimedJSONRenderer().render(data)
+                elapsed = time.perf_counter() - start
+
+        self.assertGreater(metrics.serialize_seconds, 0)
+        self.assertLessEqual(metrics.serialize_seconds, elapsed)
+        self.assertEqual(outer.serialize_seconds, metrics.serialize_seconds)
+
+    def test_rendering_not_timed_without_collector(self):
+        with collect_metrics() as metrics:
+            pass
+        TimedJSONRenderer().render({"count": 0})
+
+        self.assertEqual(metrics.serialize_seconds, 0)
+        # serializers of the whole process are left as they are
+        self.assertEqual(
+            BaseSerializer.data.fget.__module__, "rest_framework.serializers"
+        )
+
+
+class MiddlewareOverheadTests(SimpleTestCase):
+    REQUESTS = 2000
+    # time middleware may add to every request, generous for slow machines
+    MAX_OVERHEAD_SECONDS = 0.0005
+
+    def test_overhead_per_request_bounded(self):
+        request = RequestFactory().get(POST_LIST)
+
+        def get_response(request):
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(get_response)
+
+        def handle(handler) -> float:
+            start = time.perf_counter()
+            for _ in range(self.REQUESTS):
+                handler(request)
+            return time.perf_counter() - start
+
+        # the best of several rounds leaves out scheduling noise
+        plain = min(handle(get_response) for _ in range(3))
+        measured = min(handle(middleware) for _ in range(3))
+
+        self.assertLess(
+            (measured - plain) / self.REQUESTS, self.MAX_OVERHEAD_SECONDS
+        )
@@ -0,0 +1,179 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from social_media.models import Post, Comment, TimelineEntry
+from social_media.sample_data import (
+    create_number_of_posts,
+    create_number_of_comments,
+)
+
+POST_LIST = reverse("social_media:post-list")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+        self.profile = self.user.profile
+
+    def walk_pages(self, url, params=None):
+        """Follow next links, return ids of every page"""
+        pages = []
+        res = self.client.get(url, params)
+
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", res.data)
+            pages.append([obj["id"] for obj in res.data["results"]])
+
+            if not res.data["next"]:
+                return pages, res
+            res = self.client.get(res.data["next"])
+
+    def test_posts_cursor_pages(self):
+        create_number_of_posts(25, self.profile)
+
+        pages, last_page = self.walk_pages(POST_LIST)
+
+        expected = list(
+            Post.objects.order_by(
+                "-created_at", "-num_of_comments", "id"
+            ).values_list("id", flat=True)
+        )
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+
+        res = self.client.get(last_page.data["previous"])
+        self.assertEqual(
+            [post["id"] for post in res.data["results"]], pages[1]
+        )
+
+    def test_comments_cursor_pages_keyed_on_replies(self):
+        post = create_number_of_posts(1, self.profile)[0]
+        comments = create_number_of_comments(12, post, self.profile)
+        for i, comment in enumerate(comments[:5]):
+            Comment.objects.filter(id=comment.id).update(num_of_replies=i)
+
+        url = reverse("social_media:post-comments", args=[post.id])
+        pages, _ = self.walk_pages(url)
+
+        expected = list(
+            Comment.objects.order_by("-num_of_replies", "id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_following_feed_cursor_pages(self):
+        posts = create_number_of_posts(15)
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    profile=self.profile, post=post, created_at=post.created_at
+                )
+                for post in posts
+            ]
+        )
+
+        pages, _ = self.walk_pages(POST_LIST, {"following_posts": 1})
+
+        self.assertEqual(
+            sum(pages, []),
+            sorted([post.id for post in posts], reverse=True),
+        )
+
+    def test_page_number_pagination_opt_in(self):
+        create_number_of_posts(12, self.profile)
+
+        res = self.client.get(POST_LIST, {"page": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 12)
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(POST_LIST, {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PaginationCountModeTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.profile = self.user.profile
+        create_number_of_posts(3, self.profile)
+
+    def get_count(self, url=POST_LIST):
+        res = self.client.get(url, {"page": 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data["count"], res.data["count_is_exact"]
+
+    def test_exact_count_by_default(self):
+        self.assertEqual(self.get_count(), (3, True))
+
+    @override_settings(PAGINATION_COUNT_MODE="cached")
+    def test_cached_count_invalidated_on_write(self):
+        self.assertEqual(self.get_count(), (3, True))
+        self.assertEqual(self.get_count(), (3, False))
+
+        create_number_of_posts(1, self.profile)
+
+        self.assertEqual(self.get_count(), (4, True))
+
+    @override_settings(PAGINATION_COUNT_MODE="cached")
+    def test_cached_count_through_many_to_many_invalidated(self):
+        url = reverse("social_media:profile-followers", args=[self.profile.id])
+        self.client.force_authenticate(self.user)
+        follower = get_user_model().objects.create_user(
+            email="Follower@gmail.com", password="rvtquen", username="Follower"
+        ).profile
+
+        self.assertEqual(self.get_count(url), (0, True))
+        self.assertEqual(self.get_count(url), (0, False))
+
+        follower.followings.add(self.profile)
+
+        self.assertEqual(self.get_count(url), (1, True))
+
+    @override_settings(PAGINATION_COUNT_MODE="cached")
+    def test_cached_count_of_subquery_invalidated(self):
+        url = reverse("social_media:post-liked")
+        self.client.force_authenticate(self.user)
+
+        self.assertEqual(self.get_count(url), (0, True))
+
+        post = Post.objects.first()
+        self.client.post(reverse("social_media:post-like", args=[post.id]))
+
+        self.assertEqual(self.get_count(url), (1, True))
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL estimate")
+    @override_settings(
+        PAGINATION_COUNT_MODE="estimate",
+        PAGINATION_COUNT_ESTIMATE_THRESHOLD=0,
+    )
+    def test_estimated_count_is_not_exact(self):
+        count, is_exact = self.get_count()
+        self.assertFalse(is_exact)
+        self.assertGreaterEqual(count, 0)
+
+    @override_settings(
+        PAGINATION_COUNT_MODE="estimate",
+        PAGINATION_COUNT_ESTIMATE_THRESHOLD=1000,
+    )
+    def test_small_estimate_replaced_with_exact_count(self):
+        self.assertEqual(self.get_count(), (3, True))
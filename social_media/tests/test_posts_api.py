@@ -1,9 +1,13 @@
 import tempfile
 import os
+from io import StringIO
 
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -15,14 +19,16 @@ from social_media.serializers import (
     ProfileListSerializer,
 )
 
-from social_media.models import Post, PostRate, Profile
-
-from .models_create_sample import (
-    detail_url,
+from social_media.jobs import work
+from social_media.timeline import home_feed
+from social_media.models import Post, PostRate, Profile, TimelineEntry
+from social_media.sample_data import (
+    create_number_users,
     create_number_of_posts,
-    annotate_posts,
 )
 
+from .models_create_sample import detail_url, annotate_posts
+
 POST_LIST = reverse("social_media:post-list")
 
 
@@ -50,6 +56,10 @@ def profiles_disliked_url(post_id):
     return reverse("social_media:post-profiles-disliked", args=[post_id])
 
 
+def follow_unfollow_url(profile_id: int):
+    return reverse("social_media:profile-follow-unfollow", args=[profile_id])
+
+
 class UnauthenticatedPostApiTests(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
@@ -278,6 +288,118 @@ class AuthenticatedPostApiTests(TestCase):
         self.assertEqual(serializer.data, res.data["results"])
         self.assertNotIn(post2, posts_disliked)
 
+    def test_reactions_update_post_counters(self):
+        self.client.post(like_unliked_url(self.post.id))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.num_of_likes, self.post.num_of_dislikes), (1, 0))
+
+        self.client.post(dislike_remove_disliked_url(self.post.id))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.num_of_likes, self.post.num_of_dislikes), (0, 1))
+
+        self.client.post(dislike_remove_disliked_url(self.post.id))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.num_of_likes, self.post.num_of_dislikes), (0, 0))
+
+    def test_list_shows_my_reaction_with_constant_queries(self):
+        def list_queries() -> int:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(POST_LIST)
+
+            rates = dict(
+                PostRate.objects.filter(profile=self.profile).values_list(
+                    "post_id", "like"
+                )
+            )
+            expected = {True: "like", False: "dislike", None: None}
+            for post in res.data["results"]:
+                self.assertEqual(
+                    post["my_reaction"], expected[rates.get(post["id"])]
+                )
+            return len(queries)
+
+        PostRate.objects.create(like=True, profile=self.profile, post=self.post)
+        one_post_queries = list_queries()
+
+        for i, post in enumerate(create_number_of_posts(6, self.profile)):
+            if i % 3:
+                PostRate.objects.create(
+                    like=bool(i % 2), profile=self.profile, post=post
+                )
+
+        self.assertEqual(list_queries(), one_post_queries)
+
+    def test_bulk_reactions(self):
+        liked, disliked, removed = create_number_of_posts(3, self.profile)
+        PostRate.objects.create(like=True, profile=self.profile, post=liked)
+        PostRate.objects.create(like=True, profile=self.profile, post=removed)
+        Post.objects.filter(id__in=[liked.id, removed.id]).update(
+            num_of_likes=1
+        )
+
+        res = self.client.post(
+            reverse("social_media:post-reactions"),
+            data={
+                "reactions": [
+                    {"id": liked.id, "reaction": "dislike"},
+                    {"id": disliked.id, "reaction": "like"},
+                    {"id": disliked.id, "reaction": "dislike"},
+                    {"id": removed.id, "reaction": "like"},
+                    {"id": 0, "reaction": "like"},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["results"],
+            [
+                {"id": liked.id, "reaction": "dislike"},
+                {"id": disliked.id, "reaction": "like"},
+                {"id": disliked.id, "reaction": "dislike"},
+                {"id": removed.id, "reaction": None},
+                {"id": 0, "error": "Not found."},
+            ],
+        )
+        self.assertEqual(
+            dict(
+                PostRate.objects.filter(profile=self.profile).values_list(
+                    "post_id", "like"
+                )
+            ),
+            {liked.id: False, disliked.id: False},
+        )
+
+        counters = {
+            post.id: (post.num_of_likes, post.num_of_dislikes)
+            for post in Post.objects.filter(
+                id__in=[liked.id, disliked.id, removed.id]
+            )
+        }
+        self.assertEqual(
+            counters,
+            {liked.id: (0, 1), disliked.id: (0, 1), removed.id: (0, 0)},
+        )
+
+    def test_bulk_reactions_validation(self):
+        res = self.client.post(
+            reverse("social_media:post-reactions"),
+            data={"reactions": [{"id": self.post.id, "reaction": "love"}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PostRate.objects.exists())
+
+    def test_reconcile_counters_command(self):
+        PostRate.objects.create(like=True, profile=self.profile, post=self.post)
+        Post.objects.filter(id=self.post.id).update(num_of_dislikes=3)
+
+        call_command("reconcile_counters", stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.num_of_likes, self.post.num_of_dislikes), (1, 0))
+
     def test_create_post_profile_required(self):
         self.user.profile.delete()
         self.user.refresh_from_db()
@@ -314,3 +436,250 @@ class AuthenticatedPostApiTests(TestCase):
         self.post.refresh_from_db()
         serializer = PostSerializer(self.post)
         self.assertEqual(serializer.data, res.data)
+
+
+class FollowingPostsTimelineTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+        self.profile = self.user.profile
+
+        self.author = (
+            get_user_model()
+            .objects.create_user(
+                email="author@gmail.com", password="rvtquen", username="Author"
+            )
+            .profile
+        )
+
+    def following_posts_ids(self):
+        res = self.client.get(POST_LIST, {"following_posts": 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [post["id"] for post in res.data["results"]]
+
+    def test_created_post_pushed_to_followers_timeline(self):
+        self.profile.followings.add(self.author)
+        self.client.force_authenticate(self.author.user)
+
+        res = self.client.post(POST_LIST, data={"content": "Fan out"})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                profile=self.profile, post_id=res.data["id"]
+            ).exists()
+        )
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.following_posts_ids(), [res.data["id"]])
+
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        posts = create_number_of_posts(3, self.author)
+        not_followed_post = create_number_of_posts(1)[0]
+
+        self.client.post(follow_unfollow_url(self.author.id))
+        following_posts = self.following_posts_ids()
+
+        self.assertCountEqual(following_posts, [post.id for post in posts])
+        self.assertNotIn(not_followed_post.id, following_posts)
+
+        self.client.post(follow_unfollow_url(self.author.id))
+
+        self.assertEqual(self.following_posts_ids(), [])
+
+    def test_timeline_pages_ordered_by_entries(self):
+        posts = create_number_of_posts(12, self.author)
+        self.client.post(follow_unfollow_url(self.author.id))
+
+        res = self.client.get(POST_LIST, {"following_posts": 1})
+        first_page = [post["id"] for post in res.data["results"]]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(res.data["next"])
+        second_page = [post["id"] for post in res.data["results"]]
+
+        self.assertEqual(
+            first_page + second_page,
+            [post.id for post in sorted(
+                posts, key=lambda post: (post.created_at, post.id),
+                reverse=True,
+            )],
+        )
+        timeline_queries = [
+            query["sql"] for query in queries
+            if TimelineEntry._meta.db_table in query["sql"]
+        ]
+        # timeline entry is joined once and orders the page
+        self.assertEqual(len(timeline_queries), 1)
+        self.assertEqual(
+            timeline_queries[0].count(TimelineEntry._meta.db_table), 1
+        )
+        self.assertIn(
+            'ORDER BY timeline_entry."created_at" DESC',
+            timeline_queries[0],
+        )
+
+    def test_backfill_timeline_command(self):
+        posts = create_number_of_posts(2, self.author)
+        self.profile.followings.add(self.author)
+
+        self.assertEqual(self.following_posts_ids(), [])
+
+        call_command(
+            "backfill_timeline", profiles=[self.profile.id], stdout=StringIO()
+        )
+
+        self.assertCountEqual(
+            self.following_posts_ids(), [post.id for post in posts]
+        )
+
+
+@override_settings(
+    TIMELINE_CELEBRITY_THRESHOLD=2, TIMELINE_CELEBRITY_DEMOTE_THRESHOLD=1
+)
+class HybridFollowingPostsTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        create_number_users(2)
+        self.profile, self.other_follower = Profile.objects.all()[:2]
+        self.client.force_authenticate(self.profile.user)
+
+        self.celebrity = (
+            get_user_model()
+            .objects.create_user(
+                email="celebrity@gmail.com", password="rvtquen", username="Celeb"
+            )
+            .profile
+        )
+        self.author = (
+            get_user_model()
+            .objects.create_user(
+                email="author@gmail.com", password="rvtquen", username="Author"
+            )
+            .profile
+        )
+
+    def test_profile_becomes_celebrity_after_threshold(self):
+        self.client.post(follow_unfollow_url(self.celebrity.id))
+        self.celebrity.refresh_from_db()
+        self.assertFalse(self.celebrity.is_celebrity)
+
+        self.client.force_authenticate(self.other_follower.user)
+        self.client.post(follow_unfollow_url(self.celebrity.id))
+        self.celebrity.refresh_from_db()
+        self.assertTrue(self.celebrity.is_celebrity)
+
+    def follow_or_unfollow_celebrity(self, profile: Profile) -> bool:
+        self.client.force_authenticate(profile.user)
+        self.client.post(follow_unfollow_url(self.celebrity.id))
+        self.celebrity.refresh_from_db()
+        return self.celebrity.is_celebrity
+
+    def test_follow_does_not_count_followers(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(follow_unfollow_url(self.celebrity.id))
+
+        self.assertFalse(
+            [query for query in queries if "COUNT(" in query["sql"]]
+        )
+        self.celebrity.refresh_from_db()
+        self.assertEqual(self.celebrity.follower_count, 1)
+
+    @override_settings(
+        TIMELINE_CELEBRITY_THRESHOLD=3, TIMELINE_CELEBRITY_DEMOTE_THRESHOLD=2
+    )
+    def test_celebrity_demoted_below_lower_threshold(self):
+        self.follow_or_unfollow_celebrity(self.profile)
+        self.follow_or_unfollow_celebrity(self.other_follower)
+        self.assertTrue(self.follow_or_unfollow_celebrity(self.author))
+        post = Post.objects.create(author=self.celebrity, content="Pulled")
+
+        # between thresholds status does not change
+        self.assertTrue(self.follow_or_unfollow_celebrity(self.author))
+        self.assertTrue(self.follow_or_unfollow_celebrity(self.author))
+        self.assertTrue(self.follow_or_unfollow_celebrity(self.author))
+
+        self.assertFalse(self.follow_or_unfollow_celebrity(self.other_follower))
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.celebrity).exists()
+        )
+
+        # posts are pushed to remaining followers by background job
+        work(burst=True)
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(
+                    post__author=self.celebrity
+                ).values_list("profile", "post")
+            ),
+            [(self.profile.id, post.id)],
+        )
+
+    def test_reconcile_follower_count(self):
+        self.celebrity.followers.add(self.profile)
+        Profile.objects.filter(id=self.celebrity.id).update(follower_count=5)
+
+        call_command("reconcile_counters", stdout=StringIO())
+
+        self.celebrity.refresh_from_db()
+        self.assertEqual(self.celebrity.follower_count, 1)
+
+    def test_backfill_recounts_followers_of_celebrities(self):
+        # stored number drifted, e.g. followers added without signals
+        self.celebrity.followers.add(self.profile, self.other_follower)
+        Profile.objects.filter(id=self.celebrity.id).update(follower_count=0)
+        Profile.objects.filter(id=self.author.id).update(
+            follower_count=9, is_celebrity=True
+        )
+
+        call_command(
+            "backfill_timeline", update_celebrities=True, stdout=StringIO()
+        )
+
+        self.celebrity.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.celebrity.follower_count, 2)
+        self.assertTrue(self.celebrity.is_celebrity)
+        self.assertEqual(self.author.follower_count, 0)
+        self.assertFalse(self.author.is_celebrity)
+
+    def test_pushed_posts_of_celebrity_are_not_counted_twice(self):
+        self.celebrity.followers.add(self.profile)
+        pushed = Post.objects.create(author=self.celebrity, content="Old")
+        TimelineEntry.objects.create(
+            profile=self.profile, post=pushed, created_at=pushed.created_at
+        )
+        self.celebrity.is_celebrity = True
+        self.celebrity.save()
+        pulled = Post.objects.create(author=self.celebrity, content="New")
+
+        feed = home_feed(self.profile, lambda queryset: queryset)
+
+        self.assertEqual(feed.count(), 2)
+        self.assertEqual([post.id for post in feed], [pulled.id, pushed.id])
+
+    def test_celebrity_posts_are_pulled_and_merged(self):
+        self.celebrity.followers.add(self.profile, self.other_follower)
+        self.celebrity.is_celebrity = True
+        self.celebrity.save()
+        self.client.post(follow_unfollow_url(self.author.id))
+
+        posts = []
+        for author in [self.author, self.celebrity, self.author, self.celebrity]:
+            self.client.force_authenticate(author.user)
+            res = self.client.post(POST_LIST, data={"content": "Hybrid"})
+            posts.append(res.data["id"])
+
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.celebrity).exists()
+        )
+
+        self.client.force_authenticate(self.profile.user)
+        res = self.client.get(POST_LIST, {"following_posts": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post["id"] for post in res.data["results"]], posts[::-1]
+        )
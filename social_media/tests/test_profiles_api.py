@@ -1,9 +1,12 @@
+import shutil
 import tempfile
 import os
 
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -17,12 +20,9 @@ from social_media.serializers import (
 )
 
 from social_media.models import Profile
+from social_media.sample_data import create_number_users
 
-from .models_create_sample import (
-    detail_url,
-    create_number_users,
-    annotate_profile,
-)
+from .models_create_sample import detail_url, annotate_profile
 
 PROFILE_LIST = reverse("social_media:profile-list")
 
@@ -58,7 +58,7 @@ class UnauthenticatedProfileApiTests(TestCase):
 
         res = self.client.get(PROFILE_LIST)
 
-        profiles = Profile.objects.all()
+        profiles = Profile.objects.order_by("pk")
         serializer = ProfileListSerializer(
             profiles, many=True, context={"request": res.wsgi_request}
         )
@@ -92,6 +92,7 @@ class UnauthenticatedProfileApiTests(TestCase):
         self.assertIn("username", first_profile)
         self.assertIn("profile_picture", first_profile)
         self.assertIn("profile_url", first_profile)
+        self.assertIn("is_following", first_profile)
 
     def test_detail_allow_anonymous_user(self):
         res = self.client.get(detail_url("profile", self.user.profile.id))
@@ -202,6 +203,36 @@ class AuthenticatedProfileApiTests(TestCase):
 
         self.assertEqual(res.data["results"], serializer.data)
 
+    def test_followers_is_following_resolved_with_one_query(self):
+        def followers_page_queries(number_of_followers: int) -> int:
+            self.profile.followers.clear()
+            for i in range(number_of_followers):
+                follower = get_user_model().objects.create_user(
+                    email=f"follower{number_of_followers}_{i}@gmail.com",
+                    password="rctvrtry",
+                    username=f"Follower{number_of_followers}_{i}"
+                ).profile
+                follower.followings.add(self.profile)
+                if i % 2:
+                    self.profile.followings.add(follower)
+
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(followers_url(self.profile.id))
+
+            self.assertEqual(
+                [profile["is_following"] for profile in res.data["results"]],
+                [
+                    self.profile.followings.filter(
+                        user__username=profile["username"]
+                    ).exists()
+                    for profile in res.data["results"]
+                ],
+            )
+            return len(queries)
+
+        one_follower_queries = followers_page_queries(1)
+        self.assertEqual(followers_page_queries(8), one_follower_queries)
+
     def test_follow_profile(self):
         test_user = get_user_model().objects.create_user(
             email="testuser@gmail.com", password="rvtrsgh", username="testUser"
@@ -267,6 +298,13 @@ class AuthenticatedProfileApiTests(TestCase):
 
 class ProfileUploadPictureTest(TestCase):
     def setUp(self) -> None:
+        # uploads and their variants are not left in MEDIA_ROOT
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             email="Main@gmail.com", password="rvtquen", username="MainUser"
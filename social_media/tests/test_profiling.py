@@ -0,0 +1,129 @@
+import json
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from social_media.profiling import collapse_stack, read_profiles
+from social_media.sample_data import create_number_of_posts
+
+POST_LIST = reverse("social_media:post-list")
+
+
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+        create_number_of_posts(3, self.user.profile)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profiling(self, **options):
+        return override_settings(
+            PROFILING_ENABLED=True,
+            PROFILING_DIR=self.directory,
+            PROFILING_INTERVAL_MS=1,
+            **options,
+        )
+
+    def test_disabled_profiler_writes_nothing(self):
+        with override_settings(PROFILING_DIR=self.directory):
+            self.client.get(POST_LIST)
+
+        self.assertEqual(list(Path(self.directory).iterdir()), [])
+
+    def test_slow_request_written_with_sql(self):
+        with self.profiling(PROFILING_THRESHOLD_MS=0):
+            self.client.get(POST_LIST)
+
+        profiles = read_profiles(self.directory)
+        self.assertEqual(len(profiles), 1)
+        profile = profiles[0]
+        self.assertEqual(profile["view"], "PostViewSet.list")
+        self.assertEqual(profile["reason"], "slow")
+        self.assertGreater(profile["queries"], 0)
+
+        sql = Path(str(profile["collapsed"])[: -len(".collapsed")] + ".sql")
+        self.assertIn("SELECT", sql.read_text())
+        self.assertTrue(profile["collapsed"].exists())
+
+    def test_sql_params_written_only_when_enabled(self):
+        for enabled in (False, True):
+            with self.profiling(
+                PROFILING_THRESHOLD_MS=0, PROFILING_SQL_PARAMS=enabled
+            ):
+                # middleware reads settings when client loads it
+                client = APIClient()
+                client.force_authenticate(self.user)
+                client.get(POST_LIST)
+
+            sql = Path(self.directory).glob("*.sql")
+            self.assertEqual(
+                "params:" in max(sql).read_text(), enabled, enabled
+            )
+
+    def test_fast_request_written_only_when_sampled(self):
+        with self.profiling(PROFILING_THRESHOLD_MS=60000):
+            self.client.get(POST_LIST)
+        self.assertEqual(read_profiles(self.directory), [])
+
+        with self.profiling(
+            PROFILING_THRESHOLD_MS=60000, PROFILING_SAMPLE_RATE=1.0
+        ):
+            self.client = APIClient()
+            self.client.force_authenticate(self.user)
+            self.client.get(POST_LIST)
+        self.assertEqual(
+            [profile["reason"] for profile in read_profiles(self.directory)],
+            ["sampled"],
+        )
+
+    def test_only_latest_profiles_kept(self):
+        with self.profiling(PROFILING_THRESHOLD_MS=0, PROFILING_MAX_FILES=2):
+            for _ in range(4):
+                self.client.get(POST_LIST)
+
+        self.assertEqual(len(read_profiles(self.directory)), 2)
+        self.assertEqual(len(list(Path(self.directory).iterdir())), 6)
+
+    def test_summary_reports_worst_endpoints_and_frames(self):
+        with self.profiling(PROFILING_THRESHOLD_MS=0):
+            self.client.get(POST_LIST)
+        meta = next(Path(self.directory).glob("*.json"))
+        collapsed = Path(str(meta)[: -len(".json")] + ".collapsed")
+        collapsed.write_text(
+            "django.core.handlers.base.BaseHandler._get_response;"
+            "social_media.views.PostViewSet.list;json.dumps 3\n"
+            "social_media.views.PostViewSet.list 1\n"
+        )
+
+        out = StringIO()
+        call_command("profile_summary", dir=self.directory, stdout=out)
+        output = out.getvalue()
+
+        self.assertIn("GET PostViewSet.list", output)
+        self.assertIn("75.0% json.dumps", output)
+        self.assertIn("100.0% social_media.views.PostViewSet.list", output)
+        self.assertEqual(json.loads(meta.read_text())["method"], "GET")
+
+    def test_collapse_stack_starts_with_outermost_frame(self):
+        stack = collapse_stack(sys._getframe()).split(";")
+
+        self.assertEqual(
+            stack[-1],
+            "social_media.tests.test_profiling.SlowRequestProfilerTests."
+            "test_collapse_stack_starts_with_outermost_frame",
+        )
+        self.assertGreater(len(stack), 1)
@@ -0,0 +1,185 @@
+import json
+import random
+from unittest import skipUnless
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from social_media.models import (
+    Comment,
+    Post,
+    PostRate,
+    Profile,
+    TimelineEntry,
+)
+
+PROFILES = 200
+POSTS_PER_PROFILE = 50
+RATES_PER_PROFILE = 50
+COMMENTS_PER_POST = 2
+
+# tables which must be read with indexes on hot paths
+INDEXED_TABLES = {
+    Post._meta.db_table,
+    PostRate._meta.db_table,
+    Comment._meta.db_table,
+    TimelineEntry._meta.db_table,
+}
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "Query plans are checked on PostgreSQL"
+)
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rand = random.Random(0)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                email=f"user{i}@gmail.com", username=f"User{i}", password="x"
+            )
+            for i in range(PROFILES)
+        )
+        profiles = Profile.objects.bulk_create(
+            Profile(user=user) for user in users
+        )
+        posts = Post.objects.bulk_create(
+            Post(author=profile, content="Post")
+            for profile in profiles
+            for _ in range(POSTS_PER_PROFILE)
+        )
+        PostRate.objects.bulk_create(
+            PostRate(profile=profile, post=post, like=rand.random() > 0.3)
+            for profile in profiles
+            for post in rand.sample(posts, RATES_PER_PROFILE)
+        )
+        comments = Comment.objects.bulk_create(
+            Comment(
+                author=rand.choice(profiles),
+                post=post,
+                num_of_replies=rand.randint(0, 5),
+            )
+            for post in posts
+            for _ in range(COMMENTS_PER_POST)
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                author=rand.choice(profiles),
+                post=comment.post,
+                reply_to_comment=comment,
+            )
+            for comment in comments[::4]
+        )
+        TimelineEntry.objects.bulk_create(
+            TimelineEntry(
+                profile=profile, post=post, created_at=post.created_at
+            )
+            for profile in profiles
+            for post in rand.sample(posts, POSTS_PER_PROFILE)
+        )
+
+        with connection.cursor() as cursor:
+            for table in INDEXED_TABLES:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+
+        cls.user = users[0]
+        cls.post = posts[0]
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def query_plans(self, url: str, **params) -> dict[str, list[dict]]:
+        """Return plan nodes of every SELECT of url request by its sql"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200)
+
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plans[query["sql"]] = list(plan_nodes(plan[0]["Plan"]))
+
+        return plans
+
+    def assert_uses_index(self, url: str, index_name: str, **params):
+        """Check that no query of url request scans INDEXED_TABLES
+        sequentially and one of them uses index_name"""
+        used_indexes = set()
+        for sql, nodes in self.query_plans(url, **params).items():
+            for node in nodes:
+                self.assertFalse(
+                    node["Node Type"] == "Seq Scan"
+                    and node["Relation Name"] in INDEXED_TABLES,
+                    f"Sequential scan in {sql}",
+                )
+                used_indexes.add(node.get("Index Name"))
+
+        self.assertIn(index_name, used_indexes)
+
+    def test_profiles_who_liked_post(self):
+        self.assert_uses_index(
+            reverse("social_media:post-profiles-liked", args=[self.post.id]),
+            "postrate_post_like_idx",
+        )
+
+    def test_posts_profile_liked(self):
+        self.assert_uses_index(
+            reverse("social_media:post-liked"), "postrate_profile_like_idx"
+        )
+
+    def test_post_comments(self):
+        self.assert_uses_index(
+            reverse("social_media:post-comments", args=[self.post.id]),
+            "comment_post_top_idx",
+        )
+
+    def test_profile_posts(self):
+        self.assert_uses_index(
+            reverse("social_media:post-profile", args=[self.user.profile.id]),
+            "post_author_created_idx",
+        )
+
+    def test_home_timeline_read_without_sort(self):
+        url = reverse("social_media:post-list")
+        self.assert_uses_index(
+            url, "timeline_profile_created_idx", following_posts=1
+        )
+
+        res = self.client.get(url, {"following_posts": 1})
+        next_params = parse_qs(urlsplit(res.data["next"]).query)
+        plans = self.query_plans(
+            url, following_posts=1, cursor=next_params["cursor"][0]
+        )
+
+        timeline_nodes = [
+            nodes
+            for sql, nodes in plans.items()
+            if TimelineEntry._meta.db_table in sql
+        ]
+        self.assertEqual(len(timeline_nodes), 1)
+        node_types = {node["Node Type"] for node in timeline_nodes[0]}
+        self.assertFalse(node_types & {"Sort", "Incremental Sort"})
+        self.assertIn(
+            "timeline_profile_created_idx",
+            {node.get("Index Name") for node in timeline_nodes[0]},
+        )
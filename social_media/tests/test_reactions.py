@@ -0,0 +1,106 @@
+import threading
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test import TransactionTestCase
+
+from social_media.models import PostRate
+from social_media.reactions import toggle_reaction
+from social_media.sample_data import create_number_of_posts
+
+THREADS = 8
+TOGGLES_PER_THREAD = 5
+
+
+def run_in_threads(target, args_list: list[tuple]) -> list[Exception]:
+    """Start target with every args at the same time, return errors"""
+    barrier = threading.Barrier(len(args_list))
+    errors = []
+
+    def run(*args):
+        try:
+            barrier.wait()
+            target(*args)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=args) for args in args_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return errors
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent writes need database with row level locks",
+)
+class ConcurrentToggleReactionTests(TransactionTestCase):
+    def setUp(self) -> None:
+        self.profiles = [
+            get_user_model()
+            .objects.create_user(
+                email=f"user{i}@gmail.com", password="rvtquen", username=f"U{i}"
+            )
+            .profile
+            for i in range(THREADS)
+        ]
+        self.post = create_number_of_posts(1, self.profiles[0])[0]
+
+    def assert_counters_match_rates(self):
+        self.post.refresh_from_db()
+        rates = PostRate.objects.filter(post=self.post)
+
+        self.assertEqual(
+            (self.post.num_of_likes, self.post.num_of_dislikes),
+            (
+                rates.filter(like=True).count(),
+                rates.filter(like=False).count(),
+            ),
+        )
+
+    def test_double_taps_of_one_profile(self):
+        profile = self.profiles[0]
+
+        def toggle(like: bool):
+            for _ in range(TOGGLES_PER_THREAD):
+                toggle_reaction(PostRate, "post", profile, self.post.id, like)
+
+        errors = run_in_threads(toggle, [(True,)] * THREADS)
+
+        self.assertEqual(errors, [])
+        # every like toggle is applied, even number of them removes like
+        self.assertEqual(
+            PostRate.objects.filter(post=self.post, profile=profile).count(),
+            (THREADS * TOGGLES_PER_THREAD) % 2,
+        )
+        self.assert_counters_match_rates()
+
+    def test_likes_and_dislikes_of_many_profiles(self):
+        def toggle(profile, like: bool):
+            for _ in range(TOGGLES_PER_THREAD):
+                toggle_reaction(PostRate, "post", profile, self.post.id, like)
+                toggle_reaction(
+                    PostRate, "post", profile, self.post.id, not like
+                )
+
+        errors = run_in_threads(
+            toggle,
+            [(profile, bool(i % 2)) for i, profile in enumerate(self.profiles)]
+            + [(profile, True) for profile in self.profiles],
+        )
+
+        self.assertEqual(errors, [])
+        self.assertFalse(
+            PostRate.objects.values("profile")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .exists()
+        )
+        self.assert_counters_match_rates()
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from taggit.models import Tag
+
+from social_media.models import PostRate
+from social_media.sample_data import create_number_of_posts
+
+from .models_create_sample import detail_url
+
+TAG_LIST = reverse("social_media:tag-list")
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.profile = self.user.profile
+        self.client.force_authenticate(self.user)
+
+    def test_tag_list_cached_until_tag_created(self):
+        Tag.objects.create(name="First")
+        res = self.client.get(TAG_LIST)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(TAG_LIST)
+        self.assertEqual(cached.data, res.data)
+
+        Tag.objects.create(name="Second")
+        res = self.client.get(TAG_LIST)
+
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_profile_detail_invalidated_by_follow_and_post(self):
+        url = detail_url("profile", self.profile.id)
+        self.assertEqual(self.client.get(url).data["num_of_followers"], 0)
+
+        follower = (
+            get_user_model()
+            .objects.create_user(
+                email="follower@gmail.com", password="rvtquen", username="Fol"
+            )
+            .profile
+        )
+        follower.followings.add(self.profile)
+        self.assertEqual(self.client.get(url).data["num_of_followers"], 1)
+
+        create_number_of_posts(1, self.profile)
+        self.assertEqual(self.client.get(url).data["num_of_posts"], 1)
+
+    def test_tag_posts_invalidated_by_reaction(self):
+        tag = Tag.objects.create(name="Cached")
+        post = create_number_of_posts(1, self.profile)[0]
+        post.tags.add(tag)
+
+        url = detail_url("tag", tag.id)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"][0]["num_of_likes"], 0)
+
+        self.client.post(reverse("social_media:post-like", args=[post.id]))
+        self.assertTrue(PostRate.objects.filter(post=post).exists())
+
+        res = self.client.get(url)
+        self.assertEqual(res.data["results"][0]["num_of_likes"], 1)
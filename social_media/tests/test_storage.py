@@ -0,0 +1,154 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from social_media.jobs import work
+from social_media.models import MediaBlob, Post, post_picture_file_path
+
+from .test_images import image_upload
+
+POST_LIST = reverse("social_media:post-list")
+
+
+def collect_media(*args) -> str:
+    out = StringIO()
+    call_command("collect_media", "--grace", "0", *args, stdout=out)
+    return out.getvalue()
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160])
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, **image_options) -> Post:
+        res = self.client.post(
+            POST_LIST,
+            {"content": "Image", "image": image_upload(**image_options)},
+            format="multipart",
+        )
+        work(burst=True)
+        return Post.objects.get(id=res.data["id"])
+
+    def stored_files(self, post: Post) -> list[str]:
+        return [post.image.name] + [
+            variant["name"] for variant in post.image_variants
+        ]
+
+    def test_file_named_by_hash_of_content(self):
+        data = b"same content"
+
+        first = default_storage.save("post_picture/a.JPG", ContentFile(data))
+        second = default_storage.save("post_picture/b.jpg", ContentFile(data))
+
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(first, f"post_picture/{digest}.jpg")
+        self.assertEqual(second, first)
+        self.assertEqual(MediaBlob.objects.get(name=first).references, 0)
+
+    def test_upload_path_renamed_by_storage(self):
+        post = Post(author=self.user.profile)
+        path = post_picture_file_path(post, "Photo.PNG")
+
+        name = default_storage.save(path, ContentFile(b"image"))
+
+        self.assertRegex(path, r"^post_picture/mainuser_[0-9a-f-]{36}\.PNG$")
+        digest = hashlib.sha256(b"image").hexdigest()
+        self.assertEqual(name, f"post_picture/{digest}.png")
+
+    def test_references_counted(self):
+        first = self.create_post()
+        second = self.create_post()
+
+        self.assertEqual(first.image.name, second.image.name)
+        for name in self.stored_files(first):
+            self.assertEqual(MediaBlob.objects.get(name=name).references, 2)
+
+    def test_files_collected_after_last_post_deleted(self):
+        first = self.create_post()
+        second = self.create_post()
+        collect_media()
+
+        first.delete()
+        collect_media()
+        for name in self.stored_files(first):
+            self.assertTrue(default_storage.exists(name))
+
+        second.delete()
+        collect_media()
+        for name in self.stored_files(second):
+            self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_files_of_deleted_profile_collected(self):
+        post = self.create_post()
+
+        self.user.delete()
+        collect_media()
+
+        for name in self.stored_files(post):
+            self.assertFalse(default_storage.exists(name))
+
+    def test_replaced_profile_picture_collected(self):
+        url = reverse(
+            "social_media:profile-upload-profile-picture",
+            args=[self.user.profile.id],
+        )
+        for size in ((100, 100), (120, 120)):
+            self.client.post(
+                url,
+                {"profile_picture": image_upload(size=size)},
+                format="multipart",
+            )
+            work(burst=True)
+
+        collect_media()
+
+        profile = get_user_model().objects.get(id=self.user.id).profile
+        self.assertEqual(
+            set(MediaBlob.objects.values_list("name", flat=True)),
+            {profile.profile_picture.name}
+            | {variant["name"] for variant in profile.profile_picture_variants},
+        )
+
+    def test_recently_unreferenced_files_kept(self):
+        post = self.create_post()
+        post.delete()
+
+        call_command("collect_media", stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    def test_recount_registers_old_files(self):
+        post = self.create_post()
+        MediaBlob.objects.all().delete()
+        old_name = default_storage.path("post_picture/old_upload.jpg")
+        with open(old_name, "wb") as old_file:
+            old_file.write(b"left behind")
+
+        out = collect_media("--recount")
+
+        self.assertIn("Counted references of 3 files", out)
+        self.assertFalse(default_storage.exists("post_picture/old_upload.jpg"))
+        for name in self.stored_files(post):
+            self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
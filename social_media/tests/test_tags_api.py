@@ -15,12 +15,9 @@ from social_media.serializers import (
 )
 
 from social_media.models import Post, PostRate, Profile
+from social_media.sample_data import create_number_of_posts
 
-from .models_create_sample import (
-    detail_url,
-    create_number_of_posts,
-    annotate_posts,
-)
+from .models_create_sample import detail_url, annotate_posts
 
 TAG_LIST = reverse("social_media:tag-list")
 
@@ -0,0 +1,114 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from social_media.jobs import work
+from social_media.models import Job, Post
+from social_media.uploads import HashingUploadHandler
+
+from .test_images import image_upload
+
+POST_LIST = reverse("social_media:post-list")
+
+
+def stream(handler: HashingUploadHandler, data: bytes, chunk_size: int):
+    handler.new_file("image", "upload.jpg", "image/jpeg", len(data))
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler.file_complete(len(data))
+
+
+class HashingUploadHandlerTests(TestCase):
+    def setUp(self) -> None:
+        self.handler = HashingUploadHandler(RequestFactory().post("/"))
+
+    def test_upload_streamed_to_temporary_file_and_hashed(self):
+        data = image_upload().read()
+
+        uploaded = stream(self.handler, data, chunk_size=1024)
+
+        self.assertIsInstance(uploaded, TemporaryUploadedFile)
+        self.assertEqual(uploaded.read(), data)
+        self.assertEqual(
+            uploaded.content_hash, hashlib.sha256(data).hexdigest()
+        )
+        uploaded.close()
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=2048)
+    def test_too_large_upload_dropped(self):
+        uploaded = stream(self.handler, b"x" * 4096, chunk_size=1024)
+
+        self.assertEqual(uploaded.size, 0)
+        self.assertIn("2.0\xa0KB", uploaded.upload_error)
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[160])
+class ImageUploadTests(TestCase):
+    def setUp(self) -> None:
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="Main@gmail.com", password="rvtquen", username="MainUser"
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, image):
+        return self.client.post(
+            POST_LIST, {"content": "Image", "image": image}, format="multipart"
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_too_large_upload_rejected(self):
+        res = self.create_post(image_upload(size=(400, 400)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("bigger than", str(res.data["image"]))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10000)
+    def test_image_with_too_many_pixels_rejected(self):
+        res = self.create_post(image_upload(size=(200, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("10000 pixels", str(res.data["image"]))
+
+    def test_not_accepted_format_rejected(self):
+        res = self.create_post(image_upload(image_format="BMP"))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JPEG, PNG, WEBP, GIF", str(res.data["image"]))
+
+    def test_identical_upload_reuses_processed_image(self):
+        first = self.create_post(image_upload())
+        work(burst=True)
+
+        res = self.create_post(image_upload())
+
+        self.assertEqual(res.data["image_status"], "ready")
+        self.assertFalse(Job.objects.exists())
+        first_post = Post.objects.get(id=first.data["id"])
+        second_post = Post.objects.get(id=res.data["id"])
+        self.assertEqual(second_post.image.name, first_post.image.name)
+        self.assertEqual(second_post.image_variants, first_post.image_variants)
+        self.assertEqual(len(second_post.image_hash), 64)
+
+    def test_different_upload_processed(self):
+        self.create_post(image_upload())
+        work(burst=True)
+
+        res = self.create_post(image_upload(size=(300, 300)))
+
+        self.assertEqual(res.data["image_status"], "processing")
@@ -0,0 +1,311 @@
+import heapq
+from itertools import islice
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import F, FilteredRelation, Q, QuerySet
+
+from .cache_versions import bump_versions, table_version_name
+from .db_routers import use_primary
+from .jobs import enqueue, job
+from .models import Profile, Post, TimelineEntry
+
+FAN_OUT_BATCH_SIZE = 1000
+
+# order of posts in home timeline, the same for every feed source
+FEED_ORDERING = ("-created_at", "-id")
+
+# fields of timeline entry joined to post with the same values as post
+# fields, timeline is ordered and paginated by them, so it is read with
+# range scan of (profile, -created_at, -post) index without sort
+TIMELINE_FIELDS = {
+    "created_at": "timeline_created_at",
+    "id": "timeline_post_id",
+    "pk": "timeline_post_id",
+}
+
+
+def _bump_timeline_version() -> None:
+    # timeline entries are written in bulk, without signals
+    bump_versions([table_version_name(TimelineEntry)])
+
+
+def _timeline_entries(profile_ids, posts) -> list[TimelineEntry]:
+    return [
+        TimelineEntry(
+            profile_id=profile_id, post_id=post.id, created_at=post.created_at
+        )
+        for profile_id in profile_ids
+        for post in posts
+    ]
+
+
+def change_follower_counts(profile_ids, delta: int) -> None:
+    """Add delta to stored number of followers of profiles"""
+    Profile.objects.filter(pk__in=profile_ids).update(
+        follower_count=F("follower_count") + delta
+    )
+
+
+def update_celebrity_status(profile: Profile) -> bool:
+    """Promote profile to celebrity when its stored number of followers
+    reaches TIMELINE_CELEBRITY_THRESHOLD and demote it when the number
+    drops below TIMELINE_CELEBRITY_DEMOTE_THRESHOLD, so profile around a
+    threshold does not change status on every follow. Posts of demoted
+    profile are pushed by background job. Return new status"""
+    with use_primary():
+        profile.refresh_from_db(fields=["follower_count", "is_celebrity"])
+
+    if profile.is_celebrity:
+        threshold = settings.TIMELINE_CELEBRITY_DEMOTE_THRESHOLD
+    else:
+        threshold = settings.TIMELINE_CELEBRITY_THRESHOLD
+    is_celebrity = profile.follower_count >= threshold
+
+    if is_celebrity != profile.is_celebrity:
+        profile.is_celebrity = is_celebrity
+        profile.save(update_fields=["is_celebrity"])
+
+        if not is_celebrity:
+            # posts were pulled before, now they have to be pushed
+            enqueue(push_author_posts, author_id=profile.pk)
+
+    return is_celebrity
+
+
+@job
+def push_author_posts(author_id: int) -> None:
+    """Push TIMELINE_BACKFILL_SIZE latest posts of author which is no
+    longer celebrity into home timelines of its followers"""
+    with use_primary():
+        author = Profile.objects.filter(pk=author_id).first()
+        if author is None or author.is_celebrity:
+            return
+
+        latest_posts = list(
+            Post.objects.filter(author=author)
+            .only("id", "created_at")
+            .order_by("-created_at")[:settings.TIMELINE_BACKFILL_SIZE]
+        )
+        _push_to_followers(author, latest_posts)
+
+
+def _push_to_followers(author: Profile, posts: list[Post]) -> None:
+    if not posts:
+        return
+
+    follower_ids = author.followers.values_list("id", flat=True)
+    # number of followers whose entries are inserted at once
+    batch_size = max(1, FAN_OUT_BATCH_SIZE // len(posts))
+
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=FAN_OUT_BATCH_SIZE):
+        batch.append(follower_id)
+
+        if len(batch) == batch_size:
+            TimelineEntry.objects.bulk_create(
+                _timeline_entries(batch, posts), ignore_conflicts=True
+            )
+            batch = []
+
+    if batch:
+        TimelineEntry.objects.bulk_create(
+            _timeline_entries(batch, posts), ignore_conflicts=True
+        )
+
+    _bump_timeline_version()
+
+
+def fan_out_post(post: Post) -> None:
+    """Push new post into home timeline of every author follower,
+    celebrities posts are not pushed"""
+    if post.author.is_celebrity:
+        return
+
+    _push_to_followers(post.author, [post])
+
+
+def backfill_timeline(profile: Profile, authors=None) -> int:
+    """Push latest posts of authors (all profile followings by default)
+    into profile home timeline, return number of pushed posts"""
+    if authors is None:
+        authors = profile.followings.all()
+
+    limit = settings.TIMELINE_BACKFILL_SIZE
+    pushed = 0
+
+    for author in authors:
+        if author.is_celebrity:
+            continue
+
+        posts = Post.objects.filter(author=author).only(
+            "id", "created_at"
+        ).order_by("-created_at")[:limit]
+
+        entries = _timeline_entries([profile.id], posts)
+        TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        pushed += len(entries)
+
+    _bump_timeline_version()
+    return pushed
+
+
+def remove_author_from_timeline(profile: Profile, author: Profile) -> None:
+    """Remove author posts from profile home timeline"""
+    TimelineEntry.objects.filter(profile=profile, post__author=author).delete()
+    _bump_timeline_version()
+
+
+def home_timeline(profile: Profile) -> QuerySet:
+    """Return posts pushed into profile home timeline. Entry of profile is
+    joined once, its fields are aliased as TIMELINE_FIELDS (filter on
+    relation in later filter() call would join it again)"""
+    return (
+        Post.objects.annotate(
+            timeline_entry=FilteredRelation(
+                "timeline_entries",
+                condition=Q(timeline_entries__profile=profile),
+            )
+        )
+        .alias(
+            timeline_created_at=F("timeline_entry__created_at"),
+            timeline_post_id=F("timeline_entry__post"),
+        )
+        .filter(timeline_post_id__isnull=False)
+    )
+
+
+class MergedFeed:
+    """Sequence of posts merged from several querysets ordered by the
+    same fields. Page is read with k-way merge of sources, so every
+    source fetches at most page end number of posts using its index.
+    Can be used as paginator object list.
+
+    `fields` has for every source mapping of post fields to fields of
+    source with the same values (e.g. TIMELINE_FIELDS), ordering and
+    filters of feed use them. Sources must not share posts, otherwise
+    they are counted and listed twice"""
+
+    model = Post
+    ordered = True
+
+    def __init__(
+        self,
+        sources: list[QuerySet],
+        ordering=FEED_ORDERING,
+        fields: list[dict[str, str]] | None = None,
+    ):
+        if len({field.startswith("-") for field in ordering}) > 1:
+            raise ValueError("All ordering fields must have same direction")
+
+        self.ordering = tuple(ordering)
+        self.fields = fields or [{} for _ in sources]
+        self.sources = [
+            source.order_by(
+                *[self._source_lookup(field, names) for field in ordering]
+            )
+            for source, names in zip(sources, self.fields, strict=True)
+        ]
+
+    @staticmethod
+    def _source_lookup(lookup: str, names: dict[str, str]) -> str:
+        """Rename post field of lookup or ordering to field of source"""
+        prefix = "-" if lookup.startswith("-") else ""
+        field, separator, rest = lookup.lstrip("-").partition("__")
+        return prefix + names.get(field, field) + separator + rest
+
+    def _source_q(self, q: Q, names: dict[str, str]) -> Q:
+        children = [
+            self._source_q(child, names)
+            if isinstance(child, Q)
+            else (self._source_lookup(child[0], names), child[1])
+            for child in q.children
+        ]
+        return Q(*children, _connector=q.connector, _negated=q.negated)
+
+    def filter(self, *args, **kwargs) -> "MergedFeed":
+        return MergedFeed(
+            [
+                source.filter(
+                    *[
+                        self._source_q(arg, names)
+                        if isinstance(arg, Q)
+                        else arg
+                        for arg in args
+                    ],
+                    **{
+                        self._source_lookup(lookup, names): value
+                        for lookup, value in kwargs.items()
+                    },
+                )
+                for source, names in zip(self.sources, self.fields)
+            ],
+            self.ordering,
+            self.fields,
+        )
+
+    def order_by(self, *ordering) -> "MergedFeed":
+        return MergedFeed(self.sources, ordering, self.fields)
+
+    def _sort_key(self, post: Post) -> tuple:
+        return tuple(
+            getattr(post, field.lstrip("-")) for field in self.ordering
+        )
+
+    def count(self) -> int:
+        return sum(source.count() for source in self.sources)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+
+        if item.step or (item.start or 0) < 0 or (item.stop or 0) < 0:
+            raise ValueError("MergedFeed supports only positive slices")
+
+        if item.stop is None:
+            pages = [list(source) for source in self.sources]
+        else:
+            pages = [list(source[:item.stop]) for source in self.sources]
+
+        merged = heapq.merge(
+            *pages,
+            key=self._sort_key,
+            reverse=self.ordering[0].startswith("-"),
+        )
+
+        return list(islice(merged, item.start, item.stop))
+
+
+def home_feed(
+    profile: Profile, prepare_queryset: Callable[[QuerySet], QuerySet]
+) -> MergedFeed:
+    """Return profile home feed: pushed timeline posts merged with posts
+    pulled from followed celebrities. prepare_queryset is applied on
+    every source (eager loading, annotations). Posts pushed before their
+    author became celebrity are left out of timeline, they are pulled"""
+    celebrity_ids = list(
+        profile.followings.filter(is_celebrity=True).values_list(
+            "id", flat=True
+        )
+    )
+
+    sources = [home_timeline(profile)]
+    fields = [TIMELINE_FIELDS]
+
+    if celebrity_ids:
+        sources = [
+            sources[0].exclude(author_id__in=celebrity_ids),
+            Post.objects.filter(author_id__in=celebrity_ids),
+        ]
+        fields.append({})
+
+    return MergedFeed(
+        [prepare_queryset(source) for source in sources],
+        fields=fields,
+    )
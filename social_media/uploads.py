@@ -0,0 +1,101 @@
+"""Upload handling of images. Files are streamed to temporary file and
+hashed while they are received, so only one chunk of upload is in memory.
+Upload bigger than IMAGE_UPLOAD_MAX_BYTES stops being written as soon as
+it exceeds the limit, and image header is checked before image is
+decoded"""
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+from PIL import Image
+
+# formats of accepted uploads, other image parsers are not used
+UPLOAD_FORMATS = ["JPEG", "PNG", "WEBP", "GIF"]
+
+
+class RejectedUpload(SimpleUploadedFile):
+    """Empty file standing in for upload which was not stored"""
+
+    def __init__(self, name: str, error: str):
+        super().__init__(name, b"")
+        self.upload_error = error
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream upload to temporary file and compute its sha256
+    (`content_hash` of uploaded file) on the way"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            # the rest of upload is read and dropped
+            self.too_large = True
+            self.upload_interrupted()
+            return None
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.too_large:
+            return RejectedUpload(
+                self.file_name,
+                "File is bigger than "
+                f"{filesizeformat(settings.IMAGE_UPLOAD_MAX_BYTES)}.",
+            )
+
+        uploaded = super().file_complete(file_size)
+        uploaded.content_hash = self.digest.hexdigest()
+        return uploaded
+
+
+def content_hash(file) -> str:
+    """Return sha256 of uploaded file, computed by HashingUploadHandler
+    or read now for files from other sources"""
+    known = getattr(file, "content_hash", None)
+    if known:
+        return known
+
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def check_image_header(file) -> None:
+    """Raise ValidationError when upload was rejected, is not image of
+    UPLOAD_FORMATS or has more than IMAGE_UPLOAD_MAX_PIXELS. Only image
+    header is read, pixels are not decoded"""
+    error = getattr(file, "upload_error", None)
+    if error:
+        raise ValidationError(error, code="file_too_large")
+
+    try:
+        file.seek(0)
+        with Image.open(file, formats=UPLOAD_FORMATS) as image:
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            f"Upload {', '.join(UPLOAD_FORMATS)} image.", code="invalid_image"
+        )
+    finally:
+        file.seek(0)
+
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f"Image has more than {settings.IMAGE_UPLOAD_MAX_PIXELS} pixels.",
+            code="too_many_pixels",
+        )
@@ -26,11 +26,21 @@ urlpatterns = [
         CommentViewSet.as_view({"get": "list", "post": "create"}),
         name="post-comments",
     ),
+    path(
+        "post/<int:post_pk>/comments/tree/",
+        CommentViewSet.as_view({"get": "tree"}),
+        name="post-comments-tree",
+    ),
     path(
         "post/comments/<int:pk>/replies/",
         CommentViewSet.as_view({"get": "replies"}),
         name="comment-replies",
     ),
+    path(
+        "post/comments/reactions/",
+        CommentViewSet.as_view({"post": "bulk_reactions"}),
+        name="comment-reactions",
+    ),
     path(
         "post/comments/<int:pk>/",
         CommentViewSet.as_view({**up_de_rt}),
@@ -8,45 +8,34 @@ from drf_spectacular.utils import (
     OpenApiExample,
 )
 
-from django.db.models import (
-    Q,
-    Count,
-    QuerySet,
-)
+from django.db.models import QuerySet
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
+from .metrics import time_serializer_data
+from .reactions import apply_reactions, REACTIONS
+from .serializers import BulkReactionSerializer
+
 
-def count_likes_dislikes(queryset: QuerySet, rate_model: str) -> QuerySet:
-    """Count number of likes and dislikes"""
-    if not isinstance(rate_model, str):
-        raise ValueError("rate_model have to be string")
-    rate_model = rate_model.lower()
-
-    queryset = queryset.annotate(
-        num_of_likes=Count(
-            rate_model,
-            filter=Q(**{f"{rate_model}__like": True}), distinct=True
-        ),
-        num_of_dislikes=Count(
-            rate_model,
-            filter=Q(**{f"{rate_model}__like": False}), distinct=True
-        ),
-    ).order_by(
+def order_by_likes_dislikes(queryset: QuerySet) -> QuerySet:
+    """Order by number of likes and dislikes"""
+    return queryset.order_by(
         "-num_of_likes",
         "num_of_dislikes",
     )
 
-    return queryset
-
 
 def order_by_posts(posts: QuerySet) -> QuerySet:
     return posts.order_by("-created_at", "-num_of_comments")
 
 
 class LikeDislikeObjectMixin(ABC):
+    # PostRate or CommentRate and its field of rated object
+    rate_model = None
+    rated_field = None
+
     @abstractmethod
     def _like_dislike_or_remove(self, request, like_value: bool):
         pass
@@ -65,8 +54,49 @@ class LikeDislikeObjectMixin(ABC):
         self._like_dislike_or_remove(request, False)
         return Response(status=status.HTTP_200_OK)
 
+    @extend_schema(
+        request=BulkReactionSerializer,
+        examples=[
+            OpenApiExample(
+                "Like 1, dislike 2",
+                value={
+                    "reactions": [
+                        {"id": 1, "reaction": "like"},
+                        {"id": 2, "reaction": "dislike"},
+                    ]
+                },
+                request_only=True,
+            )
+        ],
+    )
+    @action(
+        methods=["post"],
+        detail=False,
+        url_path="reactions",
+        url_name="reactions",
+    )
+    def bulk_reactions(self, request):
+        """Apply many likes/dislikes at once, every reaction works like
+        single like/dislike endpoint. Return result of every reaction"""
+        serializer = BulkReactionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = apply_reactions(
+            self.rate_model,
+            self.rated_field,
+            request.user.profile,
+            [
+                (reaction["id"], REACTIONS[reaction["reaction"]])
+                for reaction in serializer.validated_data["reactions"]
+            ],
+        )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
 
 class PaginateResponseMixin:
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer_data(super().get_serializer(*args, **kwargs))
+
     def custom_paginate_queryset(self, queryset: QuerySet):
         page = self.paginate_queryset(queryset)
 
@@ -1,15 +1,16 @@
-from django.db.models import (
-    Count,
-    QuerySet,
-)
+from django.db import transaction
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status, mixins, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
 from taggit.models import Tag
 
 from .serializers import (
@@ -19,10 +20,12 @@ from .serializers import (
     PostListSerializer,
     CommentSerializer,
     CommentListSerializer,
+    CommentTreeSerializer,
     ProfileSerializer,
     ProfileListSerializer,
     ProfileDetailSerializer,
     ProfileImageUpload,
+    resolve_reactions,
 )
 
 from .models import (
@@ -35,7 +38,7 @@ from .models import (
 
 from .view_utils import (
     LikeDislikeObjectMixin,
-    count_likes_dislikes,
+    order_by_likes_dislikes,
     PaginateResponseMixin,
     schema_filter_by_username,
     order_by_posts,
@@ -43,6 +46,32 @@ from .view_utils import (
 
 from .permissions import IsOwnerOrReadOnly, IsAuthenticatedAndUserHaveProfile
 
+from .counters import update_comment_counters
+from .reactions import toggle_reaction
+
+from .cache_versions import (
+    profile_version_name,
+    tag_version_name,
+    TAGS_VERSION_NAME,
+)
+from .response_cache import cache_response
+
+from .comment_tree import (
+    descendants,
+    build_tree,
+    DEFAULT_TREE_DEPTH,
+    MAX_TREE_DEPTH,
+    TREE_REPLIES_PAGE_SIZE,
+)
+
+from .timeline import (
+    fan_out_post,
+    backfill_timeline,
+    remove_author_from_timeline,
+    update_celebrity_status,
+    home_feed,
+)
+
 
 class ProfileViewSet(PaginateResponseMixin, viewsets.ModelViewSet):
     # TODO add filter by username
@@ -114,17 +143,25 @@ class ProfileViewSet(PaginateResponseMixin, viewsets.ModelViewSet):
         if is_following:
             # unfollow profile
             current_profile.followings.remove(profile)
+            remove_author_from_timeline(current_profile, profile)
+            update_celebrity_status(profile)
             return Response(
                 {"unfollow": "Unfollow successful"}, status=status.HTTP_200_OK
             )
 
         # follow profile
         current_profile.followings.add(profile)
+        update_celebrity_status(profile)
+        backfill_timeline(current_profile, authors=[profile])
         return Response(
             {"follow": "Follow successful"},
             status=status.HTTP_200_OK
         )
 
+    @cache_response(lambda view, request, pk: [profile_version_name(pk)])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @schema_filter_by_username
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -183,28 +220,33 @@ class PostViewSet(
 
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    rate_model = PostRate
+    rated_field = "post"
 
     def get_queryset(self):
         queryset = self.queryset
-        following_posts: bool = self.request.query_params.get(
-            "following_posts", None
-        )
-
-        if following_posts:
-            current_profile = self.request.user.profile
-            queryset = Post.objects.filter(author__followers=current_profile)
 
         if self.action == "list":
             queryset = self.get_serializer().setup_eager_loading(queryset)
 
-        queryset = count_likes_dislikes(queryset, "postrate")
+        return order_by_posts(queryset)
 
-        # Count the number of comments for each post
-        queryset = queryset.annotate(
-            num_of_comments=Count("comments", distinct=True)
+    def get_following_feed(self):
+        """Return home feed of current profile"""
+        return home_feed(
+            self.request.user.profile,
+            self.get_serializer().setup_eager_loading,
         )
 
-        return order_by_posts(queryset)
+    def list(self, request, *args, **kwargs):
+        following_posts: bool = request.query_params.get(
+            "following_posts", None
+        )
+
+        if following_posts:
+            return self.custom_paginate_queryset(self.get_following_feed())
+
+        return super().list(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action in [
@@ -224,6 +266,7 @@ class PostViewSet(
         if self.action in [
             "dislike_remove_dislike",
             "like_unlike",
+            "bulk_reactions",
             "posts_liked",
             "posts_disliked",
             "create",
@@ -242,25 +285,20 @@ class PostViewSet(
         return super().get_permissions()
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user.profile)
+        post = serializer.save(author=self.request.user.profile)
+        fan_out_post(post)
 
     def _like_dislike_or_remove(self, request, like_value: bool) -> None:
         """Like, dislike, or remove both"""
         post = self.get_object()
-        current_profile = request.user.profile
-
-        post_rate, created = PostRate.objects.get_or_create(
-            post=post, profile=current_profile, defaults={"like": like_value}
+        toggle_reaction(
+            self.rate_model,
+            self.rated_field,
+            request.user.profile,
+            post.id,
+            like_value,
         )
 
-        if not created:
-            if post_rate.like == like_value:
-                # Remove our reaction to post
-                post_rate.delete()
-            else:
-                post_rate.like = like_value
-                post_rate.save()
-
     def _get_post_profiles_who_likes_or_dislikes(
             self, request, like_value: bool
     ):
@@ -287,11 +325,7 @@ class PostViewSet(
 
         improve_queries = self.get_serializer().setup_eager_loading(data)
 
-        annotate = count_likes_dislikes(improve_queries, "postrate").annotate(
-            num_of_comments=Count("comments", distinct=True)
-        )
-
-        return self.custom_paginate_queryset(order_by_posts(annotate))
+        return self.custom_paginate_queryset(order_by_posts(improve_queries))
 
     @action(
         methods=["get"],
@@ -329,11 +363,7 @@ class PostViewSet(
 
         improve_queries = self.get_serializer().setup_eager_loading(data)
 
-        annotate = count_likes_dislikes(improve_queries, "postrate").annotate(
-            num_of_comments=Count("comments", distinct=True)
-        )
-
-        return self.custom_paginate_queryset(order_by_posts(annotate))
+        return self.custom_paginate_queryset(order_by_posts(improve_queries))
 
 
 class CommentViewSet(
@@ -350,8 +380,10 @@ class CommentViewSet(
 
     serializer_class = CommentSerializer
     filter_backends = [OrderingFilter]
-    ordering_fields = ["created_at"]
+    ordering_fields = ["created_at", "thread_updated_at"]
     queryset = Comment.objects.all()
+    rate_model = CommentRate
+    rated_field = "comment"
 
     def get_post(self):
         return get_object_or_404(Post, pk=self.kwargs.get("post_pk"))
@@ -360,38 +392,58 @@ class CommentViewSet(
         """Return Comment instance using comment pk"""
         return get_object_or_404(Comment, id=self.kwargs.get("pk"))
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user.profile, post=self.get_post())
-
-    @staticmethod
-    def annotate_queryset(queryset: QuerySet) -> QuerySet:
-        queryset = (
-            count_likes_dislikes(queryset, "commentrate")
-            .annotate(
-                num_of_replies=Count("replies"),
-            )
-            .order_by("-num_of_replies")
+        comment = serializer.save(
+            author=self.request.user.profile, post=self.get_post()
         )
-
-        return queryset
+        update_comment_counters(comment, 1)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_comment = Comment.objects.get(pk=serializer.instance.pk)
+        comment = serializer.save()
+
+        if old_comment.reply_to_comment_id != comment.reply_to_comment_id:
+            update_comment_counters(old_comment, -1)
+            update_comment_counters(comment, 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # replies, also of other profiles, are kept as top comments
+        replies = list(instance.replies.all())
+        for reply in replies:
+            update_comment_counters(reply, -1)
+            reply.reply_to_comment = None
+            reply.save()
+            update_comment_counters(reply, 1)
+
+        if replies:
+            instance.refresh_from_db()
+        instance.delete()
+        update_comment_counters(instance, -1)
 
     def get_comments(self):
         """Return Post comments not replies"""
         queryset = Comment.objects.all().filter(
             post=self.get_post(), reply_to_comment__isnull=True
         )
-        return self.annotate_queryset(queryset)
+        return queryset.order_by("-num_of_replies")
 
     def get_serializer_class(self):
         if self.action in ["list", "replies"]:
             return CommentListSerializer
 
+        if self.action == "tree":
+            return CommentTreeSerializer
+
         return CommentSerializer
 
     def get_permissions(self):
         if self.action in [
             "dislike_remove_dislike",
             "like_unlike",
+            "bulk_reactions",
             "create",
         ]:
             self.permission_classes = [IsAuthenticatedAndUserHaveProfile]
@@ -401,7 +453,7 @@ class CommentViewSet(
         ]:
             self.permission_classes = [IsOwnerOrReadOnly]
 
-        elif self.action in ["replies", "list"]:
+        elif self.action in ["replies", "list", "tree"]:
             self.permission_classes = [IsAuthenticated]
 
         return super().get_permissions()
@@ -409,23 +461,14 @@ class CommentViewSet(
     def _like_dislike_or_remove(self, request, like_value: bool) -> None:
         """Like, dislike, or remove both"""
         comment = self.get_comment()
-        current_profile = request.user.profile
-
-        comment_rate, created = CommentRate.objects.get_or_create(
-            comment=comment,
-            profile=current_profile,
-            defaults={"like": like_value}
+        toggle_reaction(
+            self.rate_model,
+            self.rated_field,
+            request.user.profile,
+            comment.id,
+            like_value,
         )
 
-        if not created:
-            if comment_rate.like == like_value:
-                # Remove our reaction to comment
-                comment_rate.delete()
-
-            else:
-                comment_rate.like = like_value
-                comment_rate.save()
-
     def list(self, request, post_pk: int):
         """GET comments under post"""
         comments = self.get_comments()
@@ -434,14 +477,66 @@ class CommentViewSet(
 
         return self.custom_paginate_queryset(queryset)
 
+    def get_tree_depth(self) -> int:
+        depth = self.request.query_params.get("depth", DEFAULT_TREE_DEPTH)
+        try:
+            depth = int(depth)
+        except (TypeError, ValueError):
+            depth = 0
+
+        if not 1 <= depth <= MAX_TREE_DEPTH:
+            raise ValidationError(
+                {"depth": f"Must be number from 1 to {MAX_TREE_DEPTH}"}
+            )
+        return depth
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "depth",
+                type=int,
+                description=(
+                    "Number of comment levels, top comments are first level"
+                    f" (default {DEFAULT_TREE_DEPTH}, max {MAX_TREE_DEPTH})"
+                ),
+            )
+        ]
+    )
+    def tree(self, request, post_pk: int):
+        """GET post comments with replies nested down to depth levels.
+        Every comment shows first replies and link to the next ones"""
+        depth = self.get_tree_depth()
+        serializer_class = self.get_serializer_class()
+
+        roots = self.paginate_queryset(
+            serializer_class.setup_eager_loading(self.get_comments())
+        )
+        replies = descendants(
+            roots,
+            depth - 1,
+            TREE_REPLIES_PAGE_SIZE,
+            serializer_class.setup_eager_loading,
+        )
+        comments = build_tree(roots, replies, TREE_REPLIES_PAGE_SIZE)
+
+        resolve_reactions(
+            request,
+            self.rate_model,
+            self.rated_field,
+            [comment.id for comment in roots + replies],
+        )
+        serializer = self.get_serializer(comments, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["get"])
     def replies(self, request, pk: int):
         """GET comment replies"""
         replies = self.get_comment().replies
         # setup_eager_loading will return queryset (.all())
         improve_queries = self.get_serializer().setup_eager_loading(replies)
-        annotate = count_likes_dislikes(improve_queries, "commentrate")
-        queryset = self.filter_queryset(annotate)
+        ordered = order_by_likes_dislikes(improve_queries)
+        queryset = self.filter_queryset(ordered)
 
         return self.custom_paginate_queryset(queryset)
 
@@ -476,15 +571,16 @@ class TagViewSet(
 
         return super().get_permissions()
 
+    @cache_response(lambda view, request: [TAGS_VERSION_NAME])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(lambda view, request, pk: [tag_version_name(pk)])
     def retrieve(self, request, pk):
         """Return posts under tag pk"""
         tag = get_object_or_404(Tag, id=pk)
         data = Post.objects.filter(tags__id=tag.id)
 
-        annotate = count_likes_dislikes(data, "postrate").annotate(
-            num_of_comments=Count("comments")
-        )
-
-        improve_queries = self.get_serializer().setup_eager_loading(annotate)
+        improve_queries = self.get_serializer().setup_eager_loading(data)
 
         return self.custom_paginate_queryset(order_by_posts(improve_queries))
@@ -0,0 +1,138 @@
+"""PostgreSQL backend which takes connections from in-process pool and
+returns them there when Django closes connection, e.g. at the end of
+request. Pool is configured with "POOL" key of DATABASES entry:
+{"minconn": 0, "maxconn": 20, "idle_timeout": 600, "timeout": 10}.
+With CONN_HEALTH_CHECKS every checkout runs "SELECT 1" on the connection"""
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extras
+from psycopg2.extensions import make_dsn
+from psycopg2_pool import PoolError, ThreadSafeConnectionPool
+
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+DEFAULT_POOL = {"minconn": 0, "maxconn": 20, "idle_timeout": 600}
+# seconds thread waits for connection when maxconn connections are in use
+DEFAULT_TIMEOUT = 10
+
+# pools of process by dsn, forked workers get their own pools
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(ThreadSafeConnectionPool):
+    """Pool which makes thread wait up to timeout seconds for connection
+    returned by other thread when all maxconn connections are in use"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.returned = threading.Condition(self.lock)
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        with self.returned:
+            while True:
+                try:
+                    return super().getconn()
+                except PoolError:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # wrapped by django as OperationalError
+                        raise psycopg2.OperationalError(
+                            f"No connection was returned to pool of "
+                            f"{self.maxconn} in {self.timeout} seconds"
+                        )
+                    self.returned.wait(remaining)
+
+    def putconn(self, conn):
+        with self.returned:
+            super().putconn(conn)
+            self.returned.notify()
+
+
+def get_pool(conn_params: dict, options: dict) -> BlockingConnectionPool:
+    # cursor factory is set on connection, it is not part of dsn
+    params = {
+        key: value
+        for key, value in conn_params.items()
+        if key != "cursor_factory"
+    }
+    key = (os.getpid(), make_dsn(**params))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = BlockingConnectionPool(
+                dsn=key[1], **{**DEFAULT_POOL, **options}
+            )
+        return pool
+
+
+def close_pools():
+    """Close idle connections of every pool of this process"""
+    with _pools_lock:
+        for (pid, _), pool in _pools.items():
+            if pid == os.getpid():
+                pool.clear()
+
+
+def is_usable(connection) -> bool:
+    try:
+        # check must not leave transaction open, django sets autocommit
+        # of the connection again after it is taken from pool
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would block dropping of test database
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(conn_params, self.settings_dict.get("POOL", {}))
+        connection = self.pool.getconn()
+        # pool drops connections it knows are broken, connections closed
+        # by server are found only by query, so health checks cost one
+        # round trip every time connection is taken from pool
+        while self.settings_dict["CONN_HEALTH_CHECKS"] and not is_usable(
+            connection
+        ):
+            # closed connection is discarded by pool
+            connection.close()
+            self.pool.putconn(connection)
+            connection = self.pool.getconn()
+
+        connection.cursor_factory = conn_params["cursor_factory"]
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        if isolation_level is None:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+            connection.isolation_level = None
+        else:
+            self.isolation_level = IsolationLevel(isolation_level)
+            connection.isolation_level = self.isolation_level
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # rolled back by pool when it is still in transaction
+                return self.pool.putconn(self.connection)
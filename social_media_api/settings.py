@@ -60,6 +60,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "social_media.metrics.RequestMetricsMiddleware",
+    "social_media.profiling.SlowRequestProfilerMiddleware",
+    "social_media.db_routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -103,6 +106,25 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
     }
 }
+
+# read replicas of default database, e.g. "replica-1 replica-2"
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    os.getenv("POSTGRES_REPLICA_HOSTS", "").split(), start=1
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["social_media.db_routers.ReplicaRouter"]
+# seconds client which changed data reads from primary
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+# replicas further behind primary are not read from
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 2))
+REPLICA_LAG_CHECK_INTERVAL = 1
 #
 # DATABASES = {
 #     'default': {
@@ -152,6 +174,59 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# media files are stored once under hash of their content, files nothing
+# references for MEDIA_GC_GRACE seconds are deleted by
+# `python manage.py collect_media`
+STORAGES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "MEDIA_STORAGE_BACKEND",
+            "social_media.storage.ContentAddressedStorage",
+        ),
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+MEDIA_GC_GRACE = int(os.getenv("MEDIA_GC_GRACE", 3600))
+
+# media files are sent by web server when its header is set:
+# X-Accel-Redirect (nginx, internal location MEDIA_ACCEL_REDIRECT_PREFIX
+# aliased to MEDIA_ROOT) or X-Sendfile (Apache, lighttpd)
+MEDIA_SENDFILE_HEADER = os.getenv("MEDIA_SENDFILE_HEADER", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv(
+    "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/"
+)
+
+# uploaded images are resized to these widths (space separated), every
+# width is saved as WebP and JPEG with IMAGE_VARIANT_QUALITY (1 - 100)
+IMAGE_VARIANT_WIDTHS = [
+    int(width)
+    for width in os.getenv("IMAGE_VARIANT_WIDTHS", "160 320 640 1280").split()
+]
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+
+# uploads are streamed to temporary file and hashed, image bigger than
+# IMAGE_UPLOAD_MAX_BYTES is dropped while it is received and image with
+# more than IMAGE_UPLOAD_MAX_PIXELS is rejected before it is decoded
+FILE_UPLOAD_HANDLERS = ["social_media.uploads.HashingUploadHandler"]
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", 10485760))
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv("IMAGE_UPLOAD_MAX_PIXELS", 40000000)
+)
+
+# background jobs (image processing) are queued in database and run by
+# `python manage.py run_worker`, social_media.jobs.ImmediateQueue runs
+# them right away in process which queued them
+JOB_QUEUE_BACKEND = os.getenv(
+    "JOB_QUEUE_BACKEND", "social_media.jobs.DatabaseQueue"
+)
+# failed job is retried after JOB_RETRY_DELAY seconds, doubled every time
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", 10))
+# running job is queued again after JOB_TIMEOUT seconds (worker died)
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -160,21 +235,87 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "user.User"
 
 
+# Cache used by paginated counts, default is local memory cache which is
+# not shared between processes
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+# seconds cached responses of tags and profile detail are kept, they are
+# also invalidated when underlying data changes
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 600))
+
+# How page number pagination counts total number of objects:
+# "exact", "estimate" (PostgreSQL planner estimate) or "cached"
+PAGINATION_COUNT_MODE = os.getenv("PAGINATION_COUNT_MODE", "exact")
+# estimate smaller than this number is replaced with exact count
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000
+# seconds cached exact count is kept
+PAGINATION_COUNT_CACHE_TTL = 300
+
+# request metrics: Server-Timing header on every response and bearer
+# token required by /metrics endpoint (denied when empty)
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "") != "False"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# sampling profiler: stacks and SQL of requests slower than threshold or
+# picked with sample rate (0.0 - 1.0) are written to PROFILING_DIR, only
+# PROFILING_MAX_FILES latest profiles are kept
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "") == "True"
+PROFILING_THRESHOLD_MS = int(os.getenv("PROFILING_THRESHOLD_MS", 1000))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL_MS = int(os.getenv("PROFILING_INTERVAL_MS", 5))
+PROFILING_DIR = os.getenv("PROFILING_DIR") or os.path.join(
+    BASE_DIR, "profiles"
+)
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 200))
+# parameters of captured queries can hold personal data, they are written
+# into .sql files only when enabled
+PROFILING_SQL_PARAMS = os.getenv("PROFILING_SQL_PARAMS", "") == "True"
+
 # Set tags field in Post model to be CASE-INSENSITIVE
 TAGGIT_CASE_INSENSITIVE = True
 
+# Number of latest author posts pushed into follower home timeline
+# when follower starts following author
+TIMELINE_BACKFILL_SIZE = int(os.getenv("TIMELINE_BACKFILL_SIZE", 200))
+
+# Posts of profiles with at least this number of followers are not pushed
+# into followers timelines, they are pulled and merged when feed is read
+TIMELINE_CELEBRITY_THRESHOLD = int(
+    os.getenv("TIMELINE_CELEBRITY_THRESHOLD", 50000)
+)
+# Celebrity is demoted when number of its followers drops below this
+# threshold, then its latest posts are pushed by background job. Gap
+# between thresholds keeps profile around them from changing status (and
+# pushing its posts again) on every follow and unfollow
+TIMELINE_CELEBRITY_DEMOTE_THRESHOLD = int(
+    os.getenv("TIMELINE_CELEBRITY_DEMOTE_THRESHOLD", 45000)
+)
+
 REST_FRAMEWORK = {
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M:%S",
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.TokenAuthentication",
     ),
     "DEFAULT_PAGINATION_CLASS": (
-        "social_media.paginations.CustomPagination"
+        "social_media.paginations.ListPagination"
     ),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # rendering time of JSON responses is part of request metrics
+    "DEFAULT_RENDERER_CLASSES": (
+        "social_media.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
 # to see what those settings do see in
@@ -0,0 +1,66 @@
+"""
+Production settings, select them with
+DJANGO_SETTINGS_MODULE=social_media_api.settings_production
+
+Debug and debug toolbar are off, database connections are kept between
+requests and checked before reuse. With DB_POOL=True connections are
+returned to in-process pool at the end of request instead.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != "debug_toolbar"]
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if not middleware.startswith("debug_toolbar.")
+]
+
+DATABASES = {
+    alias: {
+        **database,
+        # seconds connection is kept by thread which opened it, run the
+        # server with fixed number of threads (e.g. gunicorn workers) to
+        # reuse them
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 600)),
+        # persistent and pooled connections closed by server are replaced
+        # instead of failing the first query of request, pooled connection
+        # is checked with "SELECT 1" every time request takes it
+        "CONN_HEALTH_CHECKS": True,
+    }
+    for alias, database in DATABASES.items()
+}
+
+# threads of one server process handling requests at the same time, e.g.
+# gunicorn --threads
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", 1))
+
+if os.getenv("DB_POOL", "") == "True":
+    # every request thread can hold connection of the same pool
+    pool_size = int(os.getenv("DB_POOL_MAX_SIZE", SERVER_THREADS))
+    if pool_size < SERVER_THREADS:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MAX_SIZE={pool_size} is less than SERVER_THREADS="
+            f"{SERVER_THREADS} threads which can hold connection"
+        )
+
+    # pool outlives threads, so it also helps servers which start
+    # thread per request; connection goes back to pool after request
+    for database in DATABASES.values():
+        database.update(
+            ENGINE="social_media_api.postgresql_pool",
+            CONN_MAX_AGE=0,
+            POOL={
+                "minconn": int(os.getenv("DB_POOL_MIN_SIZE", 0)),
+                "maxconn": pool_size,
+                "idle_timeout": int(os.getenv("DB_POOL_IDLE_TIMEOUT", 600)),
+                # seconds request waits for connection of full pool
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            },
+        )
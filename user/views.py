@@ -1,3 +1,6 @@
+from django.contrib.auth import get_user_model
+
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 
@@ -9,6 +12,16 @@ class UserViewSet(DjoserUserViewSet):
     def list(self, request, *args, **kwargs):
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+    @action(
+        ["post"],
+        detail=False,
+        url_path=f"reset_{get_user_model().USERNAME_FIELD}",
+    )
+    def reset_username(self, request, *args, **kwargs):
+        # email would link to username reset confirmation page, which
+        # this project does not have
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
 
 class PasswordResetEmail(DjoserPasswordResetEmail):
     template_name = "registration/password_reset_email.html"